@@ -0,0 +1,60 @@
+# 心跳抖动测试：在 vcan0 上用 BCM 发送心跳，另开一个 socket 按内核时间戳统计实际间隔
+# 可加 --load 在主线程制造 GIL 压力，对比 BCM 与线程回退的抖动
+# 准备 vcan0:
+#   sudo modprobe vcan && sudo ip link add dev vcan0 type vcan && sudo ip link set vcan0 up
+# 用法: python bench_heartbeat.py [--interface socketcan --channel vcan0] [--mode auto|thread] [--seconds 10] [--load]
+import argparse
+import time
+import can
+
+from heartbeat import HeartbeatScheduler
+
+
+def busy_python(seconds):
+    # 纯 Python 计算，持续持有 GIL，模拟视觉循环
+    end = time.monotonic() + seconds
+    x = 0
+    while time.monotonic() < end:
+        for i in range(10000):
+            x += i * i
+    return x
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interface', default='socketcan')
+    parser.add_argument('--channel', default='vcan0')
+    parser.add_argument('--mode', default='auto', choices=['auto', 'bcm', 'thread'])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--load', action='store_true')
+    args = parser.parse_args()
+
+    tx_bus = can.Bus(interface=args.interface, channel=args.channel)
+    rx_bus = can.Bus(interface=args.interface, channel=args.channel)
+    scheduler = HeartbeatScheduler([tx_bus] * 4, mode=args.mode)
+    scheduler.start()
+    # 用接收端时间戳统计，两种模式的测量口径一致
+    scheduler.attach_monitor(rx_bus)
+    print(f"心跳模式: {scheduler.active_mode}，运行 {args.seconds:.0f}s{'（带GIL负载）' if args.load else ''}")
+
+    if args.load:
+        busy_python(args.seconds)
+    else:
+        time.sleep(args.seconds)
+
+    stats = scheduler.stats()
+    scheduler.stop()
+    tx_bus.shutdown()
+    rx_bus.shutdown()
+
+    if not stats.get("count"):
+        print("未收到心跳帧")
+        return
+    print(f"样本数: {stats['count']}")
+    print(f"间隔 mean/min/max: {stats['mean'] * 1000:.3f} / {stats['min'] * 1000:.3f} / {stats['max'] * 1000:.3f} ms")
+    print(f"抖动 mean/p99/max: {stats['jitter_mean'] * 1000:.3f} / {stats['jitter_p99'] * 1000:.3f} / {stats['jitter_max'] * 1000:.3f} ms")
+    print(f"发送错误: {stats['send_errors']}")
+
+
+if __name__ == '__main__':
+    main()
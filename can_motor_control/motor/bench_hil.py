@@ -0,0 +1,181 @@
+# 硬件在环（仿真伺服）基准：不接实车即可在普通 Linux 机器 / CI 上发现性能回退
+# 1. 指令吞吐：四个电机的速度帧直接写总线 / 经 CanTxManager 发送队列，统计伺服实际执行的指令数
+# 2. 心跳抖动：HeartbeatScheduler 发送 0x08，按伺服一侧收到的时刻统计间隔
+# 3. 指令到"运动"延迟：发送速度阶跃，直到仿真伺服的实际转速变化超过阶跃的 5%
+# 4. 停止帧顺序：总线发送慢、队列中还有速度帧时发送停止帧，停止帧必须是总线上该电机的最后一帧（始终检查）
+# 后端：sim（进程内 virtual 总线，默认）或 vcan（vcan0/vcan1 上另开 socket 挂接仿真伺服，心跳走内核 BCM）
+# 给出阈值时任一项超出即以退出码 1 结束，可直接用于 CI
+# 用法: python bench_hil.py [--backend sim|vcan] [--seconds 3] [--max-motion-p99-ms 20] [--max-jitter-p99-ms 10] [--min-rate 2000]
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from can_bus import open_buses
+from can_frames import (MOTORS, station_nos, send_motor_speeds, SpeedFrameEncoder, make_message, speed_frame,
+                        stop_frame, CMD_STOP)
+from can_tx import CanTxManager, CanTxWriter
+from heartbeat import HeartbeatScheduler
+
+
+# 等待伺服执行完 expected 条速度指令，或执行数 quiet 秒内不再增加；返回 (执行数, 最后一条执行的时刻)
+def wait_commands(simulator, expected, quiet=0.1, timeout=10.0):
+    done = simulator.stats()["commands"]
+    last_change = time.perf_counter()
+    deadline = last_change + timeout
+    while done < expected and time.perf_counter() < deadline:
+        time.sleep(0.005)
+        now_done = simulator.stats()["commands"]
+        if now_done != done:
+            done, last_change = now_done, time.perf_counter()
+        elif time.perf_counter() - last_change > quiet:
+            break
+    return done, last_change
+
+
+def bench_throughput(backend, simulator, frames, queued):
+    tx = CanTxManager(backend.buses) if queued else None
+    buses = tx.motor_buses() if queued else [backend.buses[ch] for ch in ('can0', 'can0', 'can1', 'can1')]
+    encoder = SpeedFrameEncoder()
+    before = simulator.stats()["commands"]
+    rounds = frames // 4
+    start = time.perf_counter()
+    for i in range(rounds):
+        speed = (i % 2000) - 1000
+        send_motor_speeds(buses, (speed, speed, speed, speed), encoder)
+    elapsed = time.perf_counter() - start
+    coalesced = 0
+    if tx is not None:
+        tx.close()
+        coalesced = sum(stats["coalesced"] for stats in tx.stats().values())
+    # 发送队列会合并同一电机未发出的速度帧，执行数少于发送数
+    done, finished = wait_commands(simulator, before + rounds * 4)
+    applied = done - before
+    return rounds * 4 / elapsed, applied, applied / (finished - start), coalesced
+
+
+def bench_heartbeat(backend, simulator, seconds):
+    buses = [backend.buses[ch] for ch in ('can0', 'can0', 'can1', 'can1')]
+    servo = next(iter(simulator.servos.values()))
+    servo.heartbeats.reset()
+    scheduler = HeartbeatScheduler(buses)
+    scheduler.start()
+    time.sleep(seconds)
+    mode = scheduler.active_mode
+    scheduler.stop()
+    return mode, servo.heartbeats.snapshot()
+
+
+def bench_motion(backend, simulator, trials, threshold=0.05):
+    buses = [backend.buses[ch] for ch in ('can0', 'can0', 'can1', 'can1')]
+    encoder = SpeedFrameEncoder()
+    latencies = []
+    target = 0.0
+    for i in range(trials):
+        start_speed = simulator.wheel_speeds()[0]
+        target = 1000.0 if target <= 0 else -1000.0
+        limit = abs(target - start_speed) * threshold
+        start = time.perf_counter()
+        send_motor_speeds(buses, (target,) * 4, encoder)
+        while abs(simulator.wheel_speeds()[0] - start_speed) < limit:
+            if time.perf_counter() - start > 1.0:
+                break
+            time.sleep(0.0001)
+        latencies.append(time.perf_counter() - start)
+        # 等待基本稳定后再下一次阶跃
+        time.sleep(0.02)
+    return np.array(latencies) * 1000, np.array(simulator.command_latencies) * 1000
+
+
+# 每帧发送耗时 delay 的总线，记录发出的命令码
+class SlowBus:
+    def __init__(self, delay=0.005):
+        self.delay = delay
+        self.commands = []
+
+    def send(self, msg, timeout=None):
+        time.sleep(self.delay)
+        self.commands.append(msg.data[1])
+
+
+# 速度帧仍在队列中时发送停止帧，返回总线上的命令码顺序
+def check_stop_order():
+    bus = SlowBus()
+    writer = CanTxWriter(bus, name='slow').start()
+    motor_id, station_no = MOTORS[0]["id"], station_nos[0]
+    writer.send(make_message(motor_id, speed_frame(station_no, 3000)))
+    # 等写线程取走第一帧并开始（慢速）发送，第二帧留在队列中
+    time.sleep(bus.delay / 2)
+    writer.send(make_message(motor_id, speed_frame(station_no, 3000)))
+    writer.send(make_message(motor_id, stop_frame(station_no)))
+    writer.close()
+    return bus.commands
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default='sim', choices=['sim', 'vcan'])
+    parser.add_argument('--frames', type=int, default=20000, help='吞吐测试发送的速度帧数')
+    parser.add_argument('--seconds', type=float, default=3.0, help='心跳抖动测试时长')
+    parser.add_argument('--trials', type=int, default=100, help='运动延迟测试的阶跃次数')
+    parser.add_argument('--tau', type=float, default=0.01, help='仿真电机一阶时间常数（秒）')
+    # CI 阈值（不给则只报告）
+    parser.add_argument('--min-rate', type=float, default=None, help='直接写总线时伺服执行速率下限（帧/秒）')
+    parser.add_argument('--max-jitter-p99-ms', type=float, default=None)
+    parser.add_argument('--max-motion-p99-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    failures = []
+    # 停止帧不能被队列中更早的速度帧超越
+    commands = check_stop_order()
+    print(f"停止帧顺序 {[hex(cmd) for cmd in commands]}")
+    if not commands or commands[-1] != CMD_STOP:
+        failures.append(f"停止帧之后仍发出了速度帧: {[hex(cmd) for cmd in commands]}")
+
+    backend = open_buses(args.backend)
+    simulator = backend.attach_simulator(tau=args.tau)
+    try:
+        # 伺服离线判定需要心跳，吞吐和延迟测试期间保持心跳
+        keepalive = HeartbeatScheduler([backend.buses[ch] for ch in ('can0', 'can0', 'can1', 'can1')])
+        keepalive.start()
+        for queued in (False, True):
+            sent_rate, applied, applied_rate, coalesced = bench_throughput(backend, simulator, args.frames, queued)
+            name = '发送队列' if queued else '直接写总线'
+            print(f"吞吐 {name:<6} 发送 {sent_rate:8.0f} 帧/s，伺服执行 {applied}/{args.frames} 条"
+                  f"（{applied_rate:.0f} 帧/s，合并 {coalesced} 条）")
+            if not queued and args.min_rate is not None and applied_rate < args.min_rate:
+                failures.append(f"吞吐 {applied_rate:.0f} 帧/s < {args.min_rate:.0f}")
+        keepalive.stop()
+
+        mode, jitter = bench_heartbeat(backend, simulator, args.seconds)
+        if jitter["count"]:
+            p99 = jitter["jitter_p99"] * 1000
+            print(f"心跳 {mode:<6} {jitter['count']} 个间隔，平均 {jitter['mean'] * 1000:.2f}ms，"
+                  f"抖动 mean {jitter['jitter_mean'] * 1000:.3f} p99 {p99:.3f} max {jitter['jitter_max'] * 1000:.3f} ms")
+            if args.max_jitter_p99_ms is not None and p99 > args.max_jitter_p99_ms:
+                failures.append(f"心跳抖动 p99 {p99:.3f}ms > {args.max_jitter_p99_ms}ms")
+        else:
+            failures.append("伺服没有收到心跳")
+
+        keepalive.start()
+        simulator.command_latencies.clear()
+        motion, applied = bench_motion(backend, simulator, args.trials)
+        keepalive.stop()
+        p99 = np.percentile(motion, 99)
+        print(f"运动延迟 p50 {np.percentile(motion, 50):.2f} p99 {p99:.2f} max {motion.max():.2f} ms"
+              f"（其中帧到达伺服 p50 {np.percentile(applied, 50):.3f} p99 {np.percentile(applied, 99):.3f} ms，"
+              f"其余为 tau={args.tau * 1000:.0f}ms 的电机响应）")
+        if args.max_motion_p99_ms is not None and p99 > args.max_motion_p99_ms:
+            failures.append(f"运动延迟 p99 {p99:.2f}ms > {args.max_motion_p99_ms}ms")
+        print(f"仿真伺服: {simulator.stats()}")
+    finally:
+        backend.shutdown()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# 设定值平滑基准：SetpointRamp.step 的开销，以及不同最高转速下的加速、停车时间和路径时间
+# 路径时间：从静止按平滑设定值加速到最高转速，匀速后 stop() 停车，轮子累计转过 --revs 圈所需时间
+# 直接阶跃时设定值加速度为无穷大（由伺服限流决定），平滑后加速度和加加速度都有上限
+# 用法: python bench_setpoint_ramp.py [--revs 50] [--period 0.01]
+import argparse
+import timeit
+
+import numpy as np
+
+from setpoint_ramp import SetpointRamp
+
+
+# 单轮运动：加速到 top，转够 revs 圈（含停车距离）后停车；返回 (加速时间, 停车时间, 总时间, 峰值加速度, 峰值jerk)
+def simulate(top, revs, period):
+    ramp = SetpointRamp(shape=(1,))
+    ramp.set_target([top])
+    t = distance = 0.0
+    accel_time = stop_start = None
+    prev_accel = 0.0
+    peak_accel = peak_jerk = 0.0
+    stopping = False
+    while True:
+        velocity = ramp.step(period)[0]
+        t += period
+        distance += velocity * period / 60.0
+        peak_accel = max(peak_accel, abs(ramp.accel[0]))
+        peak_jerk = max(peak_jerk, abs(ramp.accel[0] - prev_accel) / period)
+        prev_accel = ramp.accel[0]
+        if accel_time is None and ramp.settled:
+            accel_time = t
+        if not stopping:
+            # 按当前速度估计停车距离（停车限制下的匀减速近似），剩余距离不足时开始停车
+            brake = velocity * velocity / (2 * ramp.stop_accel_max) / 60.0
+            if distance + brake >= revs:
+                ramp.set_target(None, stopping=True)
+                stopping, stop_start = True, t
+        elif ramp.settled:
+            return accel_time or t, t - stop_start, t, peak_accel, peak_jerk
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--revs', type=float, default=50.0, help='路径长度（轮子圈数）')
+    parser.add_argument('--period', type=float, default=0.01, help='设定值输出周期（秒）')
+    args = parser.parse_args()
+
+    ramp = SetpointRamp()
+    ramp.set_target([5000.0, -5000.0, 2500.0, 0.0])
+    n = 20000
+    cost = timeit.timeit(lambda: ramp.step(args.period), number=n) / n * 1e6
+    batch = SetpointRamp(shape=(256, 4))
+    batch.set_target(np.random.default_rng(0).uniform(-5000, 5000, (256, 4)))
+    batch_cost = timeit.timeit(lambda: batch.step(args.period), number=2000) / 2000 * 1e6
+    print(f"step: 4 轮 {cost:.1f} us/次，(256, 4) 批量 {batch_cost:.1f} us/次（{batch_cost / 256:.2f} us/车）")
+    print(f"周期 {args.period * 1000:.0f}ms，CPU 占用约 {cost / (args.period * 1e6) * 100:.2f}%")
+    print()
+    print(f"路径 {args.revs:.0f} 圈：")
+    print(f"{'最高转速':>8} {'加速(s)':>8} {'停车(s)':>8} {'总时间(s)':>9} {'峰值加速度':>10} {'峰值jerk':>10}")
+    for top in (2000, 3000, 4000, 5000):
+        accel_time, stop_time, total, peak_accel, peak_jerk = simulate(top, args.revs, args.period)
+        print(f"{top:>8} {accel_time:>8.2f} {stop_time:>8.2f} {total:>9.2f} {peak_accel:>10.0f} {peak_jerk:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
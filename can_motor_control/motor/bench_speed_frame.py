@@ -0,0 +1,93 @@
+# 速度帧编码微基准：旧版 speed_frame + 新建 can.Message 与 SpeedFrameEncoder 预分配编码对比
+# 在 python-can 虚拟总线上发送，输出每秒帧数和每个控制周期的临时内存分配量
+# 用法: python bench_speed_frame.py [--ticks 20000]
+import argparse
+import time
+import tracemalloc
+import can
+
+from can_frames import MOTORS, station_nos, SpeedFrameEncoder, send_motor_speeds
+
+
+# 优化前的实现（原样保留用于对比）
+def legacy_speed_frame(station_no, speed_rpm):
+    speed_bytes = int(speed_rpm).to_bytes(4, byteorder='little', signed=True)
+    return [station_no, 0x20, 0x00, speed_bytes[0], speed_bytes[1], speed_bytes[2], speed_bytes[3], 0xFF]
+
+
+def legacy_send_motor_speeds(buses, speeds):
+    for i, motor in enumerate(MOTORS):
+        frame = legacy_speed_frame(station_nos[i], int(speeds[i]))
+        msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
+        buses[i].send(msg)
+
+
+# 只统计编码开销的空总线，排除虚拟总线自身的深拷贝
+class NullBus:
+    def send(self, msg):
+        pass
+
+
+def speeds_for(tick):
+    v = (tick % 200) * 10 - 1000
+    return [v, -v, v + 1, -v - 1]
+
+
+def measure_rate(send, buses, ticks):
+    start = time.perf_counter()
+    for tick in range(ticks):
+        send(buses, speeds_for(tick))
+    elapsed = time.perf_counter() - start
+    return ticks * len(MOTORS) / elapsed
+
+
+def measure_transient_bytes(send, buses, ticks=2000):
+    # 统计每个控制周期内的峰值临时分配字节数（对象创建后即释放，存活块统计看不到）
+    send(buses, speeds_for(0))
+    tracemalloc.start()
+    total = 0
+    for tick in range(ticks):
+        speeds = speeds_for(tick)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        send(buses, speeds)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - current
+    tracemalloc.stop()
+    return total / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticks', type=int, default=20000)
+    args = parser.parse_args()
+
+    encoder = SpeedFrameEncoder()
+
+    def encoded_send(buses, speeds):
+        send_motor_speeds(buses, speeds, encoder)
+
+    tx0 = can.Bus(interface='virtual', channel='bench0')
+    tx1 = can.Bus(interface='virtual', channel='bench1')
+    virtual_buses = [tx0, tx0, tx1, tx1]
+    null_buses = [NullBus()] * len(MOTORS)
+
+    print(f"{'实现':<12}{'总线':<10}{'帧/秒':>14}")
+    for name, send in (('legacy', legacy_send_motor_speeds), ('encoder', encoded_send)):
+        for bus_name, buses in (('virtual', virtual_buses), ('null', null_buses)):
+            rate = measure_rate(send, buses, args.ticks)
+            print(f"{name:<12}{bus_name:<10}{rate:>14.0f}")
+
+    print()
+    print(f"{'实现':<12}{'峰值临时分配字节/周期':>20}")
+    for name, send in (('legacy', legacy_send_motor_speeds), ('encoder', encoded_send)):
+        # 分配统计使用空总线，只反映编码路径本身
+        allocated = measure_transient_bytes(send, null_buses)
+        print(f"{name:<12}{allocated:>20.1f}")
+
+    tx0.shutdown()
+    tx1.shutdown()
+
+
+if __name__ == '__main__':
+    main()
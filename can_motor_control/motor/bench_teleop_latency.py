@@ -0,0 +1,114 @@
+# 遥控接收到CAN发送的延迟分布：原 50ms 轮询线程 与 事件驱动的 TeleopSender 对比
+# 指令按指数分布的间隔到达（模拟 WebSocket），速度帧发送到 python-can 虚拟总线
+# 用法: python bench_teleop_latency.py [--seconds 5] [--rate 30]
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import can
+import numpy as np
+
+from can_frames import send_motor_speeds
+from mecanum import MecanumKinematics
+from teleop_sender import TeleopSender
+
+
+def make_schedule(seconds, rate):
+    rng = random.Random(0)
+    schedule, t = [], 0.0
+    while t < seconds:
+        t += rng.expovariate(rate)
+        schedule.append((t, (rng.uniform(-1, 1), rng.uniform(-1, 1), 1000.0, rng.uniform(-1, 1))))
+    return schedule
+
+
+def open_buses():
+    bus0 = can.Bus(interface='virtual', channel='bench0')
+    bus1 = can.Bus(interface='virtual', channel='bench1')
+    return [bus0, bus0, bus1, bus1], (bus0, bus1)
+
+
+# 原实现：接收线程只更新共享变量，控制线程每 50ms 醒来一次发送
+def run_polling(schedule, period=0.05):
+    buses, raw = open_buses()
+    kinematics = MecanumKinematics(L=80, W=60, speed_max=5000)
+    state = {"setpoint": (0.0, 0.0, 0.0, 0.0), "received": None}
+    latencies, sent = [], 0
+    done = threading.Event()
+
+    def control():
+        nonlocal sent
+        while not done.is_set():
+            received = state["received"]
+            x, y, throttle1, throttle2 = state["setpoint"]
+            send_motor_speeds(buses, kinematics.mix(x, y, throttle2, throttle1))
+            sent += 1
+            if received is not None:
+                latencies.append(time.monotonic() - received)
+                state["received"] = None
+            time.sleep(period)
+
+    thread = threading.Thread(target=control)
+    thread.start()
+    start = time.monotonic()
+    for at, setpoint in schedule:
+        delay = start + at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        state["setpoint"] = setpoint
+        state["received"] = time.monotonic()
+    done.set()
+    thread.join()
+    for bus in raw:
+        bus.shutdown()
+    return np.array(latencies) * 1000, sent
+
+
+# 新实现：同一个事件循环中接收并立即发送
+def run_event(schedule, min_interval, keepalive):
+    buses, raw = open_buses()
+    sender = TeleopSender(buses, min_interval=min_interval, keepalive=keepalive)
+
+    async def produce():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for at, setpoint in schedule:
+            await asyncio.sleep(max(0.0, start + at - loop.time()))
+            sender.submit(*setpoint)
+        await asyncio.sleep(min_interval)
+        sender.stop()
+
+    async def main():
+        await asyncio.gather(sender.run(), produce())
+
+    asyncio.run(main())
+    for bus in raw:
+        bus.shutdown()
+    return np.array(sender.latencies) * 1000, sender.sent
+
+
+def report(name, ms, sent, seconds, received):
+    print(f"{name:<16} p50 {np.percentile(ms, 50):6.2f}  p90 {np.percentile(ms, 90):6.2f}  "
+          f"p99 {np.percentile(ms, 99):6.2f}  max {ms.max():6.2f} ms  "
+          f"发送 {sent} 次（{sent / seconds:.0f}/s，收到 {received} 条指令）")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--rate', type=float, default=30.0, help='平均指令频率（条/秒）')
+    parser.add_argument('--min-interval', type=float, default=0.01)
+    parser.add_argument('--keepalive', type=float, default=0.2)
+    args = parser.parse_args()
+
+    schedule = make_schedule(args.seconds, args.rate)
+    ms, sent = run_polling(schedule)
+    report('轮询 50ms', ms, sent, args.seconds, len(schedule))
+    ms, sent = run_event(schedule, args.min_interval, args.keepalive)
+    report('事件驱动', ms, sent, args.seconds, len(schedule))
+
+
+if __name__ == '__main__':
+    main()
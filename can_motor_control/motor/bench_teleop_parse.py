@@ -0,0 +1,45 @@
+# 遥控指令解析吞吐量：JSON 与二进制帧（均包含校验和序号检查）
+# 用法: python bench_teleop_parse.py [--count 200000]
+import argparse
+import json
+import random
+import time
+
+from teleop_protocol import TeleopDecoder, encode_binary, encode_json, BINARY_FRAME
+
+
+def make_messages(count, encode):
+    rng = random.Random(0)
+    return [encode(seq, 1.7e9 + seq * 0.01, rng.uniform(-1, 1), rng.uniform(-1, 1),
+                   rng.uniform(0, 5000), rng.uniform(-1, 1)) for seq in range(1, count + 1)]
+
+
+def run(messages, parse):
+    start = time.perf_counter()
+    for message in messages:
+        parse(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200000)
+    args = parser.parse_args()
+
+    json_messages = make_messages(args.count, encode_json)
+    binary_messages = make_messages(args.count, encode_binary)
+    print(f"消息数: {args.count}  JSON平均 {sum(map(len, json_messages)) / args.count:.0f} 字节，"
+          f"二进制 {BINARY_FRAME.size} 字节")
+    cases = [
+        ('json.loads', json_messages, json.loads),
+        ('struct.unpack', binary_messages, BINARY_FRAME.unpack),
+        ('JSON+校验', json_messages, TeleopDecoder().decode),
+        ('二进制+校验', binary_messages, TeleopDecoder().decode),
+    ]
+    for name, messages, parse in cases:
+        rate = run(messages, parse)
+        print(f"{name:<14} {rate / 1000:8.1f} k条/秒  {1e6 / rate:6.2f} us/条")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# CAN总线工厂 - 各入口统一经 open_buses() 打开 can0/can1，不再写死 socketcan
+# - socketcan: 实车，确保接口已启用且为 1Mbps 再打开（can_link.py，状态一致时不做改动）
+# - vcan:      虚拟 SocketCAN 接口（can0 -> vcan0，can1 -> vcan1），接口不存在时创建
+# - sim:       进程内仿真伺服（python-can virtual 总线 + sim_servo.ServoSimulator），不需要内核模块和 sudo
+# 后端默认取环境变量 CAR_CAN_BACKEND（未设置为 socketcan），如: CAR_CAN_BACKEND=sim python remote_control_ws_gui.py
+# 设置 CAR_TRACE 或 CAR_RECORD_CAN 时同时把收发帧记录到二进制追踪文件（recorder.py）
+import itertools
+import os
+
+import can
+
+from can_link import ensure_links
+
+BACKENDS = ('socketcan', 'vcan', 'sim')
+CHANNELS = ('can0', 'can1')
+BITRATE = 1000000
+
+# 每次打开 sim 后端使用独立的虚拟通道名，同一进程内多次打开互不干扰
+_sim_ids = itertools.count()
+
+
+def default_backend():
+    return os.environ.get('CAR_CAN_BACKEND', 'socketcan')
+
+
+class CanBackend:
+    # devices: 逻辑通道名（can0/can1，与 MOTORS 中的 channel 一致）-> (python-can 接口, 设备/通道名)
+    def __init__(self, name, devices):
+        self.name = name
+        self.devices = devices
+        # 主机一侧的总线
+        self.buses = {channel: can.Bus(interface=interface, channel=device)
+                      for channel, (interface, device) in devices.items()}
+        # 仿真伺服及其一侧的总线
+        self.simulator = None
+        self._sim_buses = {}
+        # 接口检查/配置结果（can_link.LinkResult 列表）与耗时（秒）
+        self.links = []
+        self.link_time = 0.0
+        self._sniffer = None
+
+    def __getitem__(self, channel):
+        return self.buses[channel]
+
+    # 在同一组通道上另开总线挂接仿真伺服；sim 后端打开时已挂接，vcan 后端可用于基准测试
+    def attach_simulator(self, **sim_args):
+        if self.simulator is None:
+            from sim_servo import ServoSimulator
+            self._sim_buses = {channel: can.Bus(interface=interface, channel=device)
+                               for channel, (interface, device) in self.devices.items()}
+            self.simulator = ServoSimulator(self._sim_buses, **sim_args).start()
+        return self.simulator
+
+    # 记录收发帧（追踪开启时写入文件）：sim 后端由仿真伺服记录，其余后端在独立 socket 上监听
+    def start_recording(self):
+        from recorder import CanRecorder, BusSniffer
+        if self.name == 'sim':
+            self.simulator.recorders = {channel: CanRecorder(CHANNELS.index(channel)) for channel in self.devices}
+        elif self._sniffer is None:
+            self._sniffer = BusSniffer(self.devices, CHANNELS)
+
+    def stop_recording(self):
+        if self.simulator is not None:
+            self.simulator.recorders = None
+        if self._sniffer is not None:
+            self._sniffer.stop()
+            self._sniffer = None
+
+    def shutdown(self):
+        self.stop_recording()
+        if self.simulator is not None:
+            self.simulator.stop()
+        for bus in list(self.buses.values()) + list(self._sim_buses.values()):
+            bus.shutdown()
+
+
+def default_record():
+    return bool(os.environ.get('CAR_TRACE') or os.environ.get('CAR_RECORD_CAN'))
+
+
+# 打开 can0/can1；configure=False 时不配置接口（已由外部配置好）
+# record: 是否记录收发帧，None 时取 default_record()
+# sim 后端的 sim_args 传给 ServoSimulator（如 beat_period=0.03、tau=0.05）
+def open_buses(backend=None, channels=CHANNELS, bitrate=BITRATE, configure=True, record=None, **sim_args):
+    result = _open(backend or default_backend(), channels, bitrate, configure, sim_args)
+    if default_record() if record is None else record:
+        result.start_recording()
+    return result
+
+
+def _open(backend, channels, bitrate, configure, sim_args):
+    if backend in ('socketcan', 'vcan'):
+        vcan = backend == 'vcan'
+        devices = {channel: ('socketcan', 'v' + channel if vcan else channel) for channel in channels}
+        links, link_time = [], 0.0
+        if configure:
+            # 两个接口并发检查，只在未启用或波特率不一致时重新配置
+            links, link_time = ensure_links([device for _, device in devices.values()],
+                                            None if vcan else bitrate, vcan)
+        result = CanBackend(backend, devices)
+        result.links, result.link_time = links, link_time
+        return result
+    if backend == 'sim':
+        sim_id = next(_sim_ids)
+        result = CanBackend(backend, {channel: ('virtual', f"sim{sim_id}-{channel}") for channel in channels})
+        result.attach_simulator(**sim_args)
+        return result
+    raise ValueError(f"未知的CAN后端 {backend!r}，可选 {', '.join(BACKENDS)}")
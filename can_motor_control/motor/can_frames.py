@@ -0,0 +1,88 @@
+# 伺服CAN帧编码模块 - 电机参数与各类控制帧的唯一定义处
+# car_control.py、remote_control_gui.py、remote_control_ws_gui.py 共用本模块，
+# 避免每个控制周期重复 int.to_bytes / 构造列表 / 新建 can.Message
+import struct
+import can
+
+# 电机参数（ID = 0x64 + 站号，见伺服CAN控制协议）
+MOTORS = [
+    {"id": 0x65, "channel": "can0"},  # 左前
+    {"id": 0x66, "channel": "can0"},  # 右前
+    {"id": 0x67, "channel": "can1"},  # 右后
+    {"id": 0x68, "channel": "can1"},  # 左后
+]
+station_nos = [0x01, 0x02, 0x03, 0x04]  # 对应的站号
+
+# 命令类型码 DATE[1]
+CMD_ALARM = 0x05       # 伺服报警代码（伺服 -> 主控）
+CMD_HEARTBEAT = 0x08   # 主控连接帧（主控 -> 伺服，每100ms）
+CMD_SERVO_BEAT = 0x10  # 伺服心跳帧（伺服 -> 主控，每30ms）
+CMD_READ = 0x12        # 读取伺服数据
+CMD_SPEED = 0x20       # 速度模式运行
+CMD_ENABLE = 0x25      # 使能开关
+CMD_STOP = 0x26        # 速度模式停止并保持使能
+CMD_STOP_DISABLE = 0x28  # 速度模式停止并关闭使能
+
+# 8字节帧布局：站号, 命令码, DATE[2], 32位有符号小端数据, 0xFF校验位
+FRAME = struct.Struct('<BBBiB')
+# 速度值在帧内的偏移与格式
+SPEED_OFFSET = 3
+SPEED_VALUE = struct.Struct('<i')
+
+
+def speed_frame(station_no, speed_rpm):
+    # 返回完整的速度控制帧数据（bytes，可直接作为 can.Message 的 data）
+    return FRAME.pack(station_no, CMD_SPEED, 0x00, int(speed_rpm), 0xFF)
+
+
+def enable_frame(station_no, enable=True):
+    return FRAME.pack(station_no, CMD_ENABLE, 0x01 if enable else 0x00, 0, 0xFF)
+
+
+def stop_frame(station_no):
+    return FRAME.pack(station_no, CMD_STOP, 0, 0, 0xFF)
+
+
+def heartbeat_frame(station_no):
+    return FRAME.pack(station_no, CMD_HEARTBEAT, 0, 0, 0xFF)
+
+
+def make_message(motor_id, data):
+    # 标准帧，不使用扩展帧和远程帧
+    return can.Message(arbitration_id=motor_id, data=data, is_extended_id=False)
+
+
+# 速度帧编码器：每个电机预先分配一个 can.Message，控制周期内只原地改写4字节速度值
+class SpeedFrameEncoder:
+    def __init__(self, motors=MOTORS, stations=station_nos):
+        self.messages = []
+        for motor, station_no in zip(motors, stations):
+            # bytearray 会被 can.Message 直接引用，不会复制
+            msg = make_message(motor["id"], bytearray(speed_frame(station_no, 0)))
+            self.messages.append(msg)
+        # 缓存 data 缓冲区，避免热路径上的属性查找
+        self._buffers = [msg.data for msg in self.messages]
+
+    # 编码单个电机的速度，返回预分配的消息对象
+    def encode(self, index, speed_rpm):
+        SPEED_VALUE.pack_into(self._buffers[index], SPEED_OFFSET, int(speed_rpm))
+        return self.messages[index]
+
+    # 一次编码全部四个轮子，返回预分配的消息列表
+    # 注意：返回的消息会在下一次编码时被原地改写，调用方需在此之前发送完毕
+    def encode_all(self, speeds):
+        pack_into = SPEED_VALUE.pack_into
+        for buf, speed in zip(self._buffers, speeds):
+            pack_into(buf, SPEED_OFFSET, int(speed))
+        return self.messages
+
+
+# 默认编码器，供独立函数 send_motor_speeds 使用（仅由控制循环单线程调用）
+_default_encoder = SpeedFrameEncoder()
+
+
+# 发送电机速度指令的独立函数
+def send_motor_speeds(buses, speeds, encoder=None):
+    messages = (encoder or _default_encoder).encode_all(speeds)
+    for bus, msg in zip(buses, messages):
+        bus.send(msg)
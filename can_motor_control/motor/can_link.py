@@ -0,0 +1,198 @@
+# CAN接口管理 - 启动时检查 can0/can1 的状态与波特率，只在不一致时重新配置
+# 原来每个入口都执行六条 sudo ip link（数百毫秒），且无条件 down/up 正在使用的总线
+# - 查询与配置优先走 netlink（pyroute2，进程内，约几毫秒）；未安装 pyroute2 时用一次 ip -details -json 查询
+# - 已启用且波特率一致的接口不做任何改动，控制进程崩溃后重启不会打断正在运行的总线
+# - 需要修改时先尝试 netlink（需要 CAP_NET_ADMIN），权限不足时回退到 sudo ip link
+# - 多个接口在线程池中并发检查/配置，返回每个接口的动作和耗时
+import json
+import logging
+import os
+import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger('can_link')
+
+IFF_UP = 0x1
+
+# pyroute2 导入约需 0.1 秒（树莓派上更久），推迟到第一次检查接口时，sim 后端和只导入本模块的程序不受影响
+_iproute = None
+
+
+def _iproute_class():
+    global _iproute
+    if _iproute is None:
+        try:
+            from pyroute2 import IPRoute
+        except ImportError:  # 未安装 pyroute2 时回退到 ip 命令
+            IPRoute = False
+        _iproute = IPRoute
+    return _iproute or None
+
+# state: 'up' / 'down' / 'missing'；bitrate 为 None 表示未知（vcan 或未配置）
+LinkState = namedtuple('LinkState', 'name kind state bitrate')
+# action: 'unchanged' / 'configured' / 'created'；method: 'netlink' / 'ip' / 'sudo'
+LinkResult = namedtuple('LinkResult', 'name action method elapsed before')
+
+
+class CanLinkError(RuntimeError):
+    pass
+
+
+# ---- 查询 ----
+
+def _state_netlink(ipr, name):
+    index = ipr.link_lookup(ifname=name)
+    if not index:
+        return LinkState(name, None, 'missing', None)
+    link = ipr.get_links(index[0])[0]
+    kind, bitrate = None, None
+    info = link.get_attr('IFLA_LINKINFO')
+    if info is not None:
+        kind = info.get_attr('IFLA_INFO_KIND')
+        data = info.get_attr('IFLA_INFO_DATA')
+        if kind == 'can' and data is not None:
+            timing = data.get_attr('IFLA_CAN_BITTIMING')
+            if timing is not None:
+                bitrate = timing['bitrate'] or None
+    return LinkState(name, kind, 'up' if link['flags'] & IFF_UP else 'down', bitrate)
+
+
+def _state_ip(name):
+    if not os.path.exists(f"/sys/class/net/{name}"):
+        return LinkState(name, None, 'missing', None)
+    out = subprocess.run(['ip', '-details', '-json', 'link', 'show', 'dev', name],
+                         capture_output=True, text=True, check=True).stdout
+    link = json.loads(out)[0]
+    info = link.get('linkinfo', {})
+    bitrate = info.get('info_data', {}).get('bittiming', {}).get('bitrate')
+    return LinkState(name, info.get('info_kind'), 'up' if 'UP' in link.get('flags', ()) else 'down', bitrate)
+
+
+def link_state(name, ipr=None):
+    if ipr is not None:
+        return _state_netlink(ipr, name)
+    IPRoute = _iproute_class()
+    if IPRoute is not None:
+        with IPRoute() as ipr:
+            return _state_netlink(ipr, name)
+    return _state_ip(name)
+
+
+# ---- 配置 ----
+
+def _sudo(*commands, check=True):
+    prefix = [] if os.geteuid() == 0 else ['sudo']
+    for command in commands:
+        try:
+            result = subprocess.run(prefix + command, capture_output=True, text=True)
+        except OSError as e:
+            if check:
+                raise CanLinkError(f"{' '.join(command)}: {e}")
+            continue
+        if check and result.returncode != 0:
+            raise CanLinkError(f"{' '.join(command)}: {result.stderr.strip()}")
+
+
+def _configure_can(ipr, name, bitrate):
+    if ipr is not None:
+        try:
+            index = ipr.link_lookup(ifname=name)[0]
+            # 波特率只能在接口关闭时修改
+            ipr.link('set', index=index, state='down')
+            ipr.link('set', index=index, kind='can', can_bittiming={'bitrate': bitrate})
+            ipr.link('set', index=index, state='up')
+            return 'netlink'
+        except Exception as e:
+            log.debug("netlink 配置 %s 失败（%s），改用 ip link", name, e)
+    _sudo(['ip', 'link', 'set', name, 'down'],
+          ['ip', 'link', 'set', name, 'type', 'can', 'bitrate', str(bitrate)],
+          ['ip', 'link', 'set', name, 'up'])
+    return 'sudo'
+
+
+def _set_up(ipr, name):
+    if ipr is not None:
+        try:
+            ipr.link('set', index=ipr.link_lookup(ifname=name)[0], state='up')
+            return 'netlink'
+        except Exception as e:
+            log.debug("netlink 启用 %s 失败（%s），改用 ip link", name, e)
+    _sudo(['ip', 'link', 'set', name, 'up'])
+    return 'sudo'
+
+
+def _create_vcan(ipr, name):
+    if ipr is not None:
+        try:
+            ipr.link('add', ifname=name, kind='vcan')
+            ipr.link('set', index=ipr.link_lookup(ifname=name)[0], state='up')
+            return 'netlink'
+        except Exception as e:
+            log.debug("netlink 创建 %s 失败（%s），改用 ip link", name, e)
+    # vcan 可能已编译进内核，modprobe 失败不影响后续创建
+    _sudo(['modprobe', 'vcan'], check=False)
+    _sudo(['ip', 'link', 'add', 'dev', name, 'type', 'vcan'], ['ip', 'link', 'set', name, 'up'])
+    return 'sudo'
+
+
+# 确保一个接口处于期望状态：can 接口启用且波特率为 bitrate；vcan 接口存在且启用
+# 每个线程使用自己的 netlink socket
+def ensure_link(name, bitrate=None, vcan=False):
+    start = time.perf_counter()
+    IPRoute = _iproute_class()
+    ipr = IPRoute() if IPRoute is not None else None
+    try:
+        before = link_state(name, ipr)
+        method = 'netlink' if ipr is not None else 'ip'
+        action = 'unchanged'
+        if before.state == 'missing':
+            if not vcan:
+                raise CanLinkError(f"接口 {name} 不存在")
+            method, action = _create_vcan(ipr, name), 'created'
+        elif vcan or bitrate is None:
+            if before.state != 'up':
+                method, action = _set_up(ipr, name), 'configured'
+        elif before.state != 'up' or before.bitrate != bitrate:
+            method, action = _configure_can(ipr, name, bitrate), 'configured'
+    finally:
+        if ipr is not None:
+            ipr.close()
+    return LinkResult(name, action, method, time.perf_counter() - start, before)
+
+
+# 并发确保多个接口，返回 (结果列表, 总耗时秒)；任一接口失败时抛出 CanLinkError
+def ensure_links(names, bitrate=None, vcan=False):
+    start = time.perf_counter()
+    # 在启动线程前导入 pyroute2，避免各线程同时等待导入锁
+    _iproute_class()
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        results = list(pool.map(lambda name: ensure_link(name, bitrate, vcan), names))
+    elapsed = time.perf_counter() - start
+    log.info("CAN接口就绪 %.1fms: %s", elapsed * 1000,
+             ", ".join(f"{r.name} {r.action}({r.method}, {r.elapsed * 1000:.1f}ms)" for r in results))
+    return results, elapsed
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='检查并配置CAN接口（只在状态或波特率不一致时修改）')
+    parser.add_argument('names', nargs='*', default=['can0', 'can1'])
+    parser.add_argument('--bitrate', type=int, default=1000000)
+    parser.add_argument('--vcan', action='store_true', help='创建/启用 vcan 接口')
+    parser.add_argument('--check', action='store_true', help='只查询，不修改')
+    args = parser.parse_args()
+    if args.check:
+        for name in args.names:
+            print(link_state(name))
+        return
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    results, elapsed = ensure_links(args.names, None if args.vcan else args.bitrate, args.vcan)
+    for r in results:
+        print(f"{r.name}: {r.action} via {r.method}, {r.elapsed * 1000:.1f}ms（之前 {r.before.state}, {r.before.bitrate}）")
+    print(f"总耗时 {elapsed * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
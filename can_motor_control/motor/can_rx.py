@@ -0,0 +1,181 @@
+# CAN接收模块 - 异步解码伺服应答帧，写入每个电机的 NumPy 环形缓冲区
+# 伺服会主动发送 0x10 心跳帧（运行状态、绝对位置，每30ms）和 0x05 报警帧；
+# 速度、电流需要发送 0x12 读取指令，由本模块按固定周期异步轮询
+import asyncio
+import struct
+import threading
+import time
+
+import can
+import numpy as np
+
+from can_frames import MOTORS, station_nos, FRAME, CMD_ALARM, CMD_SERVO_BEAT, CMD_READ, make_message
+from can_tx import PRIO_HEARTBEAT
+
+# 0x12 读取指令的数据类型 DATE[2]
+READ_SPEED = 0xfc
+READ_POSITION = 0xfd
+READ_CURRENT = 0xa4  # 输出电流，两位小数
+
+# 环形缓冲区每行的字段（列下标）
+F_TIME, F_SPEED, F_CURRENT, F_STATUS, F_POSITION, F_ALARM = range(6)
+FIELDS = ("time", "speed", "current", "status", "position", "alarm")
+
+STATUS_IDLE = 0x88  # 0x10 心跳帧中空闲状态值
+
+_ALARM = struct.Struct('<H')
+
+
+# 解码一帧伺服应答，返回 (站号, 字段列表[(列, 值)])；非应答帧返回 None
+def decode_feedback(data):
+    if len(data) != 8:
+        return None
+    station, cmd, sub, value, _ = FRAME.unpack(data)
+    if cmd == CMD_SERVO_BEAT:
+        return station, ((F_STATUS, sub), (F_POSITION, value))
+    if cmd == CMD_READ:
+        if sub == READ_SPEED:
+            return station, ((F_SPEED, value),)
+        if sub == READ_CURRENT:
+            return station, ((F_CURRENT, value / 100.0),)
+        if sub == READ_POSITION:
+            return station, ((F_POSITION, value),)
+        return None
+    if cmd == CMD_ALARM:
+        return station, ((F_ALARM, _ALARM.unpack_from(data, 2)[0]),)
+    return None
+
+
+def read_frame(station_no, kind):
+    return FRAME.pack(station_no, CMD_READ, kind, 0, 0xFF)
+
+
+# 每个电机一个固定大小的环形缓冲区；每收到一帧就把该电机最新的完整状态追加一行
+class MotorTelemetry:
+    def __init__(self, capacity=512, stations=station_nos):
+        self.capacity = capacity
+        self.station_index = {station: i for i, station in enumerate(stations)}
+        n = len(stations)
+        self.ring = np.zeros((n, capacity, len(FIELDS)), dtype=np.float64)
+        self._latest = np.full((n, len(FIELDS)), np.nan)
+        self._count = np.zeros(n, dtype=np.int64)
+        # 锁只在写一行/拷一行时持有，控制循环查询不会被长时间阻塞
+        self._lock = threading.Lock()
+
+    # 写入一帧；返回电机下标，非本车电机的帧返回 None
+    def update(self, data, timestamp=None):
+        decoded = decode_feedback(data)
+        if decoded is None:
+            return None
+        station, values = decoded
+        index = self.station_index.get(station)
+        if index is None:
+            return None
+        with self._lock:
+            row = self._latest[index]
+            for field, value in values:
+                row[field] = value
+            row[F_TIME] = time.time() if timestamp is None else timestamp
+            self.ring[index, self._count[index] % self.capacity] = row
+            self._count[index] += 1
+        return index
+
+    # 某个电机的最新状态（字段字典），从未收到过返回 None
+    def latest(self, index):
+        with self._lock:
+            if not self._count[index]:
+                return None
+            row = self._latest[index].copy()
+        return dict(zip(FIELDS, row.tolist()))
+
+    # 四个轮子的最新反馈速度（rpm），未知为 nan
+    def wheel_speeds(self):
+        with self._lock:
+            return self._latest[:, F_SPEED].copy()
+
+    # 按时间顺序返回某电机最近 n 行（n 行 x len(FIELDS) 列）
+    def history(self, index, n=None):
+        with self._lock:
+            count = int(self._count[index])
+            size = min(count, self.capacity)
+            n = size if n is None else min(n, size)
+            idx = (np.arange(count - n, count) % self.capacity)
+            return self.ring[index, idx].copy()
+
+
+# 异步接收器：python-can Notifier + AsyncBufferedReader，在独立线程的事件循环中运行
+class FeedbackReceiver:
+    # rx_buses: 需要监听的底层总线列表，如 [bus0, bus1]
+    # tx_buses: 与 MOTORS 对应的发送总线（可为 CanTxWriter），用于轮询速度/电流；为 None 时不轮询
+    def __init__(self, rx_buses, telemetry, tx_buses=None, poll_period=0.05, motors=MOTORS, stations=station_nos):
+        self.rx_buses = list(rx_buses)
+        self.telemetry = telemetry
+        self.tx_buses = tx_buses
+        self.poll_period = poll_period
+        self.poll_msgs = [
+            (make_message(motor["id"], read_frame(stations[i], READ_SPEED)),
+             make_message(motor["id"], read_frame(stations[i], READ_CURRENT)))
+            for i, motor in enumerate(motors)
+        ]
+        self.received = 0
+        self.decoded = 0
+        self._loop = None
+        self._thread = None
+        self._stopped = None
+
+    # 也可以直接在已有的事件循环中 await run()
+    async def run(self, ready=None):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        reader = can.AsyncBufferedReader()
+        notifier = can.Notifier(self.rx_buses, [reader], loop=self._loop)
+        tasks = [asyncio.ensure_future(self._receive(reader))]
+        if self.tx_buses is not None:
+            tasks.append(asyncio.ensure_future(self._poll()))
+        if ready is not None:
+            ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            notifier.stop()
+
+    async def _receive(self, reader):
+        update = self.telemetry.update
+        while True:
+            msg = await reader.get_message()
+            self.received += 1
+            if update(msg.data, msg.timestamp) is not None:
+                self.decoded += 1
+
+    # 周期发送读取指令，应答由 _receive 异步处理，不等待结果
+    async def _poll(self):
+        while True:
+            for bus, msgs in zip(self.tx_buses, self.poll_msgs):
+                for msg in msgs:
+                    try:
+                        if hasattr(bus, 'raw_bus'):
+                            # 经发送队列时按心跳级别排队，不与速度帧合并
+                            bus.send(msg, priority=PRIO_HEARTBEAT)
+                        else:
+                            bus.send(msg)
+                    except can.CanError:
+                        pass
+            await asyncio.sleep(self.poll_period)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run(ready)), name='can-rx', daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,194 @@
+# CAN发送队列模块 - 每个通道一个写线程，统一调用 bus.send
+# 控制线程、心跳线程、Qt定时器不再直接争用同一个 socket：
+#   - 有界优先级队列：停止/使能等控制帧 > 心跳帧 > 速度帧
+#   - 速度帧按电机ID合并，队列中每个电机只保留最新的设定值
+#   - 停止/使能帧入队时撤销同一电机尚未发送的速度帧，旧设定值不会在停止帧之后发出
+#   - 提供队列深度、丢弃、合并、发送错误等计数
+import threading
+import time
+from collections import deque
+
+import can
+
+from can_frames import MOTORS, CMD_HEARTBEAT, CMD_SPEED, CMD_ENABLE, CMD_STOP, CMD_STOP_DISABLE
+
+# 优先级，数值越小越先发送
+PRIO_CONTROL = 0
+PRIO_HEARTBEAT = 1
+PRIO_SPEED = 2
+PRIORITY_NAMES = ("control", "heartbeat", "speed")
+# 入队时撤销同一电机待发送速度帧的命令（控制帧优先级更高，否则旧速度帧会在其后发出）
+CANCELS_SPEED = (CMD_ENABLE, CMD_STOP, CMD_STOP_DISABLE)
+
+
+# 按命令码 DATE[1] 划分优先级
+def classify(msg):
+    cmd = msg.data[1] if len(msg.data) > 1 else None
+    if cmd == CMD_SPEED:
+        return PRIO_SPEED
+    if cmd == CMD_HEARTBEAT:
+        return PRIO_HEARTBEAT
+    return PRIO_CONTROL
+
+
+# 单通道写线程，接口与 bus.send 兼容，可直接放进 buses 列表
+class CanTxWriter:
+    def __init__(self, bus, maxsize=64, send_timeout=0.01, control_retries=3, name=None):
+        self.raw_bus = bus
+        self.maxsize = maxsize
+        self.send_timeout = send_timeout
+        self.control_retries = control_retries
+        self.name = name or str(getattr(bus, 'channel_info', 'can'))
+        self._queues = (deque(), deque(), deque())
+        # 速度帧合并槽：ID -> 待发送的消息副本；另备一份发送中副本，写线程发送时不与生产者共享缓冲区
+        self._speed_pending = {}
+        self._speed_slots = {}
+        self._speed_inflight = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        # 计数器
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'can-tx-{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    # 发送完队列中剩余的帧后停止写线程（不关闭底层总线）
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def depth(self):
+        return sum(len(q) for q in self._queues)
+
+    # 入队；非速度帧按引用入队，调用方在发送后不得再修改该消息
+    def send(self, msg, timeout=None, priority=None):
+        prio = classify(msg) if priority is None else priority
+        with self._cond:
+            if prio == PRIO_SPEED:
+                msg_id = msg.arbitration_id
+                slot = self._speed_pending.get(msg_id)
+                if slot is not None:
+                    # 该电机已有未发送的速度帧，直接覆盖为最新设定值
+                    slot.data[:] = msg.data
+                    self.coalesced += 1
+                    return
+                slot = self._speed_slots.get(msg_id)
+                if slot is None:
+                    slot = can.Message(arbitration_id=msg_id, data=bytearray(msg.data), is_extended_id=msg.is_extended_id)
+                    self._speed_slots[msg_id] = slot
+                    self._speed_inflight[msg_id] = can.Message(arbitration_id=msg_id, data=bytearray(msg.data), is_extended_id=msg.is_extended_id)
+                else:
+                    slot.data[:] = msg.data
+                if not self._make_room(prio):
+                    return
+                self._speed_pending[msg_id] = slot
+                self._queues[PRIO_SPEED].append(msg_id)
+            else:
+                if prio == PRIO_CONTROL and len(msg.data) > 1 and msg.data[1] in CANCELS_SPEED:
+                    # 停止/使能之前的速度设定已经失效，从队列中撤销；之后再发的速度帧照常发送
+                    if self._speed_pending.pop(msg.arbitration_id, None) is not None:
+                        self._queues[PRIO_SPEED].remove(msg.arbitration_id)
+                        self.cancelled += 1
+                if not self._make_room(prio):
+                    return
+                self._queues[prio].append(msg)
+            depth = self.depth()
+            if depth > self.max_depth:
+                self.max_depth = depth
+            self._cond.notify()
+
+    # 队列已满时丢弃优先级更低的最旧帧；没有更低优先级的帧则丢弃新帧
+    def _make_room(self, prio):
+        if self.depth() < self.maxsize:
+            return True
+        for victim in (PRIO_SPEED, PRIO_HEARTBEAT):
+            if victim > prio and self._queues[victim]:
+                item = self._queues[victim].popleft()
+                if victim == PRIO_SPEED:
+                    del self._speed_pending[item]
+                self.dropped += 1
+                return True
+        self.dropped += 1
+        return False
+
+    # 取出优先级最高的一帧；速度帧复制到发送中副本后释放合并槽
+    def _pop(self):
+        for prio, queue in enumerate(self._queues):
+            if queue:
+                item = queue.popleft()
+                if prio == PRIO_SPEED:
+                    slot = self._speed_pending.pop(item)
+                    inflight = self._speed_inflight[item]
+                    inflight.data[:] = slot.data
+                    return prio, inflight
+                return prio, item
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self.depth():
+                    self._cond.wait()
+                prio, msg = self._pop()
+                if msg is None:
+                    # 已停止且队列为空
+                    return
+            attempts = 1 + (self.control_retries if prio == PRIO_CONTROL else 0)
+            for attempt in range(attempts):
+                try:
+                    self.raw_bus.send(msg, timeout=self.send_timeout)
+                    self.sent += 1
+                    break
+                except can.CanError:
+                    self.errors += 1
+                    # 发送缓冲区满时稍等再重试控制帧，其他帧直接放弃（会有更新的帧替代）
+                    if attempt + 1 < attempts:
+                        time.sleep(0.001)
+
+    def stats(self):
+        with self._cond:
+            depths = {PRIORITY_NAMES[i]: len(q) for i, q in enumerate(self._queues)}
+        return {
+            "depth": depths,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+        }
+
+
+# 发送管理器：按通道创建写线程，并按 MOTORS 顺序给出与原 buses 列表兼容的写线程列表
+class CanTxManager:
+    def __init__(self, buses_by_channel, maxsize=64):
+        self.writers = {channel: CanTxWriter(bus, maxsize=maxsize, name=channel).start()
+                        for channel, bus in buses_by_channel.items()}
+
+    def __getitem__(self, channel):
+        return self.writers[channel]
+
+    def motor_buses(self, motors=MOTORS):
+        return [self.writers[motor["channel"]] for motor in motors]
+
+    def stats(self):
+        return {channel: writer.stats() for channel, writer in self.writers.items()}
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
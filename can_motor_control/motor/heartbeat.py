@@ -0,0 +1,153 @@
+# 心跳调度模块 - 周期性发送 0x08 连接帧
+# SocketCAN 总线上交给内核 BCM（python-can 的 send_periodic）循环发送，不占用解释器；
+# 其他总线（virtual 等）使用按绝对时刻校正漂移的纯 Python 线程
+import threading
+import time
+from collections import deque
+
+import can
+
+from can_frames import MOTORS, station_nos, heartbeat_frame, make_message
+
+try:
+    from can.interfaces.socketcan import SocketcanBus
+except ImportError:  # 非 Linux 平台没有 SocketCAN
+    SocketcanBus = None
+
+# 伺服要求每100ms一帧，超过2秒收不到会认为离线
+HEARTBEAT_PERIOD = 0.1
+
+
+# 心跳间隔抖动统计
+class JitterStats:
+    def __init__(self, period, window=1000):
+        self.period = period
+        self._intervals = deque(maxlen=window)
+        self._last = None
+        self._lock = threading.Lock()
+
+    # 记录一次发送（或观测到）心跳的时刻
+    def record(self, timestamp):
+        with self._lock:
+            if self._last is not None:
+                self._intervals.append(timestamp - self._last)
+            self._last = timestamp
+
+    def reset(self):
+        with self._lock:
+            self._intervals.clear()
+            self._last = None
+
+    # 返回统计快照，单位秒；jitter 为实际间隔与目标周期之差的绝对值
+    def snapshot(self):
+        with self._lock:
+            intervals = sorted(self._intervals)
+        if not intervals:
+            return {"count": 0}
+        jitter = sorted(abs(i - self.period) for i in intervals)
+        n = len(intervals)
+        return {
+            "count": n,
+            "mean": sum(intervals) / n,
+            "min": intervals[0],
+            "max": intervals[-1],
+            "jitter_mean": sum(jitter) / n,
+            "jitter_p99": jitter[min(n - 1, int(n * 0.99))],
+            "jitter_max": jitter[-1],
+        }
+
+
+# 取出底层总线（buses 中可能是 can_tx.CanTxWriter）
+def raw_bus(bus):
+    return getattr(bus, 'raw_bus', bus)
+
+
+# 判断总线是否可以使用内核 BCM 循环发送
+def supports_bcm(bus):
+    return SocketcanBus is not None and isinstance(raw_bus(bus), SocketcanBus)
+
+
+class HeartbeatScheduler:
+    # buses: 与 MOTORS 一一对应的总线列表，如 [bus0, bus0, bus1, bus1]
+    # mode: 'auto' 在 SocketCAN 上用 BCM，否则用线程；'bcm' / 'thread' 强制指定
+    def __init__(self, buses, period=HEARTBEAT_PERIOD, mode='auto', motors=MOTORS, stations=station_nos):
+        self.buses = list(buses)
+        self.period = period
+        self.mode = mode
+        self.messages = [make_message(motor["id"], heartbeat_frame(stations[i])) for i, motor in enumerate(motors)]
+        self.jitter = JitterStats(period)
+        self.send_errors = 0
+        self.active_mode = None
+        self._tasks = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._notifier = None
+
+    def start(self):
+        if self.active_mode is not None:
+            return
+        use_bcm = self.mode == 'bcm' or (self.mode == 'auto' and all(supports_bcm(bus) for bus in self.buses))
+        if use_bcm:
+            # 每个电机ID一个 BCM 任务（BCM 任务要求同一任务内仲裁ID相同）
+            # BCM 任务直接挂在底层总线上，不经过发送队列
+            self._tasks = [raw_bus(bus).send_periodic(msg, self.period) for bus, msg in zip(self.buses, self.messages)]
+            self.active_mode = 'bcm'
+        else:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='heartbeat', daemon=True)
+            self._thread.start()
+            self.active_mode = 'thread'
+
+    def stop(self):
+        for task in self._tasks:
+            task.stop()
+        self._tasks = []
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        if self._notifier is not None:
+            self._notifier.stop()
+            self._notifier = None
+        self.active_mode = None
+
+    # 纯 Python 回退：按 start + k*period 的绝对时刻发送，单次延迟不会累积成漂移
+    def _run(self):
+        period = self.period
+        next_time = time.monotonic()
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            for bus, msg in zip(self.buses, self.messages):
+                try:
+                    bus.send(msg)
+                except can.CanError:
+                    self.send_errors += 1
+            if self._notifier is None:
+                self.jitter.record(now)
+            next_time += period
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                # 落后超过一个周期时跳过错过的时刻，不做补发
+                next_time += -(delay // period) * period
+                delay = next_time - time.monotonic()
+            self._stop_event.wait(max(0.0, delay))
+
+    # BCM 模式下发送在内核中完成，可挂接一个接收总线（如 vcan0 上另开的 socket）
+    # 用帧的内核时间戳统计实际发送间隔
+    def attach_monitor(self, rx_bus, motor_index=0):
+        target_id = self.messages[motor_index].arbitration_id
+        jitter = self.jitter
+        jitter.reset()
+
+        def on_message(msg):
+            if msg.arbitration_id == target_id and len(msg.data) > 1 and msg.data[1] == 0x08:
+                jitter.record(msg.timestamp)
+
+        self._notifier = can.Notifier(rx_bus, [on_message])
+
+    # 读取抖动统计
+    def stats(self):
+        result = self.jitter.snapshot()
+        result["mode"] = self.active_mode
+        result["send_errors"] = self.send_errors
+        return result
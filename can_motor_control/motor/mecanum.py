@@ -0,0 +1,59 @@
+# 麦克纳姆轮运动学模块 - 由车体参数 L/W 预先计算混合矩阵
+# 轮子顺序与 MOTORS 一致：左前、右前、右后、左后（右侧电机镜像安装，y 分量取反）
+# 正解：车体速度 (x, y, yaw) -> 四轮速度；逆解：四轮速度 -> 车体速度，用于里程计
+import numpy as np
+
+# 各轮对 x（左右）、y（前后）分量的符号
+_SIGN_X = (-1.0, -1.0, 1.0, 1.0)
+_SIGN_Y = (1.0, -1.0, -1.0, 1.0)
+
+
+class MecanumKinematics:
+    # L: 前后轮距，W: 左右轮距，speed_max: 单个电机的最大速度
+    def __init__(self, L=80, W=60, speed_max=5000):
+        self.L = L
+        self.W = W
+        self.speed_max = speed_max
+        # 转动力臂：车体以角速度 omega 转动时，每个轮子的线速度为 lever * omega
+        self.lever = (L + W) / 2.0
+        # 物理混合矩阵：(vx, vy, omega[rad/s]) -> 轮面线速度（与 L/W 同长度单位）
+        self.matrix = np.column_stack((_SIGN_X, _SIGN_Y, np.full(4, self.lever)))
+        # 归一化混合矩阵：yaw 以力臂归一化（yaw=1 即 omega=1/lever），与遥控器的 [-1,1] 摇杆输入对应
+        self.normalized_matrix = self.matrix * np.array([1.0, 1.0, 1.0 / self.lever])
+        # 逆解矩阵（最小二乘），四轮速度 -> 车体速度
+        self.inverse = np.linalg.pinv(self.matrix)
+        self.normalized_inverse = np.linalg.pinv(self.normalized_matrix)
+
+    # 整体等比缩放：任一轮超过 speed_max 时四个轮子一起缩小，保持运动方向不变
+    # wheels 为 (4,) 或 (N, 4)，原地修改并返回
+    def saturate(self, wheels, speed_max=None):
+        limit = self.speed_max if speed_max is None else speed_max
+        peak = np.abs(wheels).max(axis=-1, keepdims=True)
+        scale = np.minimum(1.0, limit / np.maximum(peak, 1e-9))
+        wheels *= scale
+        return wheels
+
+    # 单条指令：x/y/yaw 为 [-1,1] 的摇杆量，speed 为基础速度；返回 MOTORS 顺序的四轮速度
+    def mix(self, x, y, yaw, speed=1.0):
+        wheels = self.normalized_matrix @ np.array((x, y, yaw), dtype=np.float64)
+        wheels *= speed
+        return self.saturate(wheels)
+
+    # 批量指令：commands 为 (N, 3) 的 (x, y, yaw)，speed 为标量或 (N,)；返回 (N, 4)
+    def mix_batch(self, commands, speed=1.0):
+        commands = np.asarray(commands, dtype=np.float64)
+        wheels = commands @ self.normalized_matrix.T
+        wheels *= np.reshape(speed, (-1, 1)) if np.ndim(speed) else speed
+        return self.saturate(wheels)
+
+    # 物理量正解：(vx, vy, omega) -> 四轮线速度，支持 (3,) 或 (N, 3)，不做限幅
+    def twist_to_wheels(self, twist):
+        return np.asarray(twist, dtype=np.float64) @ self.matrix.T
+
+    # 物理量逆解：四轮线速度 -> (vx, vy, omega)，支持 (4,) 或 (N, 4)
+    def wheels_to_twist(self, wheels):
+        return np.asarray(wheels, dtype=np.float64) @ self.inverse.T
+
+    # 归一化逆解：四轮速度 -> (x, y, yaw) * speed，与 mix 互逆（未限幅时）
+    def wheels_to_command(self, wheels):
+        return np.asarray(wheels, dtype=np.float64) @ self.normalized_inverse.T
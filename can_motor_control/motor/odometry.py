@@ -0,0 +1,151 @@
+# 轮式里程计 - 四轮转速（指令值或伺服反馈）经麦克纳姆轮逆解得到车体速度，积分出位姿
+# - 坐标：启动（或 reset）时的车体位置为原点、朝向为 theta=0；x/y 与 omni_move 的 x（左右）、y（前后）同向
+# - theta 不做 ±π 归一化，连续累加，便于插值和求差
+# - 每次积分生成新的不可变快照 PoseSnapshot 并替换引用（双缓冲），读取方直接取引用，不加锁、不阻塞积分线程
+# - 保留最近的快照，pose_at(t) 按时间插值，视觉修正时可以对齐到图像采集时刻
+# 长度单位与车体参数 L/W 相同；distance_per_rev 为电机每转一圈轮子走过的距离，需按轮径和减速比设置
+import math
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+# 默认每转距离（与 L/W 同单位），实车需按 轮子周长 / 减速比 修改
+DISTANCE_PER_REV = 1.0
+
+# timestamp 为 time.time()，与视觉采集时间戳同一时钟；vx/vy/omega 为该时刻的车体速度
+PoseSnapshot = namedtuple('PoseSnapshot', 'timestamp x y theta vx vy omega')
+
+
+# 从快照 start 到 end 的位移，表示在 start 时刻的车体坐标系中：(dx, dy, dtheta)
+def body_delta(start, end):
+    dx, dy = end.x - start.x, end.y - start.y
+    c, s = math.cos(start.theta), math.sin(start.theta)
+    return np.array((c * dx + s * dy, -s * dx + c * dy, end.theta - start.theta))
+
+
+class Odometry:
+    # kinematics: MecanumKinematics（使用其 L/W 的逆解矩阵）
+    # max_dt: 单次积分的最大时间间隔，更新中断后恢复时不把整段空白按最后速度积分
+    def __init__(self, kinematics, distance_per_rev=DISTANCE_PER_REV, history=256, max_dt=0.1):
+        self.kinematics = kinematics
+        self.distance_per_rev = distance_per_rev
+        self.max_dt = max_dt
+        self._rpm_to_speed = distance_per_rev / 60.0
+        self._history = deque(maxlen=history)
+        self._snapshot = PoseSnapshot(None, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        self.updates = 0
+        self.skipped = 0
+
+    # 重置位姿（如视觉给出绝对位置时）
+    def reset(self, x=0.0, y=0.0, theta=0.0, timestamp=None):
+        prev = self._snapshot
+        snapshot = PoseSnapshot(timestamp if timestamp is not None else prev.timestamp,
+                                x, y, theta, prev.vx, prev.vy, prev.omega)
+        self._history.clear()
+        if snapshot.timestamp is not None:
+            self._history.append(snapshot)
+        self._snapshot = snapshot
+
+    # 积分一次：wheel_rpm 为 MOTORS 顺序的四轮转速；含 nan（反馈未知）时跳过
+    # 区间内的速度取上一次与本次的平均（梯形），航向取区间中点
+    def update(self, wheel_rpm, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        wheels = np.asarray(wheel_rpm, dtype=np.float64)
+        prev = self._snapshot
+        if np.isnan(wheels).any():
+            self.skipped += 1
+            return prev
+        vx, vy, omega = self.kinematics.wheels_to_twist(wheels * self._rpm_to_speed).tolist()
+        dt = 0.0 if prev.timestamp is None else min(max(timestamp - prev.timestamp, 0.0), self.max_dt)
+        avg_vx, avg_vy, avg_omega = (prev.vx + vx) * 0.5, (prev.vy + vy) * 0.5, (prev.omega + omega) * 0.5
+        mid = prev.theta + avg_omega * dt * 0.5
+        c, s = math.cos(mid), math.sin(mid)
+        snapshot = PoseSnapshot(timestamp,
+                                prev.x + (c * avg_vx - s * avg_vy) * dt,
+                                prev.y + (s * avg_vx + c * avg_vy) * dt,
+                                prev.theta + avg_omega * dt,
+                                vx, vy, omega)
+        self._history.append(snapshot)
+        # 替换引用即发布，读取方拿到的快照始终完整
+        self._snapshot = snapshot
+        self.updates += 1
+        return snapshot
+
+    # 最新位姿快照（不加锁）
+    def pose(self):
+        return self._snapshot
+
+    # 某时刻的位姿：在历史快照间线性插值；早于历史时返回最早一条，晚于最新时返回最新一条
+    def pose_at(self, timestamp):
+        # list(deque) 在持有 GIL 的情况下一次拷贝完成，积分线程同时追加也不会出错
+        history = list(self._history)
+        if not history:
+            return self._snapshot
+        if timestamp <= history[0].timestamp:
+            return history[0]
+        if timestamp >= history[-1].timestamp:
+            return history[-1]
+        lo, hi = 0, len(history) - 1
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if history[mid].timestamp <= timestamp:
+                lo = mid
+            else:
+                hi = mid
+        a, b = history[lo], history[hi]
+        k = (timestamp - a.timestamp) / (b.timestamp - a.timestamp)
+        return PoseSnapshot(timestamp, *(u + (v - u) * k for u, v in zip(a[1:], b[1:])))
+
+    # 从快照 start 到 end（默认最新）的车体坐标系位移 (dx, dy, dtheta)
+    def delta(self, start, end=None):
+        return body_delta(start, self._snapshot if end is None else end)
+
+    def stats(self):
+        pose = self._snapshot
+        return {
+            "x": pose.x,
+            "y": pose.y,
+            "theta_deg": math.degrees(pose.theta),
+            "updates": self.updates,
+            "skipped": self.skipped,
+        }
+
+
+# 按固定频率从 source() 读取四轮转速并积分（绝对时刻调度，不累积漂移）
+class OdometryTracker:
+    # source: 返回四轮转速的函数，如 CarController.commanded_speeds 或 MotorTelemetry.wheel_speeds
+    def __init__(self, odometry, source, rate_hz=100):
+        self.odometry = odometry
+        self.source = source
+        self.period = 1.0 / rate_hz
+        self.late_ticks = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='odometry', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stop_event.is_set():
+            self.odometry.update(self.source())
+            next_time += self.period
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                self.late_ticks += 1
+                next_time = time.monotonic()
+                delay = 0.0
+            self._stop_event.wait(delay)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
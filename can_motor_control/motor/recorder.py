@@ -0,0 +1,43 @@
+# CAN收发帧记录 - 写入 runtime_log 的二进制追踪文件，与遥控指令（EV_TELEOP）、检测结果（EV_DETECT）同一时间轴
+# - SocketCAN / vcan：每个接口另开一个只读 socket 监听，本机发出的帧（内核标记 MSG_DONTROUTE）记为发送，
+#   其余记为接收；内核 BCM 发出的心跳帧也能记录到。在独立的 Notifier 线程中记录，控制循环和发送线程不受影响
+# - sim：虚拟总线无法区分方向，由仿真伺服在收到指令（发送）和应答（接收）时记录
+# 时间戳使用帧的接收时间戳；追踪未开启时 record() 立即返回
+# 由 can_bus.open_buses(record=...) 挂接，默认在设置了环境变量 CAR_TRACE 或 CAR_RECORD_CAN 时开启
+import can
+
+from runtime_log import trace, EV_CAN_TX, EV_CAN_RX, CAN_CHANNEL_SHIFT
+
+
+class CanRecorder(can.Listener):
+    # channel_index: 通道在 can_bus.CHANNELS 中的位置（0: can0，1: can1）
+    def __init__(self, channel_index, binary_trace=trace):
+        self.channel_index = channel_index
+        self.trace = binary_trace
+        self._arg = channel_index << CAN_CHANNEL_SHIFT
+
+    def on_message_received(self, msg):
+        self.record(msg, msg.is_rx)
+
+    def record(self, msg, is_rx):
+        # 数据长度 8 记为 0，与 runtime_log 中的约定一致
+        event = (EV_CAN_RX if is_rx else EV_CAN_TX) | ((msg.dlc & 0x7) << 8)
+        self.trace.record(event, self._arg | msg.arbitration_id, msg.data, msg.timestamp)
+
+
+# 在一组接口上监听并记录；devices: 逻辑通道名 -> (python-can 接口, 设备名)，与 CanBackend.devices 相同
+class BusSniffer:
+    def __init__(self, devices, channels, binary_trace=trace):
+        self.buses = []
+        self.notifiers = []
+        for channel, (interface, device) in devices.items():
+            bus = can.Bus(interface=interface, channel=device)
+            self.buses.append(bus)
+            self.notifiers.append(can.Notifier(bus, [CanRecorder(channels.index(channel), binary_trace)]))
+
+    def stop(self):
+        for notifier in self.notifiers:
+            notifier.stop()
+        for bus in self.buses:
+            bus.shutdown()
+        self.notifiers, self.buses = [], []
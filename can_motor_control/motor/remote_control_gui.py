@@ -1,30 +1,22 @@
+# 启动耗时统计（CAR_IMPORTTIME=1 或 run_ws_gui.py --importtime），需在其他导入之前
+import startup
 import sys
 import math
-import time
-import threading
-import can
+# 本模块的界面类直接继承 Qt 控件，PyQt5 无法推迟导入；无界面运行请用 remote_control_ws_gui.py --headless
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel
 from PyQt5.QtCore import Qt, QPoint, QTimer
 from PyQt5.QtGui import QPainter, QColor
 
-# 电机参数
-MOTORS = [
-    {"id": 0x65, "channel": "can0"},  # 左前
-    {"id": 0x66, "channel": "can0"},  # 右前
-    {"id": 0x67, "channel": "can1"},  # 右后
-    {"id": 0x68, "channel": "can1"},  # 左后
-]
-station_nos = [0x01, 0x02, 0x03, 0x04]
-
-def speed_frame(station_no, speed_rpm):
-    speed_bytes = int(speed_rpm).to_bytes(4, byteorder='little', signed=True)
-    return [station_no, 0x20, 0x00, speed_bytes[0], speed_bytes[1], speed_bytes[2], speed_bytes[3], 0xFF]
-
-def send_motor_speeds(buses, speeds):
-    for i, motor in enumerate(MOTORS):
-        frame = speed_frame(station_nos[i], int(speeds[i]))
-        msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-        buses[i].send(msg)
+# 电机参数与速度帧编码见 can_frames.py
+from can_frames import MOTORS, station_nos, enable_frame, make_message
+from heartbeat import HeartbeatScheduler
+from can_tx import CanTxManager
+from can_bus import open_buses
+from mecanum import MecanumKinematics
+# 失联保护：GUI线程卡死时停止心跳并停车
+from watchdog import CommandWatchdog
+# 设定值平滑：独立线程以100Hz按加速度/加加速度限制输出速度
+from setpoint_ramp import RampStreamer
 
 class Joystick(QWidget):
     def __init__(self, label_text, max_radius=80, parent=None):
@@ -89,6 +81,8 @@ class RemoteControlWindow(QWidget):
         self.speed_slider = QLabel("0")
         self.speed = 0
         self.speed_max = 5000
+        # 车体参数：前后长80，左右宽60
+        self.kinematics = MecanumKinematics(L=80, W=60, speed_max=self.speed_max)
 
         # 右侧摇杆：yaw
         self.joystick_yaw = Joystick("Yaw转向", max_radius=80)
@@ -117,14 +111,20 @@ class RemoteControlWindow(QWidget):
 
         # 使能所有电机
         for i, motor in enumerate(MOTORS):
-            frame = [station_nos[i], 0x25, 0x01, 0, 0, 0, 0, 0xFF]
-            msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-            self.buses[i].send(msg)
+            self.buses[i].send(make_message(motor["id"], enable_frame(station_nos[i])))
 
-        # 启动心跳线程
-        self.heartbeat_running = True
-        self.heartbeat_thread = threading.Thread(target=self.heartbeat_loop)
-        self.heartbeat_thread.start()
+        # 启动周期心跳（SocketCAN上由内核BCM发送）
+        self.heartbeat = HeartbeatScheduler(self.buses)
+        self.heartbeat.start()
+
+        # 控制循环只更新目标转速，平滑线程负责逐步逼近并发送
+        self.streamer = RampStreamer(self.buses).start()
+
+        # 失联保护：摇杆指令来自本进程，不做指令过期判断（定时器停止时也没有人读取降速系数）；
+        # 控制定时器0.5秒没有运行（GUI线程卡死）则停止心跳，平滑线程以停车限制减速到0
+        self.watchdog = CommandWatchdog(liveness_timeout=0.5, heartbeat=self.heartbeat,
+                                        on_trip=lambda: self.streamer.set_target(None, stopping=True))
+        self.watchdog.start()
 
     def wheelEvent_speed(self, event):
         delta = event.angleDelta().y() // 120
@@ -132,49 +132,39 @@ class RemoteControlWindow(QWidget):
         self.speed_slider.setText(str(self.speed))
 
     def control_loop(self):
+        # 报告控制循环存活；摇杆按住不动时没有鼠标事件，但指令仍然有效
+        self.watchdog.tick()
         x, y = self.joystick_move.value  # [-1,1]
         speed = self.speed
         yaw, _ = self.joystick_yaw.value  # [-1,1]
-        # 车体参数
-        L = 80  # 前后长
-        W = 60  # 左右宽
-        # 菱形麦克纳姆轮速度解算（左前、右前、右后、左后）
-        v1 = speed * (y - x + yaw )   # 左前
-        v2 = speed * (-y - x + yaw)  # 右前
-        v3 = speed * (-y + x + yaw)  # 右后
-        v4 = speed * (y + x + yaw )   # 左后
-        speeds = [v1, v2, v3, v4]
-        send_motor_speeds(self.buses, speeds)
-
-    def heartbeat_loop(self):
-        while self.heartbeat_running:
-            for i, motor in enumerate(MOTORS):
-                frame = [station_nos[i], 0x08, 0, 0, 0, 0, 0, 0xFF]
-                msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-                self.buses[i].send(msg)
-            time.sleep(0.1)
-            #135792468
+        # 菱形麦克纳姆轮速度解算（左前、右前、右后、左后），任一轮超过speed_max时整体缩放
+        speeds = self.kinematics.mix(x, y, yaw, speed)
+        self.streamer.set_target(speeds)
 
     def closeEvent(self, event):
         self.timer.stop()
-        self.heartbeat_running = False
-        self.heartbeat_thread.join()
+        self.watchdog.stop()
+        # 减速停车后再停止心跳
+        self.streamer.set_target(None, stopping=True)
+        self.streamer.wait_settled(timeout=1.0)
+        self.streamer.stop()
+        self.heartbeat.stop()
         event.accept()
 
 if __name__ == '__main__':
-    import os
-    os.system("sudo ip link set can0 down")
-    os.system("sudo ip link set can0 type can bitrate 1000000")
-    os.system("sudo ip link set can0 up")
-    os.system("sudo ip link set can1 down")
-    os.system("sudo ip link set can1 type can bitrate 1000000")
-    os.system("sudo ip link set can1 up")
-
-    bus0 = can.interface.Bus(channel="can0", bustype='socketcan')
-    bus1 = can.interface.Bus(channel="can1", bustype='socketcan')
-    buses = [bus0, bus0, bus1, bus1]
+    startup.mark('导入')
+    # CAN后端由环境变量CAR_CAN_BACKEND选择：socketcan（默认，实车）/ vcan / sim（进程内仿真伺服）
+    backend = open_buses()
+    # 每个通道一个发送线程，QTimer控制循环与心跳不再直接争用总线
+    tx = CanTxManager(backend.buses)
+    buses = tx.motor_buses()
+    startup.mark('CAN初始化')
 
     app = QApplication(sys.argv)
     win = RemoteControlWindow(buses)
     win.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    startup.ready()
+    ret = app.exec_()
+    tx.close()
+    backend.shutdown()
+    sys.exit(ret)
\ No newline at end of file
@@ -1,164 +1,198 @@
 
-import sys
-import math
-import time
+# 启动耗时统计（CAR_IMPORTTIME=1 或 run_ws_gui.py --importtime），需在其他导入之前
+import startup
+import argparse
 import threading
-import can
-import tkinter as tk
 import asyncio
-import json
-import websockets
-
-# 电机参数
-MOTORS = [
-    {"id": 0x65, "channel": "can0"},  # 左前
-    {"id": 0x66, "channel": "can0"},  # 右前
-    {"id": 0x67, "channel": "can1"},  # 左后
-    {"id": 0x68, "channel": "can1"},  # 右后
-]
-station_nos = [0x01, 0x02, 0x03, 0x04]
-
-def speed_frame(station_no, speed_rpm):
-    speed_bytes = int(speed_rpm).to_bytes(4, byteorder='little', signed=True)
-    return [station_no, 0x20, 0x00, speed_bytes[0], speed_bytes[1], speed_bytes[2], speed_bytes[3], 0xFF]
-
-def send_motor_speeds(buses, speeds):
-    for i, motor in enumerate(MOTORS):
-        frame = speed_frame(station_nos[i], int(speeds[i]))
-        msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-        buses[i].send(msg)
+import logging
+# tkinter 只在显示界面时导入（--headless 不需要），websockets 在开始连接时导入
+
+# 电机参数与速度帧编码见 can_frames.py
+from can_frames import MOTORS, station_nos, enable_frame, make_message
+from heartbeat import HeartbeatScheduler
+from can_tx import CanTxManager
+from can_bus import open_buses
+from mecanum import MecanumKinematics
+# 日志经队列由后台线程输出，热循环中的日志按调用位置限流；可选二进制追踪
+from runtime_log import setup_logging, trace, pack_i16, EV_TELEOP, TELEOP_SCALE
+# 遥控指令协议：二进制帧优先，JSON回退；校验取值范围并按序号丢弃乱序指令
+from teleop_protocol import TeleopDecoder, HELLO
+# 事件驱动发送：收到新指令立即发送速度帧，带最大频率限制和保活重发
+from teleop_sender import TeleopSender
+# 设定值平滑：每个轮子限制加速度和加加速度
+from setpoint_ramp import SetpointRamp
+# 失联保护：指令过期时降速到0，事件循环卡死时停止心跳并发送停止帧
+from watchdog import CommandWatchdog, stop_motors
+
+log = logging.getLogger('ws_gui')
+
+# 界面刷新周期（毫秒），只在Tk线程中读取最新指令更新标签
+GUI_REFRESH_MS = 100
 
 class RemoteControlWSGUI:
-    def __init__(self, root):
+    # root 为 None 时不显示界面（无显示器的车载运行），只保存最新指令
+    def __init__(self, root=None):
         self.root = root
-        self.root.title('WebSocket Remote Control Monitor')
-        self.joy_label = tk.Label(root, text='Joy: [0, 0]', font=('Arial', 16))
-        self.joy_label.pack(pady=10)
-        self.throttle1_label = tk.Label(root, text='Throttle1: 0', font=('Arial', 16))
-        self.throttle1_label.pack(pady=10)
-        self.throttle2_label = tk.Label(root, text='Throttle2: 0', font=('Arial', 16))
-        self.throttle2_label.pack(pady=10)
         # 控制数据
         self.joy = [0, 0]
         self.throttle1 = 0
         self.throttle2 = 0
         self.buses = None
-        self.heartbeat_running = False
-
+        self.heartbeat = None
+        self.sender = None
+        self.loop = None
+        self._shown = None
+        # 车体参数 - 与remote_control_gui.py保持一致
+        self.kinematics = MecanumKinematics(L=80, W=60, speed_max=5000)
+        if root is not None:
+            import tkinter as tk
+            self.root.title('WebSocket Remote Control Monitor')
+            self.joy_label = tk.Label(root, text='Joy: [0, 0]', font=('Arial', 16))
+            self.joy_label.pack(pady=10)
+            self.throttle1_label = tk.Label(root, text='Throttle1: 0', font=('Arial', 16))
+            self.throttle1_label.pack(pady=10)
+            self.throttle2_label = tk.Label(root, text='Throttle2: 0', font=('Arial', 16))
+            self.throttle2_label.pack(pady=10)
+            # 标签由Tk线程定时刷新，WebSocket线程不直接操作Tk
+            self.root.after(GUI_REFRESH_MS, self.refresh)
+
+    # WebSocket线程调用：只保存最新指令
     def update_values(self, joy, throttle1, throttle2):
         self.joy = joy
         self.throttle1 = throttle1
         self.throttle2 = throttle2
-        self.joy_label.config(text=f'Joy: {joy}')
-        self.throttle1_label.config(text=f'Throttle1: {throttle1}')
-        self.throttle2_label.config(text=f'Throttle2: {throttle2}')
+
+    # Tk线程中定时执行：指令有变化时才更新标签
+    def refresh(self):
+        values = (tuple(self.joy), self.throttle1, self.throttle2)
+        if values != self._shown:
+            self._shown = values
+            joy = [round(v, 2) for v in values[0]]
+            self.joy_label.config(text=f'Joy: {joy}')
+            self.throttle1_label.config(text=f'Throttle1: {values[1]:.0f}')
+            self.throttle2_label.config(text=f'Throttle2: {values[2]:.2f}')
+        self.root.after(GUI_REFRESH_MS, self.refresh)
 
     def set_buses(self, buses):
         self.buses = buses
         # 使能所有电机
         for i, motor in enumerate(MOTORS):
-            frame = [station_nos[i], 0x25, 0x01, 0, 0, 0, 0, 0xFF]
-            msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-            self.buses[i].send(msg)
-        # 启动心跳线程
-        self.heartbeat_running = True
-        self.heartbeat_thread = threading.Thread(target=self.heartbeat_loop)
-        self.heartbeat_thread.start()
-
-    def heartbeat_loop(self):
-        while self.heartbeat_running:
-            for i, motor in enumerate(MOTORS):
-                frame = [station_nos[i], 0x08, 0, 0, 0, 0, 0, 0xFF]
-                msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-                self.buses[i].send(msg)
-            time.sleep(0.1)
-
-    def control_loop(self):
-        # 麦克纳姆轮速度解算 - 与remote_control_gui.py保持一致
-        x, y = self.joy  # [-1,1]
-        speed = self.throttle1  # 速度
-        yaw = self.throttle2    # yaw
-        # 车体参数 - 与remote_control_gui.py保持一致
-        L = 80  # 前后长
-        W = 60  # 左右宽
-        # 菱形麦克纳姆轮速度解算（左前、右前、右后、左后）
-        v1 = speed * (y - x + yaw )   # 左前
-        v2 = speed * (-y - x + yaw)  # 右前
-        v3 = speed * (-y + x + yaw)  # 右后
-        v4 = speed * (y + x + yaw )   # 左后
-        speeds = [v1, v2, v3, v4]
-        send_motor_speeds(self.buses, speeds)
+            self.buses[i].send(make_message(motor["id"], enable_frame(station_nos[i])))
+        # 启动周期心跳（SocketCAN上由内核BCM发送）
+        self.heartbeat = HeartbeatScheduler(self.buses)
+        self.heartbeat.start()
 
     def close(self):
-        self.heartbeat_running = False
-        if hasattr(self, 'heartbeat_thread'):
-            self.heartbeat_thread.join()
+        # 在事件循环线程中停止发送器（无界面时事件循环已在主线程中结束）
+        if self.sender is not None and self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.sender.stop)
+            log.info("Teleop sender: %s, latency: %s", self.sender.stats(), self.sender.latency_stats())
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
 
 # WebSocket服务器地址和端口（请根据Unity端实际配置修改）
 WS_SERVER = 'ws://localhost:8765'
 
-async def ws_listener(gui):
-    print(f"[ws_listener] Connecting to {WS_SERVER}")
+async def ws_listener(gui, sender):
+    import websockets
+    log.info("Connecting to %s", WS_SERVER)
     async with websockets.connect(WS_SERVER) as websocket:
-        print("[ws_listener] Connected, waiting for messages...")
+        log.info("Connected, waiting for messages...")
+        # 声明支持的帧格式，客户端可改发30字节的二进制帧
+        await websocket.send(HELLO)
+        decoder = TeleopDecoder()
         while True:
             try:
                 msg = await websocket.recv()
-                print(f"[ws_listener] Received message: {msg}")
-                data = json.loads(msg)
-                joy = data.get('joy', [0, 0])
-                throttle1 = data.get('throttle1', 0)
-                throttle2 = data.get('throttle2', 0)
-                print(f"[ws_listener] Parsed joy={joy}, throttle1={throttle1}, throttle2={throttle2}")
-                gui.update_values(joy, throttle1, throttle2)
+                command = decoder.decode(msg)
+                if command is None:
+                    # 格式错误、超出范围或乱序的指令直接丢弃，保持上一条有效指令
+                    log.warning("Dropped message: %s", decoder.last_error, extra={'rate_interval': 1.0})
+                    continue
+                joy = [command.joy_x, command.joy_y]
+                # 每条消息只记录一次（限流），追踪中保存摇杆、yaw（千分比）和速度，可由 replay.py --teleop 回放
+                log.debug("Received joy=%s, throttle1=%s, throttle2=%s", joy, command.throttle1, command.throttle2)
+                trace.record(EV_TELEOP, command.seq or 0,
+                             pack_i16(command.joy_x * TELEOP_SCALE, command.joy_y * TELEOP_SCALE, command.throttle1,
+                                      command.throttle2 * TELEOP_SCALE))
+                # 收到即发送：麦克纳姆轮解算和速度帧发送在同一个事件循环中完成
+                sender.submit(command.joy_x, command.joy_y, command.throttle1, command.throttle2)
+                gui.update_values(joy, command.throttle1, command.throttle2)
             except Exception as e:
-                print('[ws_listener] WebSocket error:', e)
+                log.warning('WebSocket error: %s', e)
                 await asyncio.sleep(1)
 
-def can_init():
-    import os
-    os.system("sudo ip link set can0 down")
-    os.system("sudo ip link set can0 type can bitrate 1000000")
-    os.system("sudo ip link set can0 up")
-    os.system("sudo ip link set can1 down")
-    os.system("sudo ip link set can1 type can bitrate 1000000")
-    os.system("sudo ip link set can1 up")
-    bus0 = can.interface.Bus(channel="can0", bustype='socketcan')
-    bus1 = can.interface.Bus(channel="can1", bustype='socketcan')
-    buses = [bus0, bus0, bus1, bus1]
-    return buses
+# backend: socketcan（实车）/ vcan / sim（进程内仿真伺服），默认取环境变量CAR_CAN_BACKEND
+def can_init(backend=None):
+    buses = open_buses(backend)
+    # 每个通道一个发送线程，控制线程与心跳经由发送队列写总线
+    return CanTxManager(buses.buses)
+
+# 同一个事件循环负责WebSocket接收和CAN发送，取代原来每50ms轮询的控制线程
+async def teleop_main(gui):
+    gui.loop = asyncio.get_running_loop()
+    # 菱形麦克纳姆轮速度解算（左前、右前、右后、左后），任一轮超过speed_max时整体缩放
+    # 两次发送至少间隔10ms；200ms没有新指令时重发当前设定值
+    # WebSocket 0.5秒没有新指令时0.5秒内降速到0；事件循环1秒没有运行则停止心跳
+    # 目标转速经加速度/加加速度限制后每10ms发送一次，直到到达目标
+    watchdog = CommandWatchdog(deadline=0.5, ramp_time=0.5, liveness_timeout=1.0,
+                               heartbeat=gui.heartbeat, on_trip=lambda: stop_motors(gui.buses)).start()
+    gui.sender = TeleopSender(gui.buses, gui.kinematics, min_interval=0.01, keepalive=0.2, watchdog=watchdog,
+                              ramp_step=0.01, ramp=SetpointRamp())
+    sender_task = asyncio.create_task(gui.sender.run())
+    try:
+        await ws_listener(gui, gui.sender)
+    finally:
+        gui.sender.stop()
+        await sender_task
+        watchdog.stop()
+        # 监听结束（连接失败等）后不再发送速度帧，直接停车
+        stop_motors(gui.buses)
 
 def start_ws(gui):
-    asyncio.run(ws_listener(gui))
-
-def periodic_control(gui):
-    print("[periodic_control] Control loop started.")
-    while True:
-        if gui.buses:
-            print(f"[periodic_control] Calling control_loop with joy={gui.joy}, throttle1={gui.throttle1}, throttle2={gui.throttle2}")
-            gui.control_loop()
-        time.sleep(0.05)
+    asyncio.run(teleop_main(gui))
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='WebSocket远程控制')
+    parser.add_argument('--headless', action='store_true', help='不显示界面，在主线程中运行WebSocket监听和发送')
+    args = parser.parse_args()
+    setup_logging()
+    startup.mark('导入')
     print('启动 remote_control_ws_gui.py')
-    root = tk.Tk()
-    gui = RemoteControlWSGUI(root)
+    if args.headless:
+        gui = RemoteControlWSGUI()
+    else:
+        import tkinter as tk
+        root = tk.Tk()
+        gui = RemoteControlWSGUI(root)
+        startup.mark('创建界面')
     print('初始化 CAN 总线...')
-    buses = can_init()
-    gui.set_buses(buses)
-    print('CAN 初始化完成，启动 WebSocket 监听和控制线程...')
-
-    import threading
-    def ws_thread():
+    tx = can_init()
+    gui.set_buses(tx.motor_buses())
+    startup.mark('CAN初始化')
+    print('CAN 初始化完成，启动 WebSocket 监听和发送事件循环...')
+    if args.headless:
+        startup.ready('进入事件循环')
         print(f'尝试连接 WebSocket: {WS_SERVER}')
-        start_ws(gui)
-    threading.Thread(target=ws_thread, daemon=True).start()
-    threading.Thread(target=periodic_control, args=(gui,), daemon=True).start()
-
-    def on_close():
-        print('关闭窗口，停止心跳线程')
-        gui.close()
-        root.destroy()
-    root.protocol("WM_DELETE_WINDOW", on_close)
-    print('进入主循环，等待数据...')
-    root.mainloop()
+        try:
+            start_ws(gui)
+        except KeyboardInterrupt:
+            print('收到中断，停止心跳线程')
+        finally:
+            gui.close()
+            tx.close()
+    else:
+        def ws_thread():
+            print(f'尝试连接 WebSocket: {WS_SERVER}')
+            start_ws(gui)
+        threading.Thread(target=ws_thread, daemon=True).start()
+
+        def on_close():
+            print('关闭窗口，停止心跳线程')
+            gui.close()
+            tx.close()
+            root.destroy()
+        root.protocol("WM_DELETE_WINDOW", on_close)
+        print('进入主循环，等待数据...')
+        startup.ready()
+        root.mainloop()
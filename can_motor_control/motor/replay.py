@@ -0,0 +1,174 @@
+# 追踪文件回放 - 在虚拟总线（仿真伺服）上重现现场记录，用实际工作负载测试控制链路
+# - CAN：把记录的发送帧（EV_CAN_TX，含 BCM 心跳帧）按原时间间隔或最快速度发到 sim/vcan 后端，仿真伺服照常执行
+# - 遥控（--teleop）：把记录的 WebSocket 指令（EV_TELEOP）交给 TeleopSender，重新经过运动学解算、设定值平滑、
+#   编码和发送；原速回放使用与 remote_control_ws_gui.py 相同的参数，最快速度时关闭限频和平滑，逐条发送
+# 追踪文件 mmap 读取（runtime_log.load_trace），同一时间轴上的检测结果（EV_DETECT）一并统计
+# 只允许回放到 sim / vcan，不会驱动实车
+# 用法:
+#   CAR_TRACE=trace.bin python remote_control_ws_gui.py     # 现场记录
+#   python replay.py trace.bin                              # 原速回放CAN发送帧
+#   python replay.py trace.bin --speed 0                    # 最快速度
+#   python replay.py trace.bin --teleop --speed 2           # 两倍速回放遥控指令
+#   python replay.py trace.bin --record replay.bin          # 回放时记录，可与原记录对比
+import argparse
+import asyncio
+import time
+
+import can
+import numpy as np
+
+from can_bus import open_buses, CHANNELS
+from can_frames import MOTORS, station_nos, enable_frame, make_message
+from heartbeat import HeartbeatScheduler
+from runtime_log import (trace, load_trace, unpack_can, unpack_i16, EVENT_NAMES, EVENT_MASK, EV_CAN_TX, EV_CAN_RX,
+                         EV_TELEOP, EV_DETECT, TELEOP_SCALE)
+
+
+# 指定类型的记录，按时间戳排序（记录线程不同，文件中的顺序可能略有交错）
+def select(records, event):
+    selected = records[(records['event'] & EVENT_MASK) == event]
+    return selected[np.argsort(selected['timestamp'], kind='stable')]
+
+
+def summary(records):
+    if len(records) == 0:
+        return "空文件"
+    counts = np.bincount(records['event'] & EVENT_MASK)
+    span = records['timestamp'].max() - records['timestamp'].min()
+    parts = [f"{EVENT_NAMES.get(event, event)} {count}" for event, count in enumerate(counts) if count]
+    return f"{len(records)} 条记录，时长 {span:.2f}s: " + ", ".join(parts)
+
+
+# 等到 start + offset / speed；speed 为 0 时不等待。返回相对计划时刻的滞后（秒）
+def wait_until(start, offset, speed):
+    if not speed:
+        return 0.0
+    due = start + offset / speed
+    delay = due - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    return time.perf_counter() - due
+
+
+def replay_can(records, backend, speed):
+    frames = select(records, EV_CAN_TX)
+    if len(frames) == 0:
+        return 0, 0.0, np.zeros(0)
+    buses = [backend.buses[channel] for channel in CHANNELS]
+    # 预先构造全部帧，回放循环中只有等待和发送
+    messages = []
+    for event, arg, data in zip(frames['event'], frames['arg'], frames['data']):
+        channel, can_id, dlc = unpack_can(int(event), int(arg))
+        messages.append((buses[channel], can.Message(arbitration_id=can_id, data=bytes(data)[:dlc],
+                                                     is_extended_id=can_id > 0x7FF)))
+    offsets = frames['timestamp'] - frames['timestamp'][0]
+    lateness = np.empty(len(messages))
+    start = time.perf_counter()
+    for i, (bus, msg) in enumerate(messages):
+        lateness[i] = wait_until(start, offsets[i], speed)
+        bus.send(msg)
+    return len(messages), time.perf_counter() - start, lateness
+
+
+async def replay_teleop(records, backend, speed):
+    from teleop_sender import TeleopSender
+    from setpoint_ramp import SetpointRamp
+    commands = select(records, EV_TELEOP)
+    if len(commands) == 0:
+        return 0, 0.0, None
+    buses = [backend.buses[motor["channel"]] for motor in MOTORS]
+    # 与 remote_control_ws_gui.py 相同：先使能电机并启动心跳（CAN回放时心跳帧来自记录）
+    for i, motor in enumerate(MOTORS):
+        buses[i].send(make_message(motor["id"], enable_frame(station_nos[i])))
+    heartbeat = HeartbeatScheduler(buses)
+    heartbeat.start()
+    if speed:
+        sender = TeleopSender(buses, min_interval=0.01, keepalive=0.2, ramp_step=0.01, ramp=SetpointRamp())
+    else:
+        sender = TeleopSender(buses, min_interval=0.0, keepalive=0.2)
+    task = asyncio.create_task(sender.run())
+    loop = asyncio.get_running_loop()
+    offsets = commands['timestamp'] - commands['timestamp'][0]
+    start = loop.time()
+    try:
+        for offset, data in zip(offsets, commands['data']):
+            joy_x, joy_y, throttle1, throttle2 = unpack_i16(data)
+            if speed:
+                await asyncio.sleep(max(0.0, start + offset / speed - loop.time()))
+            handled = sender.sent + sender.unchanged
+            sender.submit(joy_x / TELEOP_SCALE, joy_y / TELEOP_SCALE, float(throttle1), throttle2 / TELEOP_SCALE)
+            if not speed:
+                # 最快速度：等发送器处理完这一条再提交下一条，不合并
+                while sender.sent + sender.unchanged == handled:
+                    await asyncio.sleep(0)
+        elapsed = loop.time() - start
+        # 等待平滑到达最后的目标
+        while sender.ramp is not None and not sender.ramp.settled:
+            await asyncio.sleep(0.01)
+    finally:
+        sender.stop()
+        await task
+        heartbeat.stop()
+    return len(commands), elapsed, sender
+
+
+def ms_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    return f"p50 {np.percentile(ms, 50):.3f} p99 {np.percentile(ms, 99):.3f} max {ms.max():.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放追踪文件中的CAN发送帧或遥控指令')
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速，0 表示最快速度')
+    parser.add_argument('--teleop', action='store_true', help='回放遥控指令而不是CAN发送帧')
+    parser.add_argument('--backend', default='sim', choices=['sim', 'vcan'])
+    parser.add_argument('--tau', type=float, default=0.05, help='仿真电机一阶时间常数（秒）')
+    parser.add_argument('--record', default=None, help='回放时记录到该追踪文件')
+    args = parser.parse_args()
+
+    records = load_trace(args.path)
+    print(f"{args.path}: {summary(records)}")
+    detections = select(records, EV_DETECT)
+    if len(detections):
+        print(f"检测结果 {len(detections)} 条，帧序号 {detections['arg'][0]}～{detections['arg'][-1]}")
+
+    backend = open_buses(args.backend, record=bool(args.record), tau=args.tau)
+    if backend.simulator is None:
+        backend.attach_simulator(tau=args.tau)
+    if args.record:
+        trace.start(args.record)
+    try:
+        if args.teleop:
+            count, elapsed, sender = asyncio.run(replay_teleop(records, backend, args.speed))
+            if count:
+                print(f"遥控指令 {count} 条，用时 {elapsed:.3f}s，发送器: {sender.stats()}")
+                if sender.latencies:
+                    print(f"指令到发送 {ms_stats(sender.latencies)}")
+            else:
+                print("没有遥控指令（记录时需设置 CAR_TRACE 并运行 remote_control_ws_gui.py）")
+        else:
+            count, elapsed, lateness = replay_can(records, backend, args.speed)
+            if count:
+                print(f"CAN发送帧 {count} 条，用时 {elapsed:.3f}s（{count / elapsed:.0f} 帧/s）")
+                if args.speed:
+                    print(f"相对计划时刻的滞后 {ms_stats(lateness)}")
+            else:
+                print("没有CAN发送帧（记录时需设置 CAR_TRACE 或 CAR_RECORD_CAN）")
+        # 等待仿真伺服处理完总线上剩余的帧
+        time.sleep(0.1)
+        print(f"仿真伺服: {backend.simulator.stats()}")
+        for motor, state in zip(MOTORS, backend.simulator.states()):
+            print(f"  {motor['id']:#x} 转速 {state['speed']:8.1f} rpm  位置 {state['position']:10.0f}  "
+                  f"{'使能' if state['enabled'] else '未使能'}{'' if state['online'] else '（离线）'}")
+        recorded = select(records, EV_CAN_RX)
+        if len(recorded):
+            print(f"原记录中的伺服应答 {len(recorded)} 条")
+    finally:
+        if args.record:
+            trace.stop()
+        backend.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+# 日志与运行追踪 - 替代热循环中的逐条 print
+# - 日志记录只放入有界队列（满时丢弃），由后台线程写终端，控制循环不等待终端/SSH输出
+# - 每个调用位置（文件+行号）的 INFO 及以下日志默认每秒最多输出一条，并注明省略了多少条
+# - 二进制追踪：每个事件 22 字节（时间戳、事件类型、参数、8字节数据），可在运行时开关
+#   文件只追加、定长记录，可直接 mmap 为 numpy 结构化数组（load_trace），回放见 replay.py
+#     kill -USR1 <pid>              # 开始/停止追踪
+#     CAR_TRACE=trace.bin python ...  # 启动时即开始追踪（同时记录 can0/can1 收发帧，见 recorder.py）
+#     python runtime_log.py dump trace.bin
+# 日志级别由 setup_logging(level) 或环境变量 CAR_LOG_LEVEL 指定
+import argparse
+import atexit
+import logging
+import logging.handlers
+import mmap
+import os
+import queue
+import signal
+import struct
+import sys
+import threading
+import time
+
+# 追踪事件类型
+EV_CAN_TX = 1
+EV_CAN_RX = 2
+EV_TELEOP = 3
+EV_VISION = 4
+EV_DETECT = 5
+EVENT_NAMES = {EV_CAN_TX: 'can_tx', EV_CAN_RX: 'can_rx', EV_TELEOP: 'teleop', EV_VISION: 'vision',
+               EV_DETECT: 'detect'}
+
+# 追踪记录：f64 时间戳 | u16 事件类型 | u32 参数（如CAN ID、帧序号） | 8 字节数据
+TRACE_RECORD = struct.Struct('<dHI8s')
+# 同样布局的 numpy 结构化类型（无对齐填充），供 load_trace 直接映射文件
+TRACE_FIELDS = [('timestamp', '<f8'), ('event', '<u2'), ('arg', '<u4'), ('data', 'V8')]
+_I16X4 = struct.Struct('<4h')
+
+# CAN 帧记录：事件类型低 8 位为 EV_CAN_TX/EV_CAN_RX，高 8 位为数据长度（0 表示 8 字节）
+# 参数高 3 位为通道序号（can_bus.CHANNELS 中的位置），低 29 位为仲裁ID
+EVENT_MASK = 0xFF
+CAN_CHANNEL_SHIFT = 29
+CAN_ID_MASK = (1 << CAN_CHANNEL_SHIFT) - 1
+# 遥控与检测记录中浮点数的定点倍数（int16）
+TELEOP_SCALE = 1000
+DETECT_SCALE = 10000
+
+_listener = None
+
+
+# 队列满时直接丢弃，不阻塞也不打印异常
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# 按调用位置限流：同一文件同一行的日志在 interval 秒内只输出一条
+# 单条日志可通过 extra={'rate_interval': 秒} 指定间隔，0 表示不限流
+class RateLimitFilter(logging.Filter):
+    def __init__(self, interval=1.0, max_level=logging.INFO):
+        super().__init__()
+        self.interval = interval
+        self.max_level = max_level
+        # (文件, 行号) -> [上次输出时间, 省略条数]
+        self._sites = {}
+
+    def filter(self, record):
+        interval = getattr(record, 'rate_interval', None)
+        if interval is None:
+            interval = self.interval if record.levelno <= self.max_level else 0
+        if not interval:
+            return True
+        key = (record.pathname, record.lineno)
+        site = self._sites.get(key)
+        if site is not None and record.created - site[0] < interval:
+            site[1] += 1
+            return False
+        if site is not None and site[1]:
+            record.msg = f"{record.msg} (省略 {site[1]} 条)"
+        self._sites[key] = [record.created, 0]
+        return True
+
+
+# 延迟格式化的十六进制显示，只有日志真正输出时才格式化
+class hexdump:
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return ' '.join(f'{b:02X}' for b in self.data)
+
+
+# 最多4个整数打包为8字节追踪数据（超出 int16 范围的截断）
+def pack_i16(*values):
+    values = [max(-32768, min(32767, int(v))) for v in values] + [0] * (4 - len(values))
+    return _I16X4.pack(*values)
+
+
+def unpack_i16(payload):
+    return _I16X4.unpack(bytes(payload))
+
+
+class BinaryTrace:
+    # capacity: 每个缓冲区的记录数，写满后交给后台线程写文件
+    # max_pending: 等待写入的缓冲区上限，磁盘跟不上时丢弃整块缓冲区并计数，记录方永不阻塞
+    def __init__(self, capacity=1024, max_pending=64):
+        self.enabled = False
+        self.path = None
+        self.capacity = capacity
+        self._buf = bytearray(capacity * TRACE_RECORD.size)
+        self._offset = 0
+        self._lock = threading.Lock()
+        # start/stop 之间互斥；record() 只使用 _lock，停止时等待写线程不影响记录方
+        self._control = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._file = None
+        self._writer = None
+        self.records = 0
+        self.dropped = 0
+
+    def start(self, path='trace.bin'):
+        with self._control, self._lock:
+            if self.enabled:
+                return
+            self.path = path
+            self._file = open(path, 'ab')
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+                self._writer.start()
+            self.enabled = True
+        logging.getLogger(__name__).info("二进制追踪已开始: %s", path)
+
+    def stop(self):
+        with self._control:
+            with self._lock:
+                if not self.enabled:
+                    return
+                self.enabled = False
+                self._flush_locked()
+            # 停止标记不可丢弃，队列满时在锁外等待写线程腾出位置，record() 不受影响
+            self._queue.put(None)
+            self._queue.join()
+        logging.getLogger(__name__).info("二进制追踪已停止: %d 条记录，丢弃 %d 条", self.records, self.dropped)
+
+    def toggle(self, path=None):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start(path or self.path or 'trace.bin')
+
+    # 热路径调用：未开启时只有一次属性判断；timestamp 默认取当前时间（如CAN帧可传入接收时间戳）
+    def record(self, event, arg=0, payload=b'', timestamp=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self.enabled:
+                return
+            TRACE_RECORD.pack_into(self._buf, self._offset, timestamp or time.time(), event, arg & 0xFFFFFFFF,
+                                   bytes(payload))
+            self._offset += TRACE_RECORD.size
+            self.records += 1
+            if self._offset == len(self._buf):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._offset:
+            try:
+                self._queue.put_nowait(bytes(self._buf[:self._offset]))
+            except queue.Full:
+                self.dropped += self._offset // TRACE_RECORD.size
+            self._offset = 0
+
+    def _write_loop(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                # 停止标记：关闭文件（下次 start 重新打开）
+                self._file.close()
+            else:
+                self._file.write(chunk)
+            self._queue.task_done()
+
+
+# 全局追踪实例
+trace = BinaryTrace()
+
+
+def read_trace(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < TRACE_RECORD.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for offset in range(0, len(data) - TRACE_RECORD.size + 1, TRACE_RECORD.size):
+                yield TRACE_RECORD.unpack_from(data, offset)
+
+
+# 将追踪文件映射为 numpy 结构化数组（只读，不复制），字段见 TRACE_FIELDS；末尾不完整的记录忽略
+def load_trace(path):
+    import numpy as np
+    dtype = np.dtype(TRACE_FIELDS)
+    count = os.path.getsize(path) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+# CAN 帧记录的 (通道序号, 仲裁ID, 数据长度)
+def unpack_can(event, arg):
+    return arg >> CAN_CHANNEL_SHIFT, arg & CAN_ID_MASK, (event >> 8) or 8
+
+
+# 设置根日志：队列处理器 + 按调用位置限流，终端输出在后台线程中进行
+def setup_logging(level=None, interval=1.0, queue_size=1000, trace_signal=signal.SIGUSR1):
+    global _listener
+    level = level or os.environ.get('CAR_LOG_LEVEL', 'INFO')
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return root
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(interval))
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter('%(asctime)s %(levelname).1s [%(name)s] %(message)s', '%H:%M:%S'))
+    root.handlers = [handler]
+    _listener = logging.handlers.QueueListener(log_queue, console)
+    _listener.start()
+    atexit.register(_shutdown)
+    # 信号只能在主线程中注册
+    if trace_signal is not None and threading.current_thread() is threading.main_thread():
+        signal.signal(trace_signal, lambda signum, frame: threading.Thread(target=trace.toggle).start())
+    if os.environ.get('CAR_TRACE'):
+        trace.start(os.environ['CAR_TRACE'])
+    return root
+
+
+def _shutdown():
+    trace.stop()
+    if _listener is not None:
+        _listener.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    dump = sub.add_parser('dump', help='打印二进制追踪文件')
+    dump.add_argument('path')
+    args = parser.parse_args()
+    start = None
+    for timestamp, event, arg, payload in read_trace(args.path):
+        start = timestamp if start is None else start
+        name = EVENT_NAMES.get(event & EVENT_MASK, event)
+        if event & EVENT_MASK in (EV_CAN_TX, EV_CAN_RX):
+            channel, can_id, dlc = unpack_can(event, arg)
+            print(f"{timestamp - start:10.4f} {name:<7} can{channel} {can_id:#05x} [{dlc}] {payload[:dlc].hex(' ')}")
+        else:
+            print(f"{timestamp - start:10.4f} {name:<7} {arg:#010x} {payload.hex(' ')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# 速度设定值平滑模块 - 每个轮子独立限制加速度和加加速度（jerk），按固定频率输出插值后的设定值
+# 原来 move_* / omni_move / stop 和遥控循环直接把目标转速发给伺服，伺服限流、车体顿挫
+# - SetpointRamp：向量化的单步更新，四个轮子（或 (N, 4) 批量）一次 numpy 运算完成
+# - stop：使用更大但有限的减速度和加加速度，快速而不失控地停车
+# - RampStreamer：独立线程按固定周期（默认 100Hz）执行 step 并发送速度帧，到达目标后休眠不占总线
+# 单位：转速 rpm，加速度 rpm/s，加加速度 rpm/s²
+import threading
+import time
+
+import numpy as np
+
+from can_frames import send_motor_speeds
+
+# 默认限制：0 -> 5000rpm 约 0.6 秒；停车从 5000rpm 约 0.25 秒
+ACCEL_MAX = 10000.0
+JERK_MAX = 100000.0
+STOP_ACCEL_MAX = 25000.0
+STOP_JERK_MAX = 500000.0
+# 默认输出周期（秒）
+RAMP_PERIOD = 0.01
+
+
+class SetpointRamp:
+    # shape: (4,) 对应 MOTORS 的四个轮子；也可为 (N, 4) 批量仿真
+    def __init__(self, accel=ACCEL_MAX, jerk=JERK_MAX, stop_accel=STOP_ACCEL_MAX, stop_jerk=STOP_JERK_MAX,
+                 shape=(4,)):
+        self.accel_max = accel
+        self.jerk_max = jerk
+        self.stop_accel_max = stop_accel
+        self.stop_jerk_max = stop_jerk
+        self.velocity = np.zeros(shape)
+        self.accel = np.zeros(shape)
+        self.target = np.zeros(shape)
+        self.stopping = False
+        self.settled = True
+
+    # 设置目标转速；stopping=True 时目标为 0 并使用停车限制
+    def set_target(self, speeds, stopping=False):
+        if stopping:
+            self.target[...] = 0.0
+        else:
+            self.target[...] = speeds
+        self.stopping = stopping
+        self.settled = bool(np.array_equal(self.velocity, self.target)) and not self.accel.any()
+
+    # 直接设定当前转速（如伺服反馈的实际转速），加速度清零
+    def reset(self, velocity=0.0):
+        self.velocity[...] = velocity
+        self.accel[...] = 0.0
+        self.set_target(self.velocity)
+
+    # 前进 dt 秒，返回新的设定值（内部数组，调用方不要修改）
+    def step(self, dt):
+        if self.stopping:
+            accel_max, jerk_max = self.stop_accel_max, self.stop_jerk_max
+        else:
+            accel_max, jerk_max = self.accel_max, self.jerk_max
+        err = self.target - self.velocity
+        # 以最大 jerk 按步长 dt 把加速度 a 收回到 0 期间速度还会变化 a²/(2j) + a·dt/2，
+        # 期望加速度取该式等于剩余误差 |err| 的解，离目标越近越小，避免超调
+        half = 0.5 * dt
+        desired = np.sqrt(half * half + 2.0 * np.abs(err) / jerk_max)
+        desired -= half
+        desired *= jerk_max
+        np.minimum(desired, accel_max, out=desired)
+        desired *= np.sign(err)
+        dj = jerk_max * dt
+        self.accel += np.clip(desired - self.accel, -dj, dj)
+        self.velocity += self.accel * dt
+        # 到达或越过目标的轮子直接落在目标上
+        done = (self.target - self.velocity) * err <= 0
+        self.velocity[done] = self.target[done]
+        self.accel[done] = 0.0
+        self.settled = bool(done.all())
+        return self.velocity
+
+
+# 固定频率输出平滑后的设定值；设定值已到达目标时线程休眠，不重复发送
+class RampStreamer:
+    def __init__(self, buses, ramp=None, period=RAMP_PERIOD, encoder=None):
+        self.buses = buses
+        self.ramp = ramp or SetpointRamp()
+        self.period = period
+        self.encoder = encoder
+        self.steps = 0
+        self.send_errors = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    # 控制线程调用：更新目标并唤醒输出线程
+    def set_target(self, speeds, stopping=False):
+        with self._cond:
+            self.ramp.set_target(speeds, stopping)
+            self._cond.notify_all()
+
+    # 等待设定值到达目标，返回是否到达
+    def wait_settled(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.ramp.settled or not self._running, timeout) and self.ramp.settled
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='ramp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # 按 start + k*period 的绝对时刻输出，落后时跳过错过的时刻
+    def _run(self):
+        next_time = time.monotonic()
+        while True:
+            with self._cond:
+                if self.ramp.settled:
+                    self._cond.notify_all()
+                    self._cond.wait_for(lambda: not self.ramp.settled or not self._running)
+                    next_time = time.monotonic()
+                if not self._running:
+                    break
+                speeds = self.ramp.step(self.period).copy()
+                self.steps += 1
+            try:
+                send_motor_speeds(self.buses, speeds, self.encoder)
+            except Exception:
+                self.send_errors += 1
+            next_time += self.period
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                next_time += -(delay // self.period) * self.period
+                delay = next_time - time.monotonic()
+            time.sleep(max(0.0, delay))
+
+    def stats(self):
+        return {
+            "steps": self.steps,
+            "send_errors": self.send_errors,
+            "settled": self.ramp.settled,
+        }
@@ -0,0 +1,231 @@
+# 进程内仿真伺服 - 挂在任意 python-can 总线上（virtual / vcan），按伺服CAN控制协议应答
+# - 0x25 使能开关、0x20 速度模式运行（自动开启使能）、0x26 停止并保持使能、0x28 停止并关闭使能
+# - 0x08 主控连接帧：超过 2 秒收不到时视为离线，强制停止（保持使能），离线期间忽略速度指令，收到连接帧后恢复
+# - 0x12 读取：应答速度、位置、输出电流；可选每 30ms 主动发送 0x10 心跳帧（运行状态、绝对位置）
+# - 电机动力学为一阶惯性：转速以时间常数 tau 指数逼近设定值，在查询时按解析解推进，不需要仿真线程
+# 每条速度指令记录执行时刻相对帧发送时间戳的延迟，供 bench_hil.py 统计
+# recorders（通道名 -> recorder.CanRecorder）不为 None 时记录收到的指令（主机发送）和发出的应答（主机接收）
+import math
+import threading
+import time
+from collections import deque
+
+import can
+
+from can_frames import (MOTORS, station_nos, FRAME, CMD_HEARTBEAT, CMD_SERVO_BEAT, CMD_READ, CMD_SPEED,
+                        CMD_ENABLE, CMD_STOP, CMD_STOP_DISABLE, make_message)
+from can_rx import READ_SPEED, READ_POSITION, READ_CURRENT, STATUS_IDLE
+from heartbeat import JitterStats, HEARTBEAT_PERIOD
+
+# 伺服离线判定时间（秒）
+OFFLINE_TIMEOUT = 2.0
+# 0x10 心跳帧周期（秒）
+SERVO_BEAT_PERIOD = 0.03
+
+
+class SimulatedServo:
+    # tau: 一阶时间常数（秒）；counts_per_rev: 每转位置计数；amps_per_krpm_s: 每 1000rpm/s 加速度对应的电流
+    def __init__(self, station, tau=0.05, counts_per_rev=10000, amps_per_krpm_s=0.05, idle_current=0.3,
+                 offline_timeout=OFFLINE_TIMEOUT, now=None):
+        now = time.monotonic() if now is None else now
+        self.station = station
+        self.tau = tau
+        self.counts_per_rev = counts_per_rev
+        self.amps_per_krpm_s = amps_per_krpm_s
+        self.idle_current = idle_current
+        self.offline_timeout = offline_timeout
+        self.enabled = False
+        self.online = True
+        self.target = 0.0
+        self.speed = 0.0
+        self.position = 0.0
+        self._time = now
+        self.last_heartbeat = now
+        self.heartbeats = JitterStats(HEARTBEAT_PERIOD)
+        # 计数器
+        self.commands = 0
+        self.ignored = 0
+        self.offline_events = 0
+
+    # 一阶惯性从当前状态推进到 now（解析解），途中经过离线时刻时先推进到离线时刻再停止
+    def advance(self, now):
+        cutoff = self.last_heartbeat + self.offline_timeout
+        if self.online and now > cutoff:
+            self._integrate(max(cutoff, self._time))
+            self.online = False
+            self.target = 0.0
+            self.offline_events += 1
+        self._integrate(now)
+
+    def _integrate(self, now):
+        dt = now - self._time
+        if dt <= 0:
+            return
+        decay = math.exp(-dt / self.tau)
+        start = self.speed
+        self.speed = self.target + (start - self.target) * decay
+        # 位置为转速的积分（rpm -> 计数）
+        revs = (self.target * dt + (start - self.target) * self.tau * (1.0 - decay)) / 60.0
+        self.position += revs * self.counts_per_rev
+        self._time = now
+
+    # 处理一帧主控指令；返回需要应答的数据（bytes）或 None
+    def handle(self, data, now):
+        self.advance(now)
+        _, cmd, sub, value, _ = FRAME.unpack(data)
+        if cmd == CMD_HEARTBEAT:
+            self.heartbeats.record(now)
+            self.last_heartbeat = now
+            self.online = True
+        elif cmd == CMD_SPEED:
+            if not self.online:
+                self.ignored += 1
+                return None
+            # 速度模式运行会自动开启使能
+            self.enabled = True
+            self.target = float(value)
+            self.commands += 1
+        elif cmd == CMD_ENABLE:
+            self.enabled = bool(sub)
+            if not self.enabled:
+                self.target = 0.0
+        elif cmd == CMD_STOP:
+            self.target = 0.0
+        elif cmd == CMD_STOP_DISABLE:
+            self.target = 0.0
+            self.enabled = False
+        elif cmd == CMD_READ:
+            if sub == READ_SPEED:
+                return FRAME.pack(self.station, CMD_READ, sub, int(round(self.speed)), 0xFF)
+            if sub == READ_POSITION:
+                return FRAME.pack(self.station, CMD_READ, sub, int(self.position), 0xFF)
+            if sub == READ_CURRENT:
+                return FRAME.pack(self.station, CMD_READ, sub, int(round(self.current() * 100)), 0xFF)
+        return None
+
+    # 输出电流（A）：与加速度成正比，外加空载电流
+    def current(self):
+        if not self.enabled:
+            return 0.0
+        accel = abs(self.target - self.speed) / self.tau
+        return self.idle_current + accel / 1000.0 * self.amps_per_krpm_s
+
+    def beat_frame(self):
+        status = STATUS_IDLE if abs(self.speed) < 1.0 and self.target == 0.0 else 0x00
+        return FRAME.pack(self.station, CMD_SERVO_BEAT, status, int(self.position), 0xFF)
+
+    def state(self, now=None):
+        self.advance(time.monotonic() if now is None else now)
+        return {
+            "enabled": self.enabled,
+            "online": self.online,
+            "target": self.target,
+            "speed": self.speed,
+            "position": self.position,
+            "current": self.current(),
+        }
+
+
+# 一组仿真伺服：每条总线一个 Notifier 接收线程，可选一个 0x10 心跳帧发送线程
+class ServoSimulator:
+    # buses_by_channel: {"can0": bus, "can1": bus}，伺服一侧的总线
+    # beat_period: 主动发送 0x10 心跳帧的周期，None 表示不发送（主机不读取时避免接收队列堆积）
+    def __init__(self, buses_by_channel, motors=MOTORS, stations=station_nos, beat_period=None, history=4096,
+                 **servo_args):
+        self.buses = dict(buses_by_channel)
+        self.beat_period = beat_period
+        self.servos = {}
+        self._routes = {}
+        self._channels = {}
+        now = time.monotonic()
+        for motor, station in zip(motors, stations):
+            servo = SimulatedServo(station, now=now, **servo_args)
+            self.servos[motor["id"]] = servo
+            self._routes[motor["id"]] = (servo, self.buses[motor["channel"]])
+            self._channels[motor["id"]] = motor["channel"]
+        self.recorders = None
+        # 速度指令：帧发送到伺服执行的延迟（秒）
+        self.command_latencies = deque(maxlen=history)
+        self.received = 0
+        self._lock = threading.Lock()
+        self._notifiers = []
+        self._stop_event = threading.Event()
+        self._beat_thread = None
+
+    def start(self):
+        if self._notifiers:
+            return self
+        self._stop_event.clear()
+        self._notifiers = [can.Notifier(bus, [self._on_message]) for bus in self.buses.values()]
+        if self.beat_period:
+            self._beat_thread = threading.Thread(target=self._beat, name='sim-servo-beat', daemon=True)
+            self._beat_thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        for notifier in self._notifiers:
+            notifier.stop()
+        self._notifiers = []
+        if self._beat_thread is not None:
+            self._beat_thread.join()
+            self._beat_thread = None
+
+    def _on_message(self, msg):
+        route = self._routes.get(msg.arbitration_id)
+        if route is None or len(msg.data) != 8 or msg.data[0] != route[0].station:
+            return
+        servo, bus = route
+        recorders = self.recorders
+        if recorders is not None:
+            recorders[self._channels[msg.arbitration_id]].record(msg, False)
+        with self._lock:
+            self.received += 1
+            reply = servo.handle(bytes(msg.data), time.monotonic())
+            if msg.data[1] == CMD_SPEED and msg.timestamp:
+                self.command_latencies.append(time.time() - msg.timestamp)
+        if reply is not None:
+            self._send(bus, make_message(msg.arbitration_id, reply), recorders)
+
+    def _send(self, bus, msg, recorders):
+        bus.send(msg)
+        if recorders is not None:
+            recorders[self._channels[msg.arbitration_id]].record(msg, True)
+
+    def _beat(self):
+        next_time = time.monotonic()
+        while not self._stop_event.wait(max(0.0, next_time - time.monotonic())):
+            with self._lock:
+                now = time.monotonic()
+                frames = []
+                for motor_id, (servo, bus) in self._routes.items():
+                    servo.advance(now)
+                    frames.append((bus, make_message(motor_id, servo.beat_frame())))
+            recorders = self.recorders
+            for bus, msg in frames:
+                self._send(bus, msg, recorders)
+            next_time += self.beat_period
+
+    # MOTORS 顺序的四轮实际转速
+    def wheel_speeds(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            speeds = []
+            for servo, _ in self._routes.values():
+                servo.advance(now)
+                speeds.append(servo.speed)
+        return speeds
+
+    def states(self):
+        now = time.monotonic()
+        with self._lock:
+            return [servo.state(now) for servo, _ in self._routes.values()]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "received": self.received,
+                "commands": sum(servo.commands for servo, _ in self._routes.values()),
+                "ignored": sum(servo.ignored for servo, _ in self._routes.values()),
+                "offline_events": sum(servo.offline_events for servo, _ in self._routes.values()),
+            }
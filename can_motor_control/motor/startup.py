@@ -0,0 +1,136 @@
+# 启动耗时分析 - 故障恢复时重启控制程序的冷启动时间
+# - 统计每个模块的导入耗时，口径与 python -X importtime 相同（self: 模块自身执行时间，cumulative: 含其导入的子模块）
+# - 记录启动各阶段（解释器启动、依赖检查、CAN初始化、进入主循环……）的时刻
+# - 由 run_ws_gui.py --importtime 或环境变量 CAR_IMPORTTIME=1 开启，ready() 时向 stderr 输出一次报告
+# - 未开启时 mark()/ready() 不做任何事；本模块只依赖标准库中已加载的模块，导入开销可忽略
+# 进程启动时刻取自 /proc/self/stat，包含解释器自身启动和 execv 切换到虚拟环境解释器的时间
+import os
+import sys
+import threading
+import time
+
+# 报告中只列出 cumulative 不小于该值的导入（秒）
+MIN_REPORT = 0.002
+
+
+def process_age():
+    # /proc/self/stat 第22项为进程启动时刻（开机后的时钟滴答数），精度 10ms
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# 挂在 sys.meta_path 最前面，找到模块后包装该模块 loader 实例的 exec_module 以计时
+# 不替换 loader 对象本身，isinstance 检查和资源读取不受影响；内置/冻结模块的 loader 是类本身，不包装
+class ImportTimer:
+    def __init__(self):
+        # (嵌套深度, 模块名, self秒, cumulative秒)，按导入完成顺序
+        self.records = []
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            loader = spec.loader
+            if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+                try:
+                    loader.exec_module = self._timed(name, loader.exec_module)
+                except AttributeError:
+                    pass
+            return spec
+        return None
+
+    def _timed(self, name, exec_module):
+        def timed_exec_module(module):
+            # 每个线程一个子模块耗时累加栈，计算 self = cumulative - 子模块 cumulative
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                cumulative = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += cumulative
+                self.records.append((len(stack), name, cumulative - children, cumulative))
+        return timed_exec_module
+
+    def total(self):
+        return sum(record[3] for record in self.records if record[0] == 0)
+
+
+_timer = None
+_phases = []
+_reported = False
+
+
+def enabled():
+    return _timer is not None
+
+
+# 开启统计：安装导入计时器并记录第一个阶段（解释器启动到此刻）
+def enable():
+    global _timer
+    if _timer is None:
+        _timer = ImportTimer()
+        _timer.install()
+        age = process_age()
+        _phases.append(('进程启动', time.perf_counter() - (age or 0.0)))
+        _phases.append(('解释器启动', time.perf_counter()))
+    return _timer
+
+
+# 记录一个阶段的结束时刻
+def mark(name):
+    if _timer is not None:
+        _phases.append((name, time.perf_counter()))
+
+
+# 启动完成（即将进入主循环）：记录最后一个阶段并输出一次报告
+def ready(name='进入主循环', out=None):
+    global _reported
+    if _timer is None or _reported:
+        return
+    _reported = True
+    mark(name)
+    _timer.uninstall()
+    report(out or sys.stderr)
+
+
+def report(out):
+    origin = _phases[0][1]
+    print(f"启动耗时（距进程启动 {_phases[-1][1] - origin:.3f}s，导入 {len(_timer.records)} 个模块共 "
+          f"{_timer.total():.3f}s）:", file=out)
+    for (_, previous), (name, at) in zip(_phases, _phases[1:]):
+        print(f"  {(at - previous) * 1000:8.1f} ms  {name}", file=out)
+    # 与 -X importtime 相同的格式，按完成顺序输出，子模块在父模块之前
+    print("import time: self [us] | cumulative | imported package", file=out)
+    for depth, name, self_time, cumulative in _timer.records:
+        if cumulative >= MIN_REPORT:
+            print(f"import time: {self_time * 1e6:9.0f} | {cumulative * 1e6:10.0f} | {'  ' * depth}{name}", file=out)
+    # 自身耗时最多的模块
+    slowest = sorted(_timer.records, key=lambda record: record[2], reverse=True)[:10]
+    print("自身耗时最多的模块: " + ", ".join(f"{name} {self_time * 1000:.1f}ms"
+                                           for _, name, self_time, _ in slowest), file=out)
+
+
+if os.environ.get('CAR_IMPORTTIME'):
+    enable()
@@ -0,0 +1,132 @@
+# 遥控指令协议 - WebSocket 二进制帧（固定结构）优先，JSON 文本帧作为兼容回退
+# 二进制帧（小端，30字节）:
+#   u8 魔数 0xA5 | u8 版本 1 | u32 序号 | f64 发送时间戳 | f32 joy_x | f32 joy_y | f32 throttle1 | f32 throttle2
+# JSON 帧: {"seq": 12, "t": 1700000000.0, "joy": [x, y], "throttle1": 1000, "throttle2": 0.2}（seq、t 可省略）
+# 连接建立后监听端先发送 HELLO，客户端据此选择二进制格式；每条消息按帧类型（bytes/str）分别解析
+# 超出范围、非有限数或格式错误的指令被拒绝；序号不大于上一条的指令（乱序/重复）被丢弃
+import json
+import math
+import struct
+from collections import namedtuple
+
+MAGIC = 0xA5
+VERSION = 1
+BINARY_FRAME = struct.Struct('<BBIdffff')
+
+# 连接建立后发送给客户端的能力声明
+HELLO = json.dumps({
+    "type": "hello",
+    "formats": ["bin1", "json"],
+    "bin1": {"struct": BINARY_FRAME.format, "magic": MAGIC, "version": VERSION,
+             "fields": ["magic", "version", "seq", "t", "joy_x", "joy_y", "throttle1", "throttle2"]},
+})
+
+# 取值范围，与 remote_control_gui.py 一致：摇杆 [-1,1]，throttle1 为速度 [0, speed_max]，throttle2 为 yaw [-1,1]
+JOY_RANGE = (-1.0, 1.0)
+THROTTLE1_RANGE = (0.0, 5000.0)
+THROTTLE2_RANGE = (-1.0, 1.0)
+
+TeleopCommand = namedtuple('TeleopCommand', 'seq timestamp joy_x joy_y throttle1 throttle2')
+
+
+class TeleopError(ValueError):
+    pass
+
+
+def encode_binary(seq, timestamp, joy_x, joy_y, throttle1, throttle2):
+    return BINARY_FRAME.pack(MAGIC, VERSION, seq & 0xFFFFFFFF, timestamp, joy_x, joy_y, throttle1, throttle2)
+
+
+def encode_json(seq, timestamp, joy_x, joy_y, throttle1, throttle2):
+    return json.dumps({"seq": seq, "t": timestamp, "joy": [joy_x, joy_y],
+                       "throttle1": throttle1, "throttle2": throttle2})
+
+
+def _check(value, low, high, name):
+    # bool 是 int 的子类，需单独排除
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TeleopError(f"{name} 不是数值")
+    if not math.isfinite(value) or not low <= value <= high:
+        raise TeleopError(f"{name}={value} 超出范围 [{low}, {high}]")
+    return float(value)
+
+
+def parse_binary(data):
+    if len(data) != BINARY_FRAME.size:
+        raise TeleopError(f"二进制帧长度 {len(data)} != {BINARY_FRAME.size}")
+    magic, version, seq, timestamp, joy_x, joy_y, throttle1, throttle2 = BINARY_FRAME.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise TeleopError(f"未知帧头 {magic:#04x}/{version}")
+    # 快速路径：一次链式比较（NaN 与任何值比较都为假，会落到逐项检查并给出原因）
+    if (JOY_RANGE[0] <= joy_x <= JOY_RANGE[1] and JOY_RANGE[0] <= joy_y <= JOY_RANGE[1]
+            and THROTTLE1_RANGE[0] <= throttle1 <= THROTTLE1_RANGE[1]
+            and THROTTLE2_RANGE[0] <= throttle2 <= THROTTLE2_RANGE[1]):
+        return TeleopCommand(seq, timestamp, joy_x, joy_y, throttle1, throttle2)
+    return TeleopCommand(seq, timestamp,
+                         _check(joy_x, *JOY_RANGE, 'joy_x'), _check(joy_y, *JOY_RANGE, 'joy_y'),
+                         _check(throttle1, *THROTTLE1_RANGE, 'throttle1'),
+                         _check(throttle2, *THROTTLE2_RANGE, 'throttle2'))
+
+
+def parse_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise TeleopError(f"JSON解析失败: {e}")
+    if not isinstance(data, dict):
+        raise TeleopError("JSON不是对象")
+    joy = data.get('joy', [0, 0])
+    if not isinstance(joy, (list, tuple)) or len(joy) != 2:
+        raise TeleopError("joy 必须是长度为2的数组")
+    seq = data.get('seq')
+    if seq is not None and (isinstance(seq, bool) or not isinstance(seq, int) or seq < 0):
+        raise TeleopError("seq 必须是非负整数")
+    timestamp = data.get('t')
+    if timestamp is not None:
+        timestamp = _check(timestamp, 0.0, math.inf, 't')
+    return TeleopCommand(seq, timestamp,
+                         _check(joy[0], *JOY_RANGE, 'joy_x'), _check(joy[1], *JOY_RANGE, 'joy_y'),
+                         _check(data.get('throttle1', 0), *THROTTLE1_RANGE, 'throttle1'),
+                         _check(data.get('throttle2', 0), *THROTTLE2_RANGE, 'throttle2'))
+
+
+# 每个连接一个解码器：按帧类型解析、校验，并按序号丢弃乱序/重复指令
+class TeleopDecoder:
+    def __init__(self):
+        self.last_seq = None
+        self.accepted = 0
+        self.rejected = 0
+        self.out_of_order = 0
+        self.binary = 0
+        self.last_error = None
+
+    # 返回 TeleopCommand；被拒绝或乱序时返回 None
+    def decode(self, message):
+        try:
+            if isinstance(message, (bytes, bytearray, memoryview)):
+                command = parse_binary(message)
+                self.binary += 1
+            else:
+                command = parse_json(message)
+        except TeleopError as e:
+            self.rejected += 1
+            self.last_error = str(e)
+            return None
+        if command.seq is not None:
+            # u32 序号回绕：与上一条的差值在前半个区间内才算更新
+            if self.last_seq is not None and not 0 < (command.seq - self.last_seq) & 0xFFFFFFFF < 0x80000000:
+                self.out_of_order += 1
+                self.last_error = f"序号 {command.seq} 不大于上一条 {self.last_seq}"
+                return None
+            self.last_seq = command.seq & 0xFFFFFFFF
+        self.accepted += 1
+        return command
+
+    def stats(self):
+        return {
+            "accepted": self.accepted,
+            "binary": self.binary,
+            "rejected": self.rejected,
+            "out_of_order": self.out_of_order,
+            "last_error": self.last_error,
+        }
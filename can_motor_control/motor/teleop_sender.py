@@ -0,0 +1,142 @@
+# 事件驱动的遥控发送器 - 在 asyncio 事件循环中收到新设定值即解算并发送速度帧
+# - 最大发送频率：两次发送至少间隔 min_interval，期间到达的设定值合并为最新一条
+# - 最小发送频率：超过 keepalive 秒没有新设定值时重发当前设定值
+# - 与上次发送相同的设定值不重复发送
+# - 可选 watchdog（CommandWatchdog）：指令过期时速度在降速时间内平滑降到 0，每个周期报告存活
+# - 可选 ramp（SetpointRamp）：目标转速按加速度/加加速度限制逐步逼近，逼近期间每 ramp_step 发送一次
+# 取代原来每 50ms 轮询一次的 periodic_control 线程
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+from can_frames import SpeedFrameEncoder, send_motor_speeds
+from mecanum import MecanumKinematics
+
+
+class TeleopSender:
+    # buses: 与 MOTORS 对应的总线（或 CanTxManager.motor_buses()）
+    # ramp_step: 失联降速、设定值平滑期间的发送间隔
+    def __init__(self, buses, kinematics=None, min_interval=0.01, keepalive=0.2, history=2048, watchdog=None,
+                 ramp_step=0.02, ramp=None):
+        self.buses = buses
+        self.kinematics = kinematics or MecanumKinematics(L=80, W=60, speed_max=5000)
+        self.encoder = SpeedFrameEncoder()
+        self.min_interval = min_interval
+        self.keepalive = keepalive
+        self.watchdog = watchdog
+        self.ramp_step = ramp_step
+        self.ramp = ramp
+        # 当前设定值 (joy_x, joy_y, throttle1, throttle2) 及其接收时刻
+        self.setpoint = (0.0, 0.0, 0.0, 0.0)
+        self._received = None
+        self._dirty = False
+        # 上次解算的 (设定值, 失联系数) 及对应的目标转速
+        self._sent = None
+        self._target = None
+        self._last_send = -float('inf')
+        self._wake = None
+        # stop() 可能在 run() 第一次被调度之前调用，由 run() 检查，不在 run() 开始时重置
+        self._stopped = False
+        # 接收到发送的延迟（秒），最近 history 条
+        self.latencies = collections.deque(maxlen=history)
+        # 计数器
+        self.sent = 0
+        self.keepalives = 0
+        self.coalesced = 0
+        self.unchanged = 0
+
+    # 在事件循环线程中调用：更新设定值并唤醒发送
+    def submit(self, joy_x, joy_y, throttle1, throttle2, received=None):
+        if self._dirty:
+            # 上一条还没发送就被新设定值覆盖
+            self.coalesced += 1
+        self.setpoint = (joy_x, joy_y, throttle1, throttle2)
+        self._received = time.monotonic() if received is None else received
+        self._dirty = True
+        if self.watchdog is not None:
+            self.watchdog.feed('teleop', self._received)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        while not self._stopped:
+            now = loop.time()
+            timeout = self._last_send + self.keepalive - now
+            if self.watchdog is not None:
+                self.watchdog.tick(now)
+                # 即将或正在失联降速时按 ramp_step 唤醒
+                timeout = min(timeout, max(self.watchdog.until_ramp(now), self.ramp_step))
+            if self.ramp is not None and not self.ramp.settled:
+                timeout = min(timeout, self.ramp_step)
+            if not self._dirty:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), max(0.0, timeout))
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            if self._stopped:
+                break
+            # 限制最大发送频率，等待期间到达的设定值在 submit 中合并
+            wait = self._last_send + self.min_interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._send(loop.time())
+
+    def _send(self, now):
+        scale = 1.0 if self.watchdog is None else self.watchdog.scale(now)
+        fresh = self._dirty
+        self._dirty = False
+        changed = (self.setpoint, scale) != self._sent
+        if changed:
+            joy_x, joy_y, throttle1, throttle2 = self.setpoint
+            self._target = self.kinematics.mix(joy_x, joy_y, throttle2, throttle1)
+            if scale != 1.0:
+                self._target *= scale
+            self._sent = (self.setpoint, scale)
+            if fresh:
+                self.latencies.append(time.monotonic() - self._received)
+        elif self.ramp is None or self.ramp.settled:
+            # 与上次发送相同（且已到达目标）：只在到达保活间隔时重发
+            if now - self._last_send < self.keepalive:
+                self.unchanged += fresh
+                return
+            self.keepalives += 1
+        speeds = self._target
+        if self.ramp is not None:
+            self.ramp.set_target(speeds)
+            # 步长按实际间隔计算，空闲后第一步不超过 ramp_step
+            speeds = self.ramp.step(min(now - self._last_send, self.ramp_step))
+        send_motor_speeds(self.buses, speeds, self.encoder)
+        self._last_send = now
+        self.sent += 1
+
+    def stop(self):
+        self._stopped = True
+        if self._wake is not None:
+            self._wake.set()
+
+    # 接收到发送延迟分布（毫秒）
+    def latency_stats(self):
+        if not self.latencies:
+            return {}
+        ms = np.array(self.latencies) * 1000
+        return {
+            "count": len(ms),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p90_ms": float(np.percentile(ms, 90)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "max_ms": float(ms.max()),
+        }
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "keepalives": self.keepalives,
+            "coalesced": self.coalesced,
+            "unchanged": self.unchanged,
+        }
@@ -1,49 +1,28 @@
-import os
 import can
 import time
-import threading
+import logging
 
-# 自动初始化 CAN 通信
-os.system("sudo ip link set can0 down")
-os.system("sudo ip link set can0 type can bitrate 1000000")
-os.system("sudo ip link set can0 up")
-os.system("sudo ip link set can1 down")
-os.system("sudo ip link set can1 type can bitrate 1000000")
-os.system("sudo ip link set can1 up")
+# 电机参数与各类控制帧见 can_frames.py
+from can_frames import MOTORS, station_nos, speed_frame, enable_frame, stop_frame
+from heartbeat import HeartbeatScheduler
+# CAR_TRACE=trace.bin 时收发帧由 open_buses 挂接的记录器写入追踪文件
+from runtime_log import setup_logging, hexdump
+# CAN总线工厂：环境变量CAR_CAN_BACKEND选择 socketcan（默认）/ vcan / sim（进程内仿真伺服）
+from can_bus import open_buses
 
-MOTORS = [
-    {"id": 0x65, "channel": "can0"},  # 左前
-    {"id": 0x66, "channel": "can0"},  # 右前
-    {"id": 0x67, "channel": "can1"},  # 右后
-    {"id": 0x68, "channel": "can1"},  # 左后
-]
-station_nos = [0x01, 0x02, 0x03, 0x04]  # 假定站号分别为1,2,3,4
+log = logging.getLogger('test_motor')
 
 def send_frame(bus, motor_id, data_bytes, desc=""):
     msg = can.Message(arbitration_id=motor_id, data=data_bytes, is_extended_id=False)
     bus.send(msg)
-    print(f"[发送] {desc} 电机ID {hex(motor_id)}: {' '.join(f'{b:02X}' for b in data_bytes)}")
-
-def heartbeat(bus, motor_id, station_no, stop_event):
-    frame = [station_no, 0x08, 0, 0, 0, 0, 0, 0xFF]
-    while not stop_event.is_set():
-        send_frame(bus, motor_id, frame, "心跳帧")
-        time.sleep(0.1)
-
-def speed_frame(station_no, speed_rpm):
-    speed_bytes = int(speed_rpm).to_bytes(4, byteorder='little', signed=True)
-    return [station_no, 0x20, 0x00, speed_bytes[0], speed_bytes[1], speed_bytes[2], speed_bytes[3], 0xFF]
-
-def enable_frame(station_no, enable=True):
-    return [station_no, 0x25, 0x01 if enable else 0x00, 0, 0, 0, 0, 0xFF]
-
-def stop_frame(station_no):
-    return [station_no, 0x26, 0, 0, 0, 0, 0, 0xFF]
+    # 十六进制只在日志真正输出时才格式化；测试脚本每帧都需要看到，不限流
+    log.info("[发送] %s 电机ID %#x: %s", desc, motor_id, hexdump(data_bytes), extra={'rate_interval': 0})
 
 if __name__ == '__main__':
-    # 打开两个 CAN 通道
-    bus0 = can.interface.Bus(channel="can0", bustype='socketcan')
-    bus1 = can.interface.Bus(channel="can1", bustype='socketcan')
+    setup_logging()
+    # 自动初始化并打开两个 CAN 通道
+    backend = open_buses()
+    bus0, bus1 = backend["can0"], backend["can1"]
     buses = [bus0, bus0, bus1, bus1]
 
     # 使能所有电机
@@ -51,13 +30,10 @@ if __name__ == '__main__':
         send_frame(buses[i], motor["id"], enable_frame(station_nos[i], True), "开启使能")
         time.sleep(0.05)
 
-    # 启动心跳线程
-    stop_event = threading.Event()
-    threads = []
-    for i, motor in enumerate(MOTORS):
-        t = threading.Thread(target=heartbeat, args=(buses[i], motor["id"], station_nos[i], stop_event))
-        t.start()
-        threads.append(t)
+    # 启动周期心跳（四个电机的心跳帧由内核BCM统一发送）
+    heartbeat = HeartbeatScheduler(buses)
+    heartbeat.start()
+    print(f"[心跳] 已启动，模式: {heartbeat.active_mode}，周期 {heartbeat.period * 1000:.0f}ms")
 
     # 正转 5 秒
     for i, motor in enumerate(MOTORS):
@@ -76,8 +52,8 @@ if __name__ == '__main__':
         send_frame(buses[i], motor["id"], stop_frame(station_nos[i]), "停止")
     print("所有电机停止")
 
-    stop_event.set()
-    for t in threads:
-        t.join()
-    bus0.shutdown()
-    bus1.shutdown()
\ No newline at end of file
+    heartbeat.stop()
+    print(f"[心跳] 已停止，统计: {heartbeat.stats()}")
+    if backend.simulator is not None:
+        print(f"[仿真伺服] {backend.simulator.stats()}")
+    backend.shutdown()
\ No newline at end of file
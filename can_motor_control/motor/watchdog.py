@@ -0,0 +1,118 @@
+# 遥控失联保护（dead-man）
+# - 指令过期：每个指令来源（WebSocket、摇杆等）记录最后一次更新的时刻，超过 deadline 没有更新时，
+#   scale() 在 ramp_time 内从 1 线性降到 0，控制循环把速度乘以该系数，平滑停车
+# - 进程失活：控制循环每个周期调用 tick()；监视线程发现超过 liveness_timeout 没有 tick 时，
+#   停止心跳（伺服2秒收不到连接帧自行停机）并调用 on_trip（如发送停止帧）；tick 恢复后重新启动心跳
+# 每个周期的开销只有几次浮点比较
+import logging
+import threading
+import time
+
+from can_frames import MOTORS, station_nos, stop_frame, make_message
+
+log = logging.getLogger('watchdog')
+
+
+# 向所有电机发送停止帧（保持使能），用作 on_trip
+def stop_motors(buses):
+    for i, motor in enumerate(MOTORS):
+        buses[i].send(make_message(motor["id"], stop_frame(station_nos[i])))
+
+
+class CommandWatchdog:
+    # heartbeat: HeartbeatScheduler，进程失活时停止
+    def __init__(self, deadline=0.5, ramp_time=0.5, liveness_timeout=1.0, heartbeat=None, on_trip=None,
+                 check_period=0.1):
+        self.deadline = deadline
+        self.ramp_time = ramp_time
+        self.liveness_timeout = liveness_timeout
+        self.heartbeat = heartbeat
+        self.on_trip = on_trip
+        self.check_period = check_period
+        # 来源 -> 最后更新时刻；_last_feed 为所有来源中最新的时刻
+        self.sources = {}
+        self._last_feed = None
+        self._last_tick = time.monotonic()
+        self.tripped = False
+        self.trips = 0
+        self._running = False
+        self._thread = None
+
+    # 指令来源收到新指令时调用
+    def feed(self, source='command', now=None):
+        now = time.monotonic() if now is None else now
+        self.sources[source] = now
+        if self._last_feed is None or now > self._last_feed:
+            self._last_feed = now
+
+    # 速度系数：最近指令在 deadline 内为 1，之后 ramp_time 内线性降到 0；从未收到指令为 0
+    def scale(self, now=None):
+        if self._last_feed is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        late = now - self._last_feed - self.deadline
+        if late <= 0:
+            return 1.0
+        if late >= self.ramp_time:
+            return 0.0
+        return 1.0 - late / self.ramp_time
+
+    # 距离开始降速还有多少秒：降速中为 0，已停止或从未收到指令为无穷大
+    # 事件驱动的控制循环据此安排唤醒，降速期间按较高频率发送
+    def until_ramp(self, now=None):
+        if self._last_feed is None:
+            return float('inf')
+        now = time.monotonic() if now is None else now
+        late = now - self._last_feed - self.deadline
+        if late < 0:
+            return -late
+        return 0.0 if late < self.ramp_time else float('inf')
+
+    # 控制循环每个周期调用，表示进程仍然存活
+    def tick(self, now=None):
+        self._last_tick = time.monotonic() if now is None else now
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._last_tick = time.monotonic()
+        self._running = True
+        self._thread = threading.Thread(target=self._monitor, name='watchdog', daemon=True)
+        self._thread.start()
+        return self
+
+    def _monitor(self):
+        while self._running:
+            time.sleep(self.check_period)
+            silent = time.monotonic() - self._last_tick
+            if not self.tripped and silent > self.liveness_timeout:
+                self.tripped = True
+                self.trips += 1
+                log.error("控制循环 %.2f 秒无响应，停止心跳", silent)
+                if self.heartbeat is not None:
+                    self.heartbeat.stop()
+                if self.on_trip is not None:
+                    try:
+                        self.on_trip()
+                    except Exception as e:
+                        log.error("on_trip 失败: %s", e)
+            elif self.tripped and silent <= self.liveness_timeout:
+                self.tripped = False
+                log.warning("控制循环恢复，重新启动心跳")
+                if self.heartbeat is not None:
+                    self.heartbeat.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {
+            "scale": self.scale(now),
+            "tripped": self.tripped,
+            "trips": self.trips,
+            "source_age": {name: now - t for name, t in self.sources.items()},
+        }
@@ -0,0 +1,201 @@
+# 二维码对齐控制器 - 以固定频率（默认100Hz）运行，与视觉帧率解耦
+# - x/y/yaw 三个方向分别做 PID，yaw 由二维码角点几何求得
+# - 两次视觉更新之间用匀速模型外推目标位置；提供里程计时改为按车体位移航位推算，目标短暂丢失也不停车
+# - 输出统一经 CarController.omni_move 发送
+import math
+import threading
+import time
+
+import numpy as np
+
+
+class PID:
+    def __init__(self, kp, ki=0.0, kd=0.0, output_limit=1.0, integral_limit=None):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit if integral_limit is not None else output_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.prev_error = None
+
+    def update(self, error, dt):
+        if dt <= 0:
+            dt = 1e-3
+        self.integral += error * dt
+        # 积分限幅，防止饱和时积分累积
+        if self.ki:
+            limit = self.integral_limit / self.ki
+            self.integral = max(-limit, min(limit, self.integral))
+        derivative = 0.0 if self.prev_error is None else (error - self.prev_error) / dt
+        self.prev_error = error
+        out = self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(-self.output_limit, min(self.output_limit, out))
+
+
+# 从二维码四个角点求归一化偏移 (x, y) 和平面内旋转角 yaw（弧度）
+# x、y 为中心相对图像中心的偏移，除以半宽/半高，范围约 [-1, 1]
+def bbox_pose(bbox, image_size):
+    pts = np.asarray(bbox, dtype=np.float64).reshape(4, 2)
+    width, height = image_size
+    cx, cy = pts.mean(axis=0)
+    x = (cx - width / 2) / (width / 2)
+    y = (cy - height / 2) / (height / 2)
+    # 上边（角点0->1）与下边（角点3->2）方向的平均角度
+    top = pts[1] - pts[0]
+    bottom = pts[2] - pts[3]
+    direction = top + bottom
+    yaw = math.atan2(direction[1], direction[0])
+    return np.array((x, y, yaw))
+
+
+# 匀速模型：记录最近一次测量与估计速度，在两次测量之间外推
+class ConstantVelocityFilter:
+    def __init__(self, smoothing=0.5, max_extrapolation=0.3):
+        self.smoothing = smoothing
+        self.max_extrapolation = max_extrapolation
+        self.reset()
+
+    def reset(self):
+        self.pose = None
+        self.velocity = np.zeros(3)
+        self.timestamp = None
+
+    def update(self, pose, timestamp):
+        if self.pose is not None and timestamp > self.timestamp:
+            measured = (pose - self.pose) / (timestamp - self.timestamp)
+            # 指数平滑速度，抑制检测噪声
+            self.velocity = self.smoothing * self.velocity + (1 - self.smoothing) * measured
+        self.pose = np.asarray(pose, dtype=np.float64)
+        self.timestamp = timestamp
+
+    # 预测某时刻的位置；没有测量或距上次测量过久时返回 None
+    def predict(self, now):
+        if self.pose is None:
+            return None
+        dt = now - self.timestamp
+        if dt > self.max_extrapolation:
+            return None
+        return self.pose + self.velocity * max(dt, 0.0)
+
+
+# 航位推算：记录视觉测量时刻的误差和里程计位姿，之后按测量以来的车体位移推算当前误差
+# 车体按指令方向移动会减小误差，因此 误差 = 测量误差 - signs * scale * 位移
+class DeadReckoningFilter:
+    # odometry: motor/odometry.py 的 Odometry（需要 pose、pose_at、delta）
+    # gain: 车体位移 (dx, dy, dtheta) 到误差 (x, y, yaw) 的换算（含符号）
+    def __init__(self, odometry, gain, max_extrapolation=2.0):
+        self.odometry = odometry
+        self.gain = np.asarray(gain, dtype=np.float64)
+        self.max_extrapolation = max_extrapolation
+        self.reset()
+
+    def reset(self):
+        self.pose = None
+        self.timestamp = None
+        self.origin = None
+
+    def update(self, pose, timestamp):
+        self.pose = np.asarray(pose, dtype=np.float64)
+        self.timestamp = timestamp
+        # 对齐到图像采集时刻的里程计位姿，扣除视觉处理延迟期间的移动
+        self.origin = self.odometry.pose_at(timestamp)
+
+    def predict(self, now):
+        if self.pose is None or now - self.timestamp > self.max_extrapolation:
+            return None
+        return self.pose - self.gain * self.odometry.delta(self.origin)
+
+
+class AlignmentController:
+    # controller: CarController 实例（需要 omni_move 和 stop）
+    # signs: 偏移到 omni_move (x, y, yaw) 分量的符号，按摄像头安装方向调整
+    # odometry: 提供时用航位推算代替匀速外推，最多推算 max_dead_reckon 秒；
+    #   odometry_scale 为里程计位移 (dx, dy, dtheta) 到误差单位的换算（如长度单位到米）
+    def __init__(self, controller, rate_hz=100, speed=1000, tolerance=(0.03, 0.03, math.radians(3)),
+                 gains=((1.2, 0.1, 0.05), (1.0, 0.1, 0.05), (0.8, 0.0, 0.02)), signs=(1, 1, -1),
+                 max_extrapolation=0.3, odometry=None, odometry_scale=(1.0, 1.0, 1.0), max_dead_reckon=2.0):
+        self.controller = controller
+        self.period = 1.0 / rate_hz
+        self.speed = speed
+        self.tolerance = np.array(tolerance)
+        self.signs = np.array(signs, dtype=np.float64)
+        self.pids = [PID(*g) for g in gains]
+        if odometry is not None:
+            self.filter = DeadReckoningFilter(odometry, self.signs * np.asarray(odometry_scale), max_dead_reckon)
+        else:
+            self.filter = ConstantVelocityFilter(max_extrapolation=max_extrapolation)
+        self.aligned = False
+        self.target_visible = False
+        self._lock = threading.Lock()
+        self._last_tick = None
+        self._moving = False
+        self._running = False
+        self._thread = None
+        self.ticks = 0
+        self.late_ticks = 0
+
+    # 视觉线程调用：传入二维码角点、图像尺寸 (宽, 高) 和采集时间戳
+    def update_vision(self, bbox, image_size, timestamp=None):
+        self.update_pose(bbox_pose(bbox, image_size), timestamp)
+
+    # 直接传入 (x, y, yaw) 误差，如 aruco_pose.marker_alignment_error 给出的米制误差
+    def update_pose(self, pose, timestamp=None):
+        with self._lock:
+            self.filter.update(np.asarray(pose, dtype=np.float64), time.time() if timestamp is None else timestamp)
+
+    # 执行一个控制周期，返回发送的 (x, y, yaw) 指令；目标不可见或已对齐时返回 None 并停车
+    def step(self, now=None):
+        now = time.time() if now is None else now
+        dt = self.period if self._last_tick is None else now - self._last_tick
+        self._last_tick = now
+        with self._lock:
+            pose = self.filter.predict(now)
+        self.target_visible = pose is not None
+        if pose is None or np.all(np.abs(pose) < self.tolerance):
+            self.aligned = pose is not None
+            for pid in self.pids:
+                pid.reset()
+            # 只在从运动切换到停止时发送一次停止，避免每个周期重复发送
+            if self._moving:
+                self.controller.stop()
+                self._moving = False
+            return None
+        self.aligned = False
+        command = [float(self.signs[i] * pid.update(pose[i], dt)) for i, pid in enumerate(self.pids)]
+        self.controller.omni_move(command[0], command[1], command[2], self.speed)
+        self._moving = True
+        return command
+
+    # 在独立线程中按固定频率运行 step（绝对时刻调度，不累积漂移）
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='alignment', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_time = time.monotonic()
+        while self._running:
+            self.step()
+            self.ticks += 1
+            next_time += self.period
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                self.late_ticks += 1
+                next_time = time.monotonic()
+            else:
+                time.sleep(delay)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.controller.stop()
+        self._moving = False
@@ -0,0 +1,56 @@
+# 并行检测池基准：对录制的视频，分别用 1..N 个工作者统计吞吐量和每帧延迟
+# 用法:
+#   python bench_detect_pool.py --video recorded.mjpeg --max-workers 4 [--kind process]
+#   python bench_detect_pool.py --synthetic 300
+import argparse
+import time
+
+import numpy as np
+
+from bench_qr_roi import load_video, synthetic_frames
+from detect_pool import DetectorPool
+
+
+def run(frames, workers, kind):
+    pool = DetectorPool(workers, kind=kind)
+    latencies = []
+    detected = 0
+    start = time.perf_counter()
+    for seq, frame in enumerate(frames, 1):
+        # 阻塞提交：测量饱和吞吐量
+        pool.submit(seq, 0.0, frame, block=True)
+        for _, (_, data, _, _, latency) in pool.results():
+            latencies.append(latency)
+            detected += data is not None
+    pool.wait_idle()
+    for _, (_, data, _, _, latency) in pool.results():
+        latencies.append(latency)
+        detected += data is not None
+    elapsed = time.perf_counter() - start
+    stale = pool.reorderer.stale
+    pool.shutdown()
+    return len(frames) / elapsed, np.array(latencies) * 1000, detected, stale
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video')
+    parser.add_argument('--synthetic', type=int, default=300)
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--kind', default='thread', choices=['thread', 'process'])
+    args = parser.parse_args()
+
+    frames = load_video(args.video, args.limit) if args.video else synthetic_frames(args.synthetic)
+    if not frames:
+        print("没有可用的帧")
+        return
+    print(f"帧数: {len(frames)}  工作者类型: {args.kind}")
+    print(f"{'工作者':>6}{'吞吐(帧/秒)':>14}{'延迟p50(ms)':>14}{'延迟p99(ms)':>14}{'检出':>8}{'过期丢弃':>10}")
+    for workers in range(1, args.max_workers + 1):
+        fps, lat, detected, stale = run(frames, workers, args.kind)
+        print(f"{workers:>6}{fps:>14.1f}{np.percentile(lat, 50):>14.2f}{np.percentile(lat, 99):>14.2f}{detected:>8}{stale:>10}")
+
+
+if __name__ == '__main__':
+    main()
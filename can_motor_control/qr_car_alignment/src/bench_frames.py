@@ -0,0 +1,130 @@
+# 录制帧离线基准：在 main.py --record 录制的真实画面上测量预处理和检测各阶段耗时
+# 通过索引直接定位每一帧（mmap 读取，raw 帧不复制），分阶段计时：
+#   load（定位/读取，jpeg 含解码） -> preprocess（preprocess_image） -> detect（检测器）
+# 输出检出率、与录制时检测结果的一致率，以及每个阶段的 p50/p99 毫秒
+# 用法:
+#   python src/main.py --source video.mjpeg --headless --record frames.bin   # 录制
+#   python bench_frames.py frames.bin                              # 全部帧，ROI跟踪检测（与main.py默认一致）
+#   python bench_frames.py frames.bin --detector full --blur 0 --pyramid 1
+#   python bench_frames.py frames.bin --detector aruco --sample 200          # 随机抽取200帧
+#   python bench_frames.py frames.bin --seq 1200 1201 1202                   # 指定帧序号
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from frame_recorder import FrameDataset
+from qr_detector import QRTracker
+from utils import preprocess_image
+
+STAGES = ('load', 'preprocess', 'detect')
+
+
+# 返回 detect(gray) -> 是否检出
+def make_detector(kind, args, calibration=None):
+    if kind == 'roi':
+        tracker = QRTracker()
+        return lambda gray: tracker.detect(gray)[1] is not None
+    if kind == 'full':
+        detector = cv2.QRCodeDetector()
+
+        def detect_full(gray):
+            data, points, _ = detector.detectAndDecode(gray)
+            return points is not None and bool(data)
+        return detect_full
+    from aruco_pose import ArucoPoseDetector
+    aruco = ArucoPoseDetector(calibration, args.marker_length)
+    return lambda gray: bool(aruco.detect(gray))
+
+
+def select_frames(dataset, args):
+    if args.seq:
+        positions = [dataset.find(seq) for seq in args.seq]
+        missing = [seq for seq, i in zip(args.seq, positions) if i is None]
+        if missing:
+            print(f"未找到帧序号: {missing}")
+        return [i for i in positions if i is not None]
+    positions = np.arange(args.start, len(dataset), args.step)
+    if args.sample:
+        rng = np.random.default_rng(0)
+        positions = np.sort(rng.choice(positions, min(args.sample, len(positions)), replace=False))
+    return [int(i) for i in positions[:args.count]]
+
+
+def run(dataset, positions, detect, args):
+    times = {stage: np.empty(len(positions)) for stage in STAGES}
+    detected = np.zeros(len(positions), dtype=bool)
+    # ArUco 位姿依赖标定内参，与 main.py 一样不做金字塔下采样
+    pyramid = 0 if args.detector == 'aruco' else args.pyramid
+    for n, i in enumerate(positions):
+        t0 = time.perf_counter()
+        frame = dataset.frame(i)
+        t1 = time.perf_counter()
+        gray = preprocess_image(frame, args.blur, pyramid)
+        t2 = time.perf_counter()
+        detected[n] = detect(gray)
+        t3 = time.perf_counter()
+        times['load'][n], times['preprocess'][n], times['detect'][n] = t1 - t0, t2 - t1, t3 - t2
+    return times, detected
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='main.py --record 录制的数据文件（索引为同名.idx）')
+    parser.add_argument('--detector', default='roi', choices=['roi', 'full', 'aruco'])
+    parser.add_argument('--blur', type=int, default=5)
+    parser.add_argument('--pyramid', type=int, default=0)
+    parser.add_argument('--marker-length', type=float, default=0.1)
+    parser.add_argument('--calibration', default=None)
+    # 帧选择：按位置范围/步长、随机抽样或帧序号
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--count', type=int, default=None)
+    parser.add_argument('--step', type=int, default=1)
+    parser.add_argument('--sample', type=int, default=0, help='随机抽取的帧数（0表示不抽样）')
+    parser.add_argument('--seq', type=int, nargs='+', default=None, help='指定帧序号')
+    parser.add_argument('--repeat', type=int, default=1, help='重复次数，取全部结果统计')
+    args = parser.parse_args()
+
+    dataset = FrameDataset(args.path)
+    index = dataset.index
+    if len(dataset) == 0:
+        print(f"{args.path}: 没有录制的帧")
+        return
+    formats = sorted({'jpeg' if f else 'raw' for f in np.unique(index['format'])})
+    span = index['timestamp'][-1] - index['timestamp'][0]
+    print(f"{args.path}: {len(dataset)} 帧，{index['width'][0]}x{index['height'][0]}x{index['channels'][0]}，"
+          f"{'/'.join(formats)}，录制时长 {span:.1f}s，录制时检出 {index['detected'].mean():.1%}")
+
+    positions = select_frames(dataset, args)
+    if not positions:
+        return
+    if args.detector == 'roi' and (args.sample or args.seq or args.step > 1):
+        print("注意: ROI跟踪依赖相邻帧，抽样/跳帧时命中率低于连续处理")
+
+    calibration = None
+    if args.detector == 'aruco':
+        from aruco_pose import load_calibration
+        calibration = load_calibration(args.calibration) if args.calibration else load_calibration()
+
+    all_times = {stage: [] for stage in STAGES}
+    detected = None
+    for _ in range(args.repeat):
+        # 每轮重新创建检测器，ROI跟踪状态不跨轮次
+        times, detected = run(dataset, positions, make_detector(args.detector, args, calibration), args)
+        for stage in STAGES:
+            all_times[stage].append(times[stage])
+
+    recorded = index['detected'][positions].astype(bool)
+    print(f"检测器 {args.detector}，blur {args.blur}，pyramid {args.pyramid}，{len(positions)} 帧 x {args.repeat} 轮")
+    print(f"检出率 {detected.mean():6.1%}（录制时 {recorded.mean():.1%}），与录制结果一致 {(detected == recorded).mean():.1%}"
+          f"，新检出 {int((detected & ~recorded).sum())} 帧，漏检 {int((~detected & recorded).sum())} 帧")
+    total = sum(np.concatenate(all_times[stage]) for stage in STAGES)
+    for stage, ms in [(stage, np.concatenate(all_times[stage]) * 1000) for stage in STAGES] + [('total', total * 1000)]:
+        print(f"{stage:<10} mean {ms.mean():7.2f}  p50 {np.percentile(ms, 50):7.2f}  p99 {np.percentile(ms, 99):7.2f}"
+              f"  max {ms.max():7.2f} ms/帧")
+    dataset.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# 采集+预处理每帧耗时对比：MJPEG解码->BGR->灰度->模糊，与直接读取YUV420的Y平面（可选模糊/金字塔）
+# 用法:
+#   python bench_preprocess.py --video recorded.mjpeg
+#   python bench_preprocess.py --synthetic 200
+import argparse
+import io
+import time
+
+import cv2
+import numpy as np
+
+from bench_qr_roi import load_video, synthetic_frames
+from frame_source import YUV420Reader
+from utils import preprocess_image
+
+
+def run_mjpeg(jpegs, blur):
+    times = []
+    for jpeg in jpegs:
+        start = time.perf_counter()
+        frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        preprocess_image(frame, blur)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_yuv(raw, count, size, blur, pyramid):
+    reader = YUV420Reader(io.BytesIO(raw), size[0], size[1])
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        _, gray = reader.read()
+        preprocess_image(gray, blur, pyramid)
+        times.append(time.perf_counter() - start)
+    reader.release()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video')
+    parser.add_argument('--synthetic', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    frames = load_video(args.video, args.limit) if args.video else synthetic_frames(args.synthetic)
+    if not frames:
+        print("没有可用的帧")
+        return
+    h, w = frames[0].shape[:2]
+    # 预先编码，模拟 libcamera-vid 的两种输出
+    jpegs = [cv2.imencode('.jpg', f, (cv2.IMWRITE_JPEG_QUALITY, 90))[1] for f in frames]
+    raw = b''.join(cv2.cvtColor(f, cv2.COLOR_BGR2YUV_I420).tobytes() for f in frames)
+
+    cases = [
+        ('MJPEG+模糊5', run_mjpeg(jpegs, 5)),
+        ('YUV+模糊5', run_yuv(raw, len(frames), (w, h), 5, 0)),
+        ('YUV', run_yuv(raw, len(frames), (w, h), 0, 0)),
+        ('YUV+金字塔1', run_yuv(raw, len(frames), (w, h), 0, 1)),
+    ]
+    print(f"帧数: {len(frames)}  分辨率: {w}x{h}")
+    for name, times in cases:
+        ms = np.array(times) * 1000
+        print(f"{name:<12} mean {ms.mean():7.3f}  p50 {np.percentile(ms, 50):7.3f}  p99 {np.percentile(ms, 99):7.3f} ms/帧")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# 二维码检测基准：全图 detectAndDecode 与 ROI 跟踪模式的每帧耗时对比
+# 用法:
+#   python bench_qr_roi.py --video recorded.mjpeg     # 录制的视频（cv2.VideoCapture 可打开的任意文件）
+#   python bench_qr_roi.py --synthetic 300            # 无录像时生成移动二维码的合成帧
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from qr_detector import QRTracker
+from utils import preprocess_image
+
+
+def load_video(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+# 生成在噪声背景上平滑移动的二维码帧
+def synthetic_frames(count, text='CAR-01', size=140, shape=(480, 640)):
+    code = cv2.QRCodeEncoder.create().encode(text)
+    code = cv2.resize(code, (size, size), interpolation=cv2.INTER_NEAREST)
+    code = cv2.copyMakeBorder(code, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+    code = cv2.cvtColor(code, cv2.COLOR_GRAY2BGR)
+    ch, cw = code.shape[:2]
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(60, 200, size=(shape[0], shape[1], 3), dtype=np.uint8)
+        x = int((shape[1] - cw) * (0.5 + 0.4 * np.sin(i / 40)))
+        y = int((shape[0] - ch) * (0.5 + 0.4 * np.cos(i / 55)))
+        frame[y:y + ch, x:x + cw] = code
+        frames.append(frame)
+    return frames
+
+
+def run_full(frames):
+    detector = cv2.QRCodeDetector()
+    times, hits = [], 0
+    for frame in frames:
+        gray = preprocess_image(frame)
+        start = time.perf_counter()
+        data, points, _ = detector.detectAndDecode(gray)
+        times.append(time.perf_counter() - start)
+        hits += points is not None and bool(data)
+    return times, hits, {}
+
+
+def run_roi(frames):
+    tracker = QRTracker()
+    times, hits, modes = [], 0, {}
+    for frame in frames:
+        gray = preprocess_image(frame)
+        start = time.perf_counter()
+        data, points = tracker.detect(gray)
+        times.append(time.perf_counter() - start)
+        hits += points is not None
+        modes[tracker.mode] = modes.get(tracker.mode, 0) + 1
+    return times, hits, modes
+
+
+def report(name, times, hits, total, modes):
+    ms = np.array(times) * 1000
+    print(f"{name:<6} mean {ms.mean():7.2f}  p50 {np.percentile(ms, 50):7.2f}  p99 {np.percentile(ms, 99):7.2f} ms/帧"
+          f"  检出率 {hits / total:6.1%}" + (f"  模式 {modes}" if modes else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video')
+    parser.add_argument('--synthetic', type=int, default=300)
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    frames = load_video(args.video, args.limit) if args.video else synthetic_frames(args.synthetic)
+    if not frames:
+        print("没有可用的帧")
+        return
+    print(f"帧数: {len(frames)}  分辨率: {frames[0].shape[1]}x{frames[0].shape[0]}")
+    for name, run in (('full', run_full), ('roi', run_roi)):
+        times, hits, modes = run(frames)
+        report(name, times, hits, len(frames), modes)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,80 +1,117 @@
-# 导入CAN通信库
-import can
 import math
-
-# 电机参数 - 与remote_control_gui.py保持一致
-MOTORS = [
-    {"id": 0x65, "channel": "can0"},  # 左前
-    {"id": 0x66, "channel": "can0"},  # 右前
-    {"id": 0x67, "channel": "can1"},  # 右后
-    {"id": 0x68, "channel": "can1"},  # 左后
-]
-station_nos = [0x01, 0x02, 0x03, 0x04]  # 对应的站号
-
-# 创建速度控制帧的函数 - 与remote_control_gui.py保持一致
-def speed_frame(station_no, speed_rpm):
-    # 将速度值转换为4字节小端序有符号整数
-    speed_bytes = int(speed_rpm).to_bytes(4, byteorder='little', signed=True)
-    # 返回完整的速度控制帧数据
-    return [station_no, 0x20, 0x00, speed_bytes[0], speed_bytes[1], speed_bytes[2], speed_bytes[3], 0xFF]
-
-# 发送电机速度指令的独立函数 - 与remote_control_gui.py保持一致
-def send_motor_speeds(buses, speeds):
-    for i, motor in enumerate(MOTORS):
-        frame = speed_frame(station_nos[i], int(speeds[i]))
-        msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-        buses[i].send(msg)
+import os
+import numpy as np
+import sys
+
+# 电机参数与CAN帧编码统一由 motor/can_frames.py 提供
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'motor'))
+from can_frames import MOTORS, station_nos, SpeedFrameEncoder, send_motor_speeds, enable_frame, heartbeat_frame, make_message
+from heartbeat import HeartbeatScheduler
+from can_tx import CanTxManager
+from can_rx import MotorTelemetry, FeedbackReceiver
+# CAN总线工厂：socketcan / vcan / 进程内仿真伺服
+from can_bus import open_buses
+from mecanum import MecanumKinematics
+from setpoint_ramp import SetpointRamp, RampStreamer
+from odometry import Odometry, OdometryTracker, DISTANCE_PER_REV
 
 # 小车控制器类
 class CarController:
     # 初始化函数
-    def __init__(self):
-        # 导入os模块用于执行系统命令
-        import os
-        # 配置CAN0接口，设置为1Mbps速率 - 与remote_control_gui.py保持一致
-        os.system("sudo ip link set can0 down")
-        os.system("sudo ip link set can0 type can bitrate 1000000")
-        os.system("sudo ip link set can0 up")
-        # 配置CAN1接口，设置为1Mbps速率 - 与remote_control_gui.py保持一致
-        os.system("sudo ip link set can1 down")
-        os.system("sudo ip link set can1 type can bitrate 1000000")
-        os.system("sudo ip link set can1 up")
-        # 初始化CAN0总线接口
-        self.bus0 = can.interface.Bus(channel="can0", bustype='socketcan')
-        # 初始化CAN1总线接口
-        self.bus1 = can.interface.Bus(channel="can1", bustype='socketcan')
+    # ramp: 为True时速度指令经加速度/加加速度限制后由独立线程以100Hz平滑输出；False时直接发送目标转速
+    # distance_per_rev: 电机每转一圈轮子走过的距离（与L/W同单位），用于里程计
+    # backend: CAN后端 socketcan（实车，配置为1Mbps）/ vcan / sim（进程内仿真伺服），默认取环境变量CAR_CAN_BACKEND
+    def __init__(self, ramp=True, distance_per_rev=DISTANCE_PER_REV, backend=None):
+        # 打开CAN0、CAN1总线接口 - 与remote_control_gui.py保持一致
+        self.can = open_buses(backend)
+        self.bus0 = self.can["can0"]
+        self.bus1 = self.can["can1"]
+        # 每个通道一个发送线程，控制、心跳等线程都经由发送队列写总线
+        self.tx = CanTxManager({"can0": self.bus0, "can1": self.bus1})
         # 创建总线映射列表，对应四个电机的CAN通道 - 与remote_control_gui.py保持一致
-        self.buses = [self.bus0, self.bus0, self.bus1, self.bus1]
+        self.buses = self.tx.motor_buses()
         
         # 车体参数 - 与remote_control_gui.py保持一致
         self.L = 80  # 前后长
         self.W = 60  # 左右宽
         self.speed_max = 5000  # 最大速度
+        # 麦克纳姆轮运动学（由L/W预先计算混合矩阵，超速时四轮等比缩放）
+        self.kinematics = MecanumKinematics(self.L, self.W, self.speed_max)
         
+        # 预分配的速度帧编码器，控制周期内不再新建消息对象
+        self.encoder = SpeedFrameEncoder()
+        # 预先构建心跳帧，每次发送复用同一组消息
+        self.heartbeat_msgs = [make_message(motor["id"], heartbeat_frame(station_nos[i])) for i, motor in enumerate(MOTORS)]
+        # 周期心跳调度器，SocketCAN上由内核BCM循环发送，调用start_heartbeat()启动
+        self.heartbeat = HeartbeatScheduler(self.buses)
+        # 伺服反馈：异步接收并解码到每个电机的环形缓冲区，调用start_feedback()启动
+        self.telemetry = MotorTelemetry()
+        self.feedback = FeedbackReceiver([self.bus0, self.bus1], self.telemetry, self.buses)
+
         # 使能所有电机
         for i, motor in enumerate(MOTORS):
-            # 构建使能帧
-            frame = [station_nos[i], 0x25, 0x01, 0, 0, 0, 0, 0xFF]
-            # 创建CAN消息
-            msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-            # 发送CAN消息
-            self.buses[i].send(msg)
+            # 构建并发送使能帧
+            self.buses[i].send(make_message(motor["id"], enable_frame(station_nos[i])))
+
+        # 设定值平滑：每个轮子限制加速度和加加速度，stop()使用更大但有限的减速度
+        self.streamer = RampStreamer(self.buses, SetpointRamp(), encoder=self.encoder).start() if ramp else None
+        # 未平滑时最近一次发送的目标转速，供里程计使用
+        self.commanded = np.zeros(4)
+        # 里程计：由指令转速或伺服反馈转速积分车体位姿，调用start_odometry()启动
+        self.odometry = Odometry(self.kinematics, distance_per_rev)
+        self.odometry_tracker = None
 
     # 发送心跳包函数，保持电机连接 - 与remote_control_gui.py保持一致
     def send_heartbeat(self):
-        # 为每个电机发送心跳帧
-        for i, motor in enumerate(MOTORS):
-            # 构建心跳帧
-            frame = [station_nos[i], 0x08, 0, 0, 0, 0, 0, 0xFF]
-            # 创建CAN消息
-            msg = can.Message(arbitration_id=motor["id"], data=frame, is_extended_id=False)
-            # 发送CAN消息
-            self.buses[i].send(msg)
+        # 为每个电机发送预先构建的心跳帧
+        for bus, msg in zip(self.buses, self.heartbeat_msgs):
+            bus.send(msg)
+
+    # 启动周期心跳（替代Python线程中的sleep循环）
+    def start_heartbeat(self):
+        self.heartbeat.start()
+
+    # 启动伺服反馈接收（在独立线程的asyncio事件循环中运行）
+    def start_feedback(self):
+        self.feedback.start()
+
+    # 查询四个轮子的最新反馈速度（rpm，未收到为nan），不阻塞控制循环
+    def wheel_feedback(self):
+        return self.telemetry.wheel_speeds()
+
+    # 查询某个电机的最新状态：速度、电流、运行状态、位置、报警代码
+    def motor_status(self, index):
+        return self.telemetry.latest(index)
+
+    # 当前指令转速：平滑时为平滑后的设定值，否则为最近一次发送的目标转速
+    def commanded_speeds(self):
+        if self.streamer is not None:
+            return self.streamer.ramp.velocity.copy()
+        return self.commanded.copy()
+
+    # 启动里程计：source为'command'时积分指令转速，'feedback'时积分伺服反馈转速（需先start_feedback()）
+    def start_odometry(self, source='command', rate_hz=100):
+        read = self.wheel_feedback if source == 'feedback' else self.commanded_speeds
+        self.odometry_tracker = OdometryTracker(self.odometry, read, rate_hz).start()
+        return self.odometry
+
+    # 最新位姿快照 (timestamp, x, y, theta, vx, vy, omega)，不阻塞里程计线程
+    def pose(self):
+        return self.odometry.pose()
 
     # 发送电机速度指令函数
     def send_motor_speeds(self, speeds):
-        # 调用与remote_control_gui.py一致的独立函数
-        send_motor_speeds(self.buses, speeds)
+        if self.streamer is not None:
+            # 只更新目标转速，由平滑线程按加速度限制逐步逼近
+            self.streamer.set_target(speeds)
+            return
+        self.commanded[:] = speeds
+        # 调用与remote_control_gui.py一致的独立函数，使用本控制器的预分配编码器
+        send_motor_speeds(self.buses, speeds, self.encoder)
+
+    # 等待平滑后的设定值到达目标转速，返回是否到达
+    def wait_settled(self, timeout=None):
+        return self.streamer is None or self.streamer.wait_settled(timeout)
 
     # 前进函数
     def move_forward(self, speed):
@@ -98,6 +135,10 @@ class CarController:
 
     # 停止函数
     def stop(self):
+        if self.streamer is not None:
+            # 以停车限制快速减速到0
+            self.streamer.set_target(None, stopping=True)
+            return
         # 所有电机速度设为0
         self.send_motor_speeds([0, 0, 0, 0])
 
@@ -134,11 +175,12 @@ class CarController:
         self.send_motor_speeds([v1, v2, v3, v4])
 
     # 根据二维码位置对齐小车函数 - 实现基于位置的对齐逻辑
-    def align_to_qr(self, qr_position):
+    # 单帧的简单比例对齐；连续闭环对齐请使用alignment.py中的AlignmentController（固定频率PID）
+    def align_to_qr(self, qr_position, image_size=(640, 480)):
         # 假设qr_position是(x, y)坐标，其中(0,0)是图像左上角，(width, height)是图像右下角
         # 获取图像中心位置
-        img_center_x = 320  # 假设图像宽度为640像素
-        img_center_y = 240  # 假设图像高度为480像素
+        img_center_x = image_size[0] / 2
+        img_center_y = image_size[1] / 2
         
         # 计算二维码中心与图像中心的偏移量
         offset_x = qr_position[0] - img_center_x
@@ -184,18 +226,24 @@ class CarController:
         # yaw: 转向分量 (-1到1)
         # speed: 基础速度值
         
-        # 菱形麦克纳姆轮速度解算（左前、右前、右后、左后）
-        v1 = speed * (y - x + yaw)
-        v2 = speed * (-y - x + yaw)
-        v3 = speed * (-y + x + yaw)
-        v4 = speed * (y + x + yaw)
-        
-        self.send_motor_speeds([v1, v2, v3, v4])
+        # 菱形麦克纳姆轮速度解算（左前、右前、右后、左后），任一轮超过speed_max时整体缩放
+        self.send_motor_speeds(self.kinematics.mix(x, y, yaw, speed))
 
     # 关闭CAN总线连接
     def shutdown(self):
         # 停止所有电机
         self.stop()
-        # 关闭CAN总线连接
-        self.bus0.shutdown()
-        self.bus1.shutdown()
\ No newline at end of file
+        if self.streamer is not None:
+            # 等待减速完成后停止平滑线程，再直接发送一次0速度
+            self.streamer.wait_settled(timeout=1.0)
+            self.streamer.stop()
+            send_motor_speeds(self.buses, [0, 0, 0, 0], self.encoder)
+        if self.odometry_tracker is not None:
+            self.odometry_tracker.stop()
+        # 停止周期心跳和反馈接收
+        self.heartbeat.stop()
+        self.feedback.stop()
+        # 发送完队列中剩余的停止帧后关闭发送线程
+        self.tx.close()
+        # 关闭CAN总线连接（sim后端同时停止仿真伺服）
+        self.can.shutdown()
\ No newline at end of file
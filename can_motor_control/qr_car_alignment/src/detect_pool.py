@@ -0,0 +1,126 @@
+# 并行检测池：多个检测工作者同时处理多帧，结果按帧序号重新排序
+# OpenCV 的检测在 C++ 中释放 GIL，线程池即可并行；也可选进程池（图像需要拷贝到子进程）
+# 比已应用到控制器的结果更旧的检测结果会被直接丢弃
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import cv2
+
+from utils import preprocess_image
+
+log = logging.getLogger('detect_pool')
+
+_local = threading.local()
+_process_detector = None
+
+
+# 每个线程使用自己的检测器，QRCodeDetector 不是线程安全的
+def _thread_detect(frame, blur, pyramid):
+    detector = getattr(_local, 'detector', None)
+    if detector is None:
+        detector = _local.detector = cv2.QRCodeDetector()
+    return _detect(detector, frame, blur, pyramid)
+
+
+def _process_init():
+    global _process_detector
+    _process_detector = cv2.QRCodeDetector()
+
+
+def _process_detect(frame, blur, pyramid):
+    return _detect(_process_detector, frame, blur, pyramid)
+
+
+# 预处理参数与 main.py 单线程检测相同；金字塔下采样后检测到的角点换算回原图坐标
+def _detect(detector, frame, blur, pyramid):
+    start = time.perf_counter()
+    data, points, _ = detector.detectAndDecode(preprocess_image(frame, blur, pyramid))
+    bbox = (points.reshape(4, 2) * (2 ** pyramid)).tolist() if points is not None and data else None
+    return (data or None), bbox, time.perf_counter() - start
+
+
+# 按帧序号重组结果；比已应用结果更旧的结果丢弃
+class ResultReorderer:
+    def __init__(self):
+        self.last_applied = 0
+        self.stale = 0
+        self._ready = {}
+        self._lock = threading.Lock()
+
+    def add(self, seq, result):
+        with self._lock:
+            if seq <= self.last_applied:
+                # 更新的帧已经应用到控制器
+                self.stale += 1
+                return
+            self._ready[seq] = result
+
+    # 取出所有可应用的结果（按序号升序），最后一个即为最新结果
+    def drain(self):
+        with self._lock:
+            if not self._ready:
+                return []
+            items = sorted(self._ready.items())
+            self._ready.clear()
+            self.last_applied = items[-1][0]
+            return items
+
+
+class DetectorPool:
+    # workers: 工作者数量；kind: 'thread' 或 'process'；max_inflight: 同时处理的最大帧数，默认等于工作者数
+    # blur / pyramid: 预处理参数，与 utils.preprocess_image 相同
+    def __init__(self, workers=2, kind='thread', max_inflight=None, blur=5, pyramid=0):
+        self.workers = workers
+        self.kind = kind
+        self.blur = blur
+        self.pyramid = pyramid
+        self.max_inflight = max_inflight or workers
+        if kind == 'process':
+            self._executor = ProcessPoolExecutor(workers, initializer=_process_init)
+            self._fn = _process_detect
+        else:
+            self._executor = ThreadPoolExecutor(workers, thread_name_prefix='qr-detect')
+            self._fn = _thread_detect
+        self.reorderer = ResultReorderer()
+        self._inflight = threading.Semaphore(self.max_inflight)
+        self.submitted = 0
+        self.skipped = 0
+
+    # 提交一帧；所有工作者都忙时 block=False 直接跳过该帧（实时模式），返回是否已提交
+    def submit(self, seq, capture_time, frame, block=False):
+        if not self._inflight.acquire(blocking=block):
+            self.skipped += 1
+            return False
+        submit_time = time.perf_counter()
+        future = self._executor.submit(self._fn, frame, self.blur, self.pyramid)
+        self.submitted += 1
+
+        def done(fut):
+            # 结果加入重组器之后才释放名额，wait_idle() 返回时所有结果都已可取出
+            try:
+                data, bbox, detect_time = fut.result()
+                latency = time.perf_counter() - submit_time
+                self.reorderer.add(seq, (capture_time, data, bbox, detect_time, latency))
+            except Exception as e:
+                log.debug("帧 %d 检测失败: %s", seq, e)
+            finally:
+                self._inflight.release()
+
+        future.add_done_callback(done)
+        return True
+
+    # 取出按序号排列的新结果列表 [(seq, (capture_time, data, bbox, detect_time, latency)), ...]
+    def results(self):
+        return self.reorderer.drain()
+
+    # 等待所有已提交的帧处理完成
+    def wait_idle(self):
+        for _ in range(self.max_inflight):
+            self._inflight.acquire()
+        for _ in range(self.max_inflight):
+            self._inflight.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
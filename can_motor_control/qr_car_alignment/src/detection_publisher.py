@@ -0,0 +1,258 @@
+# 检测结果发布器 - 替代在视觉循环中直接 sock.sendall
+# - 每条记录带长度前缀的紧凑二进制格式：时间戳、帧序号、内容、角点、位姿
+# - 内容不变时不重复发送；记录先进入有界队列（满时丢弃最旧的），由后台线程成批发送
+# - 后台线程使用非阻塞套接字（TCP 或 Unix 域套接字），断开后按指数退避重连
+# 视觉循环只做一次编码和入队，下游再慢也不会阻塞检测
+# 测试用接收端（打印收到的记录）:
+#   python detection_publisher.py serve --port 9000
+#   python detection_publisher.py serve --unix /tmp/detections.sock
+import argparse
+import collections
+import logging
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+# 记录格式（小端）:
+#   u16 记录长度（不含本字段） | f64 时间戳 | u32 帧序号 | u8 标志 | u16 内容长度 | 内容 | [8 x f32 角点] | [3 x f32 位姿]
+_LENGTH = struct.Struct('<H')
+_HEADER = struct.Struct('<dIBH')
+_BBOX = struct.Struct('<8f')
+_POSE = struct.Struct('<3f')
+FLAG_BBOX = 0x01
+FLAG_POSE = 0x02
+
+log = logging.getLogger('detection_publisher')
+
+
+def encode_record(timestamp, seq, payload, bbox=None, pose=None):
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    flags = (FLAG_BBOX if bbox is not None else 0) | (FLAG_POSE if pose is not None else 0)
+    body = _HEADER.pack(timestamp, seq & 0xFFFFFFFF, flags, len(payload)) + payload
+    if bbox is not None:
+        body += _BBOX.pack(*[float(v) for v in _flatten(bbox)])
+    if pose is not None:
+        body += _POSE.pack(*[float(v) for v in pose])
+    return _LENGTH.pack(len(body)) + body
+
+
+def _flatten(bbox):
+    if hasattr(bbox, 'reshape'):
+        return bbox.reshape(-1).tolist()
+    return [v for point in bbox for v in point]
+
+
+# 从缓冲区解析完整的记录，返回 (记录列表, 已消耗字节数)；不完整的记录留给下次
+def decode_records(buffer):
+    records = []
+    offset = 0
+    while len(buffer) - offset >= _LENGTH.size:
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        end = offset + _LENGTH.size + length
+        if len(buffer) < end:
+            break
+        pos = offset + _LENGTH.size
+        timestamp, seq, flags, payload_len = _HEADER.unpack_from(buffer, pos)
+        pos += _HEADER.size
+        payload = bytes(buffer[pos:pos + payload_len])
+        pos += payload_len
+        bbox = pose = None
+        if flags & FLAG_BBOX:
+            values = _BBOX.unpack_from(buffer, pos)
+            bbox = [values[i:i + 2] for i in range(0, 8, 2)]
+            pos += _BBOX.size
+        if flags & FLAG_POSE:
+            pose = _POSE.unpack_from(buffer, pos)
+        records.append((timestamp, seq, payload, bbox, pose))
+        offset = end
+    return records, offset
+
+
+class DetectionPublisher:
+    # address: (主机, 端口) 表示TCP，字符串表示Unix域套接字路径
+    # max_backlog: 未发送记录的最大条数，超出时丢弃最旧的
+    # batch_interval: 成批发送的间隔（秒）
+    # refresh: 内容不变时重新发送的最小间隔（秒），None 表示只在内容变化时发送
+    def __init__(self, address=('127.0.0.1', 9000), max_backlog=256, batch_interval=0.02,
+                 min_backoff=0.1, max_backoff=5.0, refresh=None):
+        self.address = address
+        self.batch_interval = batch_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.refresh = refresh
+        self._backlog = collections.deque(maxlen=max_backlog)
+        self._cond = threading.Condition()
+        self._last_payload = None
+        self._last_publish = 0.0
+        self._sock = None
+        self._running = False
+        self._thread = None
+        # 计数器
+        self.published = 0
+        self.unchanged = 0
+        self.dropped = 0
+        self.sent = 0
+        self.batches = 0
+        self.connect_failures = 0
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='detection-publisher', daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    # 视觉循环调用：编码并入队，从不阻塞；返回是否入队
+    def publish(self, seq, timestamp, payload, bbox=None, pose=None):
+        now = time.monotonic()
+        if payload == self._last_payload and (self.refresh is None or now - self._last_publish < self.refresh):
+            self.unchanged += 1
+            return False
+        self._last_payload = payload
+        self._last_publish = now
+        record = encode_record(timestamp, seq, payload, bbox, pose)
+        with self._cond:
+            if len(self._backlog) == self._backlog.maxlen:
+                self.dropped += 1
+            self._backlog.append(record)
+            self.published += 1
+        return True
+
+    # 目标丢失后，下次检测到同样内容也要重新发送
+    def reset(self):
+        self._last_payload = None
+
+    def _connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(1.0)
+        try:
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        return sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _run(self):
+        backoff = self.min_backoff
+        pending = b''
+        while self._running:
+            if self._sock is None:
+                try:
+                    self._sock = self._connect()
+                    log.info("已连接 %s", self.address)
+                    backoff = self.min_backoff
+                    # 上次连接未发送完的记录已无法续接，丢弃
+                    pending = b''
+                except OSError:
+                    # 指数退避重连；等待期间记录继续入队，满了丢弃最旧的
+                    with self._cond:
+                        self._cond.wait_for(lambda: not self._running, backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    self.connect_failures += 1
+                    continue
+            # 上一批发送完后才取下一批，未发送的记录只在有界队列中累积
+            if not pending:
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, self.batch_interval)
+                    if self._backlog:
+                        count = len(self._backlog)
+                        pending = b''.join(self._backlog)
+                        self._backlog.clear()
+                        self.sent += count
+                        self.batches += 1
+            if not pending:
+                continue
+            try:
+                # 套接字可写时尽量发送；下游跟不上时剩余部分留到下一批
+                _, writable, _ = select.select([], [self._sock], [], self.batch_interval)
+                if writable:
+                    pending = pending[self._sock.send(pending):]
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError as e:
+                log.warning("连接断开: %s", e)
+                self._disconnect()
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "published": self.published,
+            "unchanged": self.unchanged,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "batches": self.batches,
+            "connect_failures": self.connect_failures,
+        }
+
+    def close(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._disconnect()
+
+
+def serve(args):
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(args.unix)
+    else:
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((args.host, args.port))
+    server.listen(1)
+    print(f"等待连接 {args.unix or (args.host, args.port)}")
+    while True:
+        conn, _ = server.accept()
+        buffer = bytearray()
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            buffer += chunk
+            records, consumed = decode_records(buffer)
+            del buffer[:consumed]
+            for timestamp, seq, payload, bbox, pose in records:
+                latency = (time.time() - timestamp) * 1000
+                print(f"seq={seq} latency={latency:.1f}ms payload={payload.decode('utf-8', 'replace')}"
+                      + (f" bbox={[(round(x), round(y)) for x, y in bbox]}" if bbox else "")
+                      + (f" pose={[round(v, 3) for v in pose]}" if pose else ""))
+        conn.close()
+        print("连接断开")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    srv = sub.add_parser('serve', help='接收并打印检测记录')
+    srv.add_argument('--host', default='127.0.0.1')
+    srv.add_argument('--port', type=int, default=9000)
+    srv.add_argument('--unix')
+    serve(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# 帧录制与索引数据集 - 保存检测循环实际处理的帧，离线重放用于检测算法基准测试
+# 录制（main.py --record frames.bin）：
+# - 每次录制新建数据文件，按帧顺序追加，每帧为原始像素（raw，灰度/BGR）或 JPEG（jpeg，编码在后台线程中进行）
+# - 旁路索引文件 frames.bin.idx：每帧一条定长记录（帧序号 -> 文件偏移、长度、采集时间戳、尺寸、格式、检测结果）
+# - 写入在后台线程中进行，等待写入的帧超过上限时丢弃并计数，检测循环不等待磁盘
+# - 并行检测池模式下检测结果晚于帧返回：帧以 wait=True 登记，resolve() 写入该帧自己的检测结果后再按顺序写出
+# 读取（FrameDataset）：索引和数据文件都 mmap，按帧序号或位置直接定位任意一帧；raw 帧返回文件映射的视图，不复制
+import mmap
+import os
+import queue
+from collections import deque
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+FORMAT_RAW = 0
+FORMAT_JPEG = 1
+FORMATS = {'raw': FORMAT_RAW, 'jpeg': FORMAT_JPEG}
+
+# 索引记录：u32 帧序号 | u64 偏移 | u32 长度 | f64 采集时间戳 | u16 宽 | u16 高 | u8 通道数 | u8 格式 |
+#           u8 是否检出 | 3×f32 位姿 | i32 标记ID（二维码为 -1）
+INDEX_RECORD = struct.Struct('<IQIdHHBBB3fi')
+# 同样布局的 numpy 结构化类型（无对齐填充），供 FrameDataset 直接映射索引文件
+INDEX_FIELDS = [('seq', '<u4'), ('offset', '<u8'), ('length', '<u4'), ('timestamp', '<f8'), ('width', '<u2'),
+                ('height', '<u2'), ('channels', 'u1'), ('format', 'u1'), ('detected', 'u1'), ('pose', '<f4', (3,)),
+                ('marker', '<i4')]
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+class FrameRecorder:
+    # path: 数据文件路径；fmt: 'raw' 或 'jpeg'；max_pending: 等待写入的帧数上限
+    def __init__(self, path, fmt='raw', quality=90, max_pending=32):
+        self.path = path
+        self.format = FORMATS[fmt]
+        self.quality = quality
+        self._data = open(path, 'wb')
+        self._index = open(index_path(path), 'wb')
+        self._offset = 0
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        # 等待检测结果的帧（及其后的帧，保持帧序号递增）：[seq, timestamp, frame, pose, marker, waiting]
+        self._held = deque()
+        self._thread = None
+        # 计数器
+        self.recorded = 0
+        self.dropped = 0
+        self.bytes = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_loop, name='frame-recorder', daemon=True)
+            self._thread.start()
+        return self
+
+    # 检测循环中调用：frame 在写入前不能被修改（需要在帧上绘制标注时先传入副本）
+    # pose: 检出时的位姿（3个数），None 表示未检出；marker: ArUco 标记ID，二维码为 -1
+    # wait: 该帧的检测结果尚未返回，暂存到 resolve()/release() 之后再写出
+    def record(self, seq, timestamp, frame, pose=None, marker=-1, wait=False):
+        if not wait and not self._held:
+            self._put((seq, timestamp, frame, pose, marker))
+            return
+        self._held.append([seq, timestamp, frame, pose, marker, wait])
+        # 检测结果迟迟不返回（工作者异常）时不无限暂存，最早的帧按未检出写出
+        if len(self._held) > self.max_pending:
+            self._held[0][5] = False
+        self._flush()
+
+    # 写入暂存帧 seq 的检测结果
+    def resolve(self, seq, pose, marker=-1):
+        for entry in self._held:
+            if entry[0] == seq:
+                entry[3], entry[4], entry[5] = pose, marker, False
+                break
+        self._flush()
+
+    # 序号不大于 seq 且仍在等待的帧不会再有结果（过期结果已被丢弃），按未检出写出
+    def release(self, seq=None, block=False):
+        for entry in self._held:
+            if seq is None or entry[0] <= seq:
+                entry[5] = False
+        self._flush(block)
+
+    def _flush(self, block=False):
+        while self._held and not self._held[0][5]:
+            self._put(tuple(self._held.popleft()[:5]), block)
+
+    def _put(self, item, block=False):
+        try:
+            self._queue.put(item, block=block)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            seq, timestamp, frame, pose, marker = item
+            height, width = frame.shape[:2]
+            channels = 1 if frame.ndim == 2 else frame.shape[2]
+            if self.format == FORMAT_JPEG:
+                # imencode 释放 GIL，不影响检测线程
+                ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                data = encoded.data if ok else memoryview(b'')
+            else:
+                data = np.ascontiguousarray(frame).data
+            self._data.write(data)
+            length = data.nbytes
+            detected = pose is not None
+            self._index.write(INDEX_RECORD.pack(seq & 0xFFFFFFFF, self._offset, length, timestamp, width, height,
+                                                channels, self.format, detected,
+                                                *(pose if detected else (0.0, 0.0, 0.0)), marker))
+            self._offset += length
+            self.recorded += 1
+            self.bytes += length
+            self._queue.task_done()
+
+    def stats(self):
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "megabytes": round(self.bytes / 1e6, 1),
+        }
+
+    # 写完暂存和队列中剩余的帧后关闭文件
+    def close(self):
+        # 关闭时等待写入线程腾出队列，暂存的帧不丢弃
+        self.release(block=self._thread is not None)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._data.close()
+        self._index.close()
+
+
+class FrameDataset:
+    def __init__(self, path):
+        self.path = path
+        dtype = np.dtype(INDEX_FIELDS)
+        count = os.path.getsize(index_path(path)) // dtype.itemsize
+        self.index = (np.memmap(index_path(path), dtype=dtype, mode='r', shape=(count,)) if count
+                      else np.zeros(0, dtype))
+        self._file = open(path, 'rb')
+        self._data = (mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                      if os.path.getsize(path) else b'')
+
+    def __len__(self):
+        return len(self.index)
+
+    # 按位置读取一帧：raw 返回映射内存的只读视图，jpeg 解码为新数组
+    def frame(self, i):
+        entry = self.index[i]
+        raw = np.frombuffer(self._data, dtype=np.uint8, count=int(entry['length']), offset=int(entry['offset']))
+        if entry['format'] == FORMAT_JPEG:
+            flags = cv2.IMREAD_GRAYSCALE if entry['channels'] == 1 else cv2.IMREAD_COLOR
+            return cv2.imdecode(raw, flags)
+        shape = (entry['height'], entry['width']) if entry['channels'] == 1 else \
+            (entry['height'], entry['width'], entry['channels'])
+        return raw.reshape(shape)
+
+    # 帧序号 -> 位置（帧序号按录制顺序递增，二分查找），不存在时返回 None
+    def find(self, seq):
+        seqs = self.index['seq']
+        i = int(np.searchsorted(seqs, seq))
+        return i if i < len(seqs) and seqs[i] == seq else None
+
+    def close(self):
+        self.index = np.zeros(0, self.index.dtype)
+        if isinstance(self._data, mmap.mmap):
+            try:
+                self._data.close()
+            except BufferError:
+                # 仍有 frame() 返回的视图在使用，映射随其释放
+                pass
+        self._file.close()
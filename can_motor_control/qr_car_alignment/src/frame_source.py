@@ -0,0 +1,120 @@
+# 图像采集模块 - 独立线程持续读取摄像头，只保留最新一帧
+# 检测循环总是拿到最新的帧，不再需要跳帧计算；检测慢时旧帧直接被覆盖（计入丢帧数）
+# YUV420Reader 直接读取原始 YUV420 帧，取 Y 平面作为灰度图，省去 MJPEG 解码和 BGR->灰度转换
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+# 原始 YUV420 (I420) 帧读取器，接口与 cv2.VideoCapture 的 read/release 一致
+# source: 文件/命名管道/v4l2loopback 设备路径（如 /dev/video10），或已打开的二进制流（如 libcamera-vid 的 stdout）
+# 每帧直接 readinto 到新分配的缓冲区，返回的 Y 平面是该缓冲区的视图，不做任何拷贝或转换；
+# 每帧独立缓冲区，取走的帧不会被后续读取覆盖
+# width 应为 64 的倍数，否则 libcamera 输出的行带有填充字节
+class YUV420Reader:
+    def __init__(self, source, width=640, height=480):
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3 // 2
+        self._owned = isinstance(source, (str, bytes, int))
+        self.stream = open(source, 'rb', buffering=0) if self._owned else source
+
+    def isOpened(self):
+        return self.stream is not None and not self.stream.closed
+
+    def _read_into(self, view):
+        filled = 0
+        while filled < len(view):
+            # 管道/设备可能一次只返回部分数据
+            n = self.stream.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    # 返回 (ret, Y平面灰度图 (height, width))
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        buf = np.empty(self.frame_bytes, dtype=np.uint8)
+        if not self._read_into(memoryview(buf)):
+            return False, None
+        return True, buf[:self.width * self.height].reshape(self.height, self.width)
+
+    def release(self):
+        if self._owned and self.stream is not None:
+            self.stream.close()
+        self.stream = None
+
+
+class LatestFrameGrabber:
+    # source: cv2.VideoCapture 可打开的路径/设备号，或已打开的 VideoCapture / YUV420Reader 对象
+    def __init__(self, source, retry_interval=0.01):
+        self.cap = source if hasattr(source, 'read') else cv2.VideoCapture(source)
+        self.retry_interval = retry_interval
+        # 单槽缓冲区：(序号, 采集时间戳, 图像)
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0.0
+        self._consumed_seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        # 计数器
+        self.captured = 0
+        self.dropped = 0
+        self.read_failures = 0
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='frame-grabber', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            timestamp = time.time()
+            if not ret or frame is None:
+                self.read_failures += 1
+                time.sleep(self.retry_interval)
+                continue
+            with self._cond:
+                # 上一帧还没被取走就被覆盖，记为丢帧
+                if self._seq > self._consumed_seq:
+                    self.dropped += 1
+                self._frame = frame
+                self._seq += 1
+                self._timestamp = timestamp
+                self.captured += 1
+                self._cond.notify_all()
+
+    # 取最新一帧；若没有比上次更新的帧则最多等待 timeout 秒，超时返回 (None, None, None)
+    def read(self, timeout=1.0):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._consumed_seq or not self._running, timeout):
+                return None, None, None
+            if self._seq <= self._consumed_seq:
+                return None, None, None
+            self._consumed_seq = self._seq
+            return self._seq, self._timestamp, self._frame
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "read_failures": self.read_failures,
+        }
+
+    def release(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.cap.release()
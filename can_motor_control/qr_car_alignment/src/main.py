@@ -2,71 +2,166 @@
 import cv2
 # 导入time库，用于时间控制和延时
 import time
-# 导入threading库，用于创建和管理线程
-import threading
 # 导入CarController类，用于控制小车的运动
 from car_control import CarController
+# 导入日志与二进制追踪（motor目录已由car_control加入搜索路径）
+from runtime_log import setup_logging, trace, pack_i16, EV_VISION, EV_DETECT, DETECT_SCALE
 # 导入preprocess_image函数，用于图像预处理
 from utils import preprocess_image
-# 导入socket库，用于TCP通信
-import socket
+# 导入独立线程采集模块，始终提供最新一帧
+from frame_source import LatestFrameGrabber, YUV420Reader
+# 导入二维码ROI跟踪器，找到二维码后只在其附近区域检测
+from qr_detector import QRTracker
+# 导入并行检测池，检测较慢时多帧同时处理
+from detect_pool import DetectorPool
+# 导入固定频率PID对齐控制器
+from alignment import AlignmentController, bbox_pose
+# 导入ArUco位姿检测（米制距离与偏航角）
+from aruco_pose import ArucoPoseDetector, load_calibration, marker_alignment_error, marker_distance
+# 导入低帧率MJPEG预览流，无显示器时通过浏览器查看
+from preview_server import PreviewStreamer
+# 导入检测结果发布器：带长度前缀的二进制记录，后台线程成批发送并自动重连
+from detection_publisher import DetectionPublisher
+# 导入帧录制器：保存处理过的帧和索引（帧序号、偏移、采集时间、检测结果），供bench_frames.py离线测试
+from frame_recorder import FrameRecorder
+# 导入argparse库，用于解析命令行参数
+import argparse
+# 导入numpy库，用于角点数组
+import numpy as np
+# 导入logging库，状态输出经队列由后台线程写终端
+import logging
+# 导入启动耗时统计（run_ws_gui.py --importtime 或 CAR_IMPORTTIME=1 时输出）
+import startup
 
-# 心跳循环函数，用于定期向电机发送心跳信号
-# 参数: controller - CarController实例，用于发送心跳
-def heartbeat_loop(controller):
-    # 无限循环发送心跳信号
-    while True:
-        # 调用控制器的发送心跳方法
-        controller.send_heartbeat()
-        # 每100毫秒发送一次心跳
-        time.sleep(0.1)
+log = logging.getLogger('qr_main')
 
 # 主函数，程序的入口点
 def main():
+    # 解析命令行参数
+    parser = argparse.ArgumentParser()
+    # 检测工作者数量：0表示在主循环中用ROI跟踪检测，>0表示使用并行检测池
+    parser.add_argument('--detect-workers', type=int, default=0)
+    # 检测池类型：线程（OpenCV释放GIL）或进程
+    parser.add_argument('--detect-pool', default='thread', choices=['thread', 'process'])
+    # 定位标记类型：二维码（默认）或ArUco（更快，并给出米制位姿）
+    parser.add_argument('--marker', default='qr', choices=['qr', 'aruco'])
+    # ArUco标记实际边长（米）、相机标定文件、对齐目标距离（米）
+    parser.add_argument('--marker-length', type=float, default=0.1)
+    parser.add_argument('--calibration', default=None)
+    parser.add_argument('--target-distance', type=float, default=0.3)
+    # 采集格式：mjpeg（解码为BGR）或 yuv（原始YUV420，直接取Y平面作为灰度图，省去解码和颜色转换）
+    parser.add_argument('--capture', default='mjpeg', choices=['mjpeg', 'yuv'])
+    # 图像来源：不指定时由本程序启动libcamera-vid；也可指定文件/设备，如start_virtualcam.sh的/dev/video10
+    parser.add_argument('--source', default=None)
+    # 预处理：高斯模糊核大小（0表示不模糊）、金字塔下采样次数（二维码检测用）
+    parser.add_argument('--blur', type=int, default=5)
+    parser.add_argument('--pyramid', type=int, default=0)
+    # 无界面模式：不创建窗口、不调用imshow/waitKey，每个周期都用于检测
+    parser.add_argument('--headless', action='store_true')
+    # 预览流：HTTP MJPEG端口（0表示关闭）和帧率，帧率与控制频率无关
+    parser.add_argument('--preview-port', type=int, default=0)
+    parser.add_argument('--preview-fps', type=float, default=5.0)
+    # 里程计：off（默认）、command（积分指令转速）或feedback（积分伺服反馈转速）
+    # 启用后两次视觉测量之间按里程计航位推算，目标短暂丢失（最多--dead-reckon秒）时继续对齐
+    parser.add_argument('--odometry', default='off', choices=['off', 'command', 'feedback'])
+    parser.add_argument('--dead-reckon', type=float, default=2.0)
+    # 里程计位移 (dx, dy, dtheta) 到对齐误差单位的换算，如ArUco模式下长度单位到米
+    parser.add_argument('--odometry-scale', type=float, nargs=3, default=(1.0, 1.0, 1.0))
+    # 检测结果发布地址：TCP端口（默认127.0.0.1:9000），或指定Unix域套接字路径
+    parser.add_argument('--publish-port', type=int, default=9000)
+    parser.add_argument('--publish-unix', default=None)
+    # CAN后端：socketcan（实车）、vcan、sim（进程内仿真伺服，无车调试）；默认取环境变量CAR_CAN_BACKEND
+    parser.add_argument('--can-backend', default=None, choices=['socketcan', 'vcan', 'sim'])
+    # 录制检测循环处理的帧：数据文件路径（索引写入同名.idx文件），raw保存原始像素，jpeg在后台线程中编码
+    parser.add_argument('--record', default=None)
+    parser.add_argument('--record-format', default='raw', choices=['raw', 'jpeg'])
+    # 日志级别；运行中 kill -USR1 <pid> 开关二进制追踪
+    parser.add_argument('--log-level', default=None)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
     # 初始化小车控制器 - 与remote_control_gui.py保持一致的参数配置
-    controller = CarController()
-    # 启动心跳线程，确保电机通信稳定
-    # daemon=True表示主线程结束时，心跳线程也会自动结束
-    threading.Thread(target=heartbeat_loop, args=(controller,), daemon=True).start()
+    controller = CarController(backend=args.can_backend)
+    # 启动周期心跳，确保电机通信稳定
+    # SocketCAN上由内核BCM定时发送，不受OpenCV占用GIL的影响
+    controller.start_heartbeat()
+    # 启动伺服反馈接收，控制时可通过controller.wheel_feedback()读取实际轮速
+    controller.start_feedback()
+    # 启动100Hz里程计，位姿经controller.pose()读取
+    dead_reckoning = {}
+    if args.odometry != 'off':
+        dead_reckoning = dict(odometry=controller.start_odometry(args.odometry, rate_hz=100),
+                              odometry_scale=args.odometry_scale, max_dead_reckon=args.dead_reckon)
+    # 启动100Hz对齐控制线程：视觉只更新目标位置，控制频率与帧率无关
+    if args.marker == 'aruco':
+        # ArUco模式下误差为米制（横向偏移、距离差）和弧度，容差和增益相应调整
+        aligner = AlignmentController(controller, rate_hz=100, tolerance=(0.01, 0.01, 0.05),
+                                      gains=((4.0, 0.5, 0.1), (3.0, 0.5, 0.1), (0.8, 0.0, 0.02)),
+                                      **dead_reckoning).start()
+    else:
+        aligner = AlignmentController(controller, rate_hz=100, **dead_reckoning).start()
 
     # 导入subprocess和signal库，用于启动和控制外部进程
     import subprocess
     import signal
-    # 打印启动摄像头流的信息
-    print("Starting camera stream...")
-    # 启动libcamera-vid进程，捕获摄像头图像并保存到共享内存
-    cam_proc = subprocess.Popen([
-        "sudo", "libcamera-vid",         # 使用sudo权限运行libcamera-vid命令
-        "-t", "0",                       # 设置超时时间为无限（持续运行）
-        "--width", "640", "--height", "480", # 设置图像分辨率为640x480
-        "--codec", "mjpeg",               # 使用MJPEG编码格式
-        "--autofocus-mode", "continuous", # 设置自动对焦模式为连续
-        "--inline",                        # 内联MJPEG帧头
-        "-o", "/dev/shm/cam.mjpeg"         # 将输出保存到共享内存文件
-    ])
-    # 等待0秒，让摄像头有时间初始化
-    time.sleep(1)
+    cam_proc = None
+    if args.source:
+        # 使用外部已启动的图像来源
+        if args.capture == 'yuv':
+            source = YUV420Reader(args.source, 640, 480)
+        else:
+            source = args.source
+    elif args.capture == 'yuv':
+        # 打印启动摄像头流的信息
+        print("Starting camera stream (yuv420)...")
+        # libcamera-vid输出原始YUV420到标准输出，经管道直接读取，不经过JPEG编解码
+        cam_proc = subprocess.Popen([
+            "sudo", "libcamera-vid",
+            "-t", "0",
+            "--width", "640", "--height", "480",
+            "--codec", "yuv420",              # 原始YUV420格式
+            "--autofocus-mode", "continuous",
+            "-o", "-"                          # 输出到标准输出
+        ], stdout=subprocess.PIPE)
+        source = YUV420Reader(cam_proc.stdout, 640, 480)
+    else:
+        # 打印启动摄像头流的信息
+        print("Starting camera stream...")
+        # 启动libcamera-vid进程，捕获摄像头图像并保存到共享内存
+        cam_proc = subprocess.Popen([
+            "sudo", "libcamera-vid",         # 使用sudo权限运行libcamera-vid命令
+            "-t", "0",                       # 设置超时时间为无限（持续运行）
+            "--width", "640", "--height", "480", # 设置图像分辨率为640x480
+            "--codec", "mjpeg",               # 使用MJPEG编码格式
+            "--autofocus-mode", "continuous", # 设置自动对焦模式为连续
+            "--inline",                        # 内联MJPEG帧头
+            "-o", "/dev/shm/cam.mjpeg"         # 将输出保存到共享内存文件
+        ])
+        # 等待0秒，让摄像头有时间初始化
+        time.sleep(1)
+        source = '/dev/shm/cam.mjpeg'
 
-    # 使用OpenCV打开共享内存中的摄像头流
-    cap = cv2.VideoCapture('/dev/shm/cam.mjpeg')
-    # 创建二维码检测器实例
-    qr_detector = cv2.QRCodeDetector()
+    # 在独立线程中持续读取摄像头流，只保留最新一帧
+    grabber = LatestFrameGrabber(source).start()
+    # 二维码检测图像相对原图的缩放倍数（金字塔下采样）
+    scale = 2 ** args.pyramid
+    # 创建二维码跟踪检测器实例（连续多次丢失后才回到全图搜索）
+    qr_tracker = QRTracker()
+    # ArUco位姿检测器，标定文件只加载一次并预先计算去畸变映射表
+    aruco_detector = None
+    if args.marker == 'aruco':
+        calibration = load_calibration(args.calibration) if args.calibration else load_calibration()
+        aruco_detector = ArucoPoseDetector(calibration, args.marker_length)
+    # 可选的并行检测池，结果按帧序号重组，过期结果丢弃
+    pool = (DetectorPool(args.detect_workers, kind=args.detect_pool, blur=args.blur, pyramid=args.pyramid)
+            if args.detect_workers > 0 else None)
 
-    # 初始化TCP客户端，用于发送检测到的二维码信息
-    tcp_host = '127.0.0.1'  # TCP服务器地址（本地主机）
-    tcp_port = 9000         # TCP服务器端口
-    # 创建TCP套接字
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        # 尝试连接到TCP服务器
-        sock.connect((tcp_host, tcp_port))
-        # 打印连接成功信息
-        print(f"Connected to TCP server {tcp_host}:{tcp_port}")
-    except Exception as e:
-        # 打印连接失败信息
-        print(f"TCP连接失败: {e}")
-        # 设置sock为None，表示连接失败
-        sock = None
+    # 初始化检测结果发布器，用于发送检测到的二维码信息
+    # 连接和发送都在后台线程中进行，下游未启动或处理慢都不会阻塞检测循环
+    publish_address = args.publish_unix or ('127.0.0.1', args.publish_port)
+    publisher = DetectionPublisher(publish_address).start()
+    # 可选的帧录制，写入在后台线程中进行，磁盘跟不上时丢帧
+    recorder = FrameRecorder(args.record, args.record_format).start() if args.record else None
 
     # 打印运行信息和退出提示
     print("Running. Press Ctrl+C or q to exit.")
@@ -75,133 +170,179 @@ def main():
     status_text = ""
     # 设置窗口名称
     window_name = "QR Detector"
-    # 创建OpenCV窗口，WINDOW_NORMAL表示可以调整窗口大小
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-
-    # 设置目标帧率为30fps
-    target_fps = 30  # 目标帧率
-    # 计算每帧之间的时间间隔
-    frame_interval = 1 / target_fps
-    # 记录开始时间，用于计算帧率
-    start_time = time.time()
-    # 目标帧数，理论上应该达到的帧数
-    logical_frame = 50  # 目标帧数
-    # 当前实际处理的帧数
-    current_frame = 0  # 当前帧数
-    # 上次跳过的帧数
-    last_jump = 0      # 上次跳过帧数
+    if not args.headless:
+        # 创建OpenCV窗口，WINDOW_NORMAL表示可以调整窗口大小
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    # 可选的预览流，JPEG编码在后台线程中进行
+    preview = None
+    if args.preview_port:
+        preview = PreviewStreamer(args.preview_port, args.preview_fps).start()
+        print(f"Preview stream: http://0.0.0.0:{args.preview_port}/")
 
+    # 启动完成，开启统计时输出各阶段和导入耗时
+    startup.ready()
     try:
-        # 初始化计数器
-        count = 0
         # 主循环，持续处理图像
         while True:
-            # 获取当前时间
-            now = time.time()
-            # 计算当前应该处理到的目标帧数
-            logical_frame = int((now - start_time) * target_fps)
-            # 计算当前帧数与目标帧数的差值
-            # 根据差值实现更陡峭的跳帧策略，保证程序运行流畅
-            # 如果落后帧数>6跳3帧，>3跳2帧，>1跳1帧，否则不跳
-            diff = logical_frame - current_frame
-            if diff > 6:
-                jump = 3
-            elif diff > 3:
-                jump = 2
-            elif diff > 1:
-                jump = 1
-            else:
-                jump = 0
-
-            # 执行跳帧处理，只抓取图像而不进行解码和处理
-            for _ in range(jump):
-                cap.grab()
-                current_frame += 1
-
-            # 读取并解码一帧图像
-            ret, frame = cap.read()
-            current_frame += 1
+            # 取最新一帧；检测较慢时中间的旧帧已被采集线程覆盖，无需跳帧
+            seq, capture_time, frame = grabber.read(timeout=1.0)
 
             # 检查图像读取是否成功
-            if not ret or frame is None:
+            if frame is None:
                 status_text = "Camera read failed, retrying..."
-                print(status_text, end=' ')
-                # 如果读取失败，等待1秒后重试
-                time.sleep(1)
+                log.warning(status_text, extra={'rate_interval': 1.0})
                 continue
 
             # 获取图像的高度和宽度
             h, w = frame.shape[:2]
+            # 是否需要绘制标注：有窗口时每帧绘制，无界面时只在预览流需要新帧时绘制
+            annotate = not args.headless or (preview is not None and preview.due())
+            # 录制的是未标注的原始帧：需要绘制标注时先复制一份
+            record_frame = frame.copy() if recorder is not None and annotate else frame
+            # 本帧的检测结果（位姿、ArUco标记ID），录制时写入索引
+            detected_pose, detected_marker = None, -1
+            # 检测结果所属的帧；检测池模式下是完成检测的那一帧，而不是当前帧
+            result_seq, result_time = seq, capture_time
+            # 本轮是否有新的检测结果（检测池模式下工作者尚未返回时为False）
+            new_result = True
+            # 检测池模式下当前帧是否已提交给工作者（None 表示不使用检测池）
+            pool_submitted = None
 
-            # 对图像进行预处理，提高二维码检测效果
-            processed = preprocess_image(frame)
-
-            # 使用OpenCV的QRCodeDetector进行二维码检测和解码
-            # data: 解码后的二维码内容
+            # 检测定位标记
+            # data: 二维码内容
             # bbox: 二维码的边界框坐标
-            data, bbox, _ = qr_detector.detectAndDecode(processed)
+            if aruco_detector is not None:
+                # ArUco模式：检测标记并求解位姿，直接得到米制误差
+                # 位姿依赖标定内参，不做金字塔下采样
+                markers = aruco_detector.detect(preprocess_image(frame, args.blur))
+                if markers:
+                    marker_id, corners, rvec, tvec = markers[0]
+                    pose = marker_alignment_error(rvec, tvec, args.target_distance)
+                    aligner.update_pose(pose, capture_time)
+                    publisher.publish(seq, capture_time, f"aruco:{marker_id}", corners, pose)
+                    # 追踪中记录检测结果：米制位姿（x、距离误差、偏航，万分比）和标记ID
+                    trace.record(EV_DETECT, seq, pack_i16(*(pose * DETECT_SCALE), marker_id), capture_time)
+                    detected_pose, detected_marker = pose, marker_id
+                    if annotate:
+                        cv2.polylines(frame, [corners.astype(int)], True, (0, 255, 0), 2)
+                    status_text = f"ArUco {marker_id}: {marker_distance(tvec):.2f} m"
+                    if aligner.aligned:
+                        status_text += " [aligned]"
+                else:
+                    status_text = "ArUco marker not detected"
+                    if aligner.target_visible:
+                        status_text += " (dead reckoning)"
+                    publisher.reset()
+                data, bbox = None, None
+            elif pool is None:
+                # 使用QRTracker进行二维码检测：跟踪中只在ROI内定位，内容不变时不重复解码
+                # 对图像进行预处理，提高二维码检测效果
+                processed = preprocess_image(frame, args.blur, args.pyramid)
+                data, bbox = qr_tracker.detect(processed)
+                # 角点换算回原图坐标
+                if bbox is not None and scale != 1:
+                    bbox = bbox * scale
+            else:
+                # 提交当前帧（工作者都忙时跳过），应用已完成结果中最新的一个
+                # 工作者可能仍在读取该帧，显示时在副本上绘制
+                pool_submitted = pool.submit(seq, capture_time, frame)
+                if annotate:
+                    frame = frame.copy()
+                ready = pool.results()
+                data, bbox = None, None
+                # 没有新结果时不重复应用旧结果：旧结果带上新的时间戳会让对齐控制器的外推超时失效
+                new_result = bool(ready)
+                if ready:
+                    # 使用该结果所属帧的序号和采集时间
+                    result_seq, (result_time, data, pool_bbox, _, _) = ready[-1]
+                    bbox = None if pool_bbox is None else np.array([pool_bbox], dtype=np.float32)
             # 检查是否检测到有效的二维码
-            if bbox is not None and data:
-                # 将边界框坐标转换为整数
-                pts = bbox[0].astype(int)
-                # 在图像上绘制二维码边界框
-                for i in range(4):
-                    cv2.line(frame, tuple(pts[i]), tuple(pts[(i+1)%4]), (0,255,0), 2)
+            if not new_result:
+                # 检测池尚未返回新结果，保持上一次的状态
+                pass
+            elif bbox is not None and data:
+                if annotate:
+                    # 将边界框坐标转换为整数
+                    pts = bbox[0].astype(int)
+                    # 在图像上绘制二维码边界框
+                    for i in range(4):
+                        cv2.line(frame, tuple(pts[i]), tuple(pts[(i+1)%4]), (0,255,0), 2)
                 # 更新状态文本，显示解码后的内容
                 status_text = f"QR Content: {data}"
-                # 如果TCP连接存在，发送二维码内容
-                if sock:
-                    try:
-                        sock.sendall(data.encode('utf-8'))
-                    except Exception as e:
-                        print(f"TCP发送失败: {e}", end=' ')
-                        # 发送失败后，将sock设为None
-                        sock = None
-                # 检测到二维码时，控制小车前进
-                # 使用与remote_control_gui.py一致的速度值
-                controller.move_forward(500)
-            else:
+                # 发布二维码内容、角点和归一化位姿（内容不变时不重复发送）
+                pose = bbox_pose(bbox, (w, h))
+                publisher.publish(result_seq, result_time, data, bbox, pose)
+                # 追踪中记录检测结果：归一化位姿（万分比），第4项 -1 表示二维码
+                trace.record(EV_DETECT, result_seq, pack_i16(*(pose * DETECT_SCALE), -1), result_time)
+                detected_pose = pose
+                # 检测到二维码时，更新对齐控制器的目标位置（使用帧的采集时间）
+                aligner.update_vision(bbox, (w, h), result_time)
+                if aligner.aligned:
+                    status_text += " [aligned]"
+            elif aruco_detector is None:
                 # 未检测到二维码时，更新状态文本
+                # 对齐控制器在目标外推（或航位推算）超时后会自动停车
                 status_text = "QR code not detected"
-                # 未检测到二维码时，控制小车停止
-                controller.stop()
+                if aligner.target_visible:
+                    status_text += " (dead reckoning)"
+                # 目标丢失后重新出现时，即使内容相同也再发送一次
+                publisher.reset()
 
-            # 增加计数器
-            count += 1
+            # 输出当前处理状态（每秒最多一条，不阻塞检测循环）；追踪开启时每帧记录延迟和检出情况
+            latency_ms = (time.time() - capture_time) * 1000
+            log.info("Frame:%d Dropped:%d Latency:%.0fms Result:%s", seq, grabber.dropped, latency_ms, status_text)
+            trace.record(EV_VISION, seq, pack_i16(latency_ms, aligner.target_visible, grabber.dropped))
+            if recorder is not None:
+                if pool_submitted is None:
+                    recorder.record(seq, capture_time, record_frame, detected_pose, detected_marker)
+                else:
+                    # 检测池模式：检测结果写入它所属的帧；已提交的当前帧等待自己的结果，跳过的帧记为未检出
+                    recorder.record(seq, capture_time, record_frame, wait=pool_submitted)
+                    for done_seq, (_, done_data, done_bbox, _, _) in ready:
+                        done_pose = bbox_pose(np.array([done_bbox], dtype=np.float32), (w, h)) \
+                            if done_bbox is not None and done_data else None
+                        recorder.resolve(done_seq, done_pose)
+                    recorder.release(pool.reorderer.last_applied)
 
-            # 在控制台打印当前处理状态信息（不换行，覆盖上一行）
-            print(f"\rCurrent:{current_frame} Target:{logical_frame} Jumped:{jump} Result:{status_text}", end='')
-
-            # 在图像上显示状态文本
-            cv2.putText(frame, status_text, (10, h-10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2)
-            # 显示处理后的图像
-            cv2.imshow(window_name, frame)
-            # 等待1毫秒，如果用户按下'q'键则退出循环
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-            # 帧率控制：如果当前帧已经赶上或超过目标帧，则延时等待
-            now2 = time.time()
-            logical_frame2 = int((now2 - start_time) * target_fps)
-            # 如果当前帧还未赶上目标帧，则继续处理下一帧
-            if current_frame < logical_frame2:
-                continue
-            # 计算需要休眠的时间，以保持目标帧率
-            sleep_time = start_time + (current_frame) * frame_interval - time.time()
-            # 如果需要休眠的时间大于0，则执行休眠
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            if annotate:
+                # 在图像上显示状态文本
+                cv2.putText(frame, status_text, (10, h-10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2)
+                # 提交给预览流（编码在后台线程中进行）
+                if preview is not None and preview.due():
+                    preview.offer(frame)
+            if not args.headless:
+                # 显示处理后的图像
+                cv2.imshow(window_name, frame)
+                # 等待1毫秒，如果用户按下'q'键则退出循环
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    except KeyboardInterrupt:
+        # 无界面模式下用Ctrl+C退出
+        pass
     finally:
-        # 释放摄像头资源
-        cap.release()
+        # 停止对齐控制线程（会发送停止指令）
+        aligner.stop()
+        # 关闭检测池
+        if pool is not None:
+            pool.shutdown()
+        # 停止采集线程并释放摄像头资源
+        grabber.release()
+        # 关闭预览流
+        if preview is not None:
+            preview.stop()
         # 关闭所有OpenCV窗口
-        cv2.destroyAllWindows()
+        if not args.headless:
+            cv2.destroyAllWindows()
         # 向摄像头进程发送中断信号，停止摄像头
-        cam_proc.send_signal(signal.SIGINT)
-        # 如果TCP套接字存在，则关闭连接
-        if sock:
-            sock.close()
+        if cam_proc is not None:
+            cam_proc.send_signal(signal.SIGINT)
+        # 关闭检测结果发布器
+        publisher.close()
+        # 写完剩余的帧并关闭录制文件
+        if recorder is not None:
+            recorder.close()
+            print(f"Recorded frames: {recorder.stats()}")
         # 关闭CAN总线连接，确保资源正确释放
         controller.shutdown()
 
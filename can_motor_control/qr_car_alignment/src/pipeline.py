@@ -0,0 +1,269 @@
+# 多进程视觉流水线：采集/解码、二维码检测、小车控制分别运行在独立进程中
+# - 图像通过 multiprocessing.shared_memory 中的环形槽位传递，检测进程直接使用 NumPy 视图，不复制
+# - 检测结果通过轻量队列传给控制进程
+# - 控制进程按固定频率运行，不受检测耗时影响
+# 用法（无摄像头时可用视频文件，无CAN时加 --no-can）:
+#   python pipeline.py --source /dev/shm/cam.mjpeg
+#   python pipeline.py --source test.mp4 --no-can --duration 10
+#   python pipeline.py --source /dev/video10 --yuv      # 原始YUV420，共享内存中只传灰度Y平面
+import argparse
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 每个槽位的头部：序号、采集时间戳
+_HEADER_FIELDS = 2
+
+
+# 共享内存帧环：slots 个 (H, W, C) 或 (H, W) uint8 槽位 + 每槽位的 (序号, 时间戳) 头部
+class SharedFrameRing:
+    def __init__(self, shape, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = slots * _HEADER_FIELDS * 8
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.header = np.ndarray((slots, _HEADER_FIELDS), dtype=np.float64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = -1
+
+    # 写入一帧（写入者唯一），返回写入的槽位
+    def write(self, seq, timestamp, frame):
+        slot = seq % self.slots
+        # 先把序号置为无效，读者在写入过程中读到会丢弃
+        self.header[slot, 0] = -1
+        self.frames[slot][...] = frame
+        self.header[slot, 1] = timestamp
+        self.header[slot, 0] = seq
+        return slot
+
+    # 取某个序号对应帧的零拷贝视图；槽位已被覆盖时返回 None
+    def view(self, seq):
+        slot = seq % self.slots
+        if self.header[slot, 0] != seq:
+            return None, None
+        return self.header[slot, 1], self.frames[slot]
+
+    # 处理完后确认槽位未被覆盖（顺序锁思路），被覆盖则结果不可信
+    def still_valid(self, seq):
+        return self.header[seq % self.slots, 0] == seq
+
+    def close(self):
+        # 先释放 NumPy 视图再关闭共享内存
+        del self.header
+        del self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_process(source, ring_name, shape, slots, latest_seq, stop_event, realtime, stats):
+    import cv2
+    from frame_source import YUV420Reader
+    ring = SharedFrameRing(shape, slots, name=ring_name)
+    if len(shape) == 2:
+        # 灰度槽位：直接读取YUV420的Y平面，不解码
+        cap = YUV420Reader(source, shape[1], shape[0])
+        fps = 30
+    else:
+        cap = cv2.VideoCapture(source)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    seq = 0
+    next_time = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                # 视频文件读完则结束整个流水线
+                if not str(source).startswith('/dev/'):
+                    break
+                time.sleep(0.01)
+                continue
+            if frame.shape != ring.shape:
+                frame = cv2.resize(frame, (ring.shape[1], ring.shape[0]))
+            seq += 1
+            ring.write(seq, time.time(), frame)
+            latest_seq.value = seq
+            if realtime:
+                # 按视频原始帧率读取，模拟摄像头
+                next_time += 1.0 / fps
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        stats['captured'] = seq
+        cap.release()
+        ring.close()
+        stop_event.set()
+
+
+def detect_process(ring_name, shape, slots, latest_seq, results, stop_event, stats):
+    from qr_detector import QRTracker
+    from utils import preprocess_image
+    ring = SharedFrameRing(shape, slots, name=ring_name)
+    tracker = QRTracker()
+    last_seq = 0
+    processed = torn = 0
+    busy = 0.0
+    try:
+        while not stop_event.is_set():
+            seq = latest_seq.value
+            if seq == last_seq:
+                time.sleep(0.001)
+                continue
+            last_seq = seq
+            capture_time, frame = ring.view(seq)
+            if frame is None:
+                continue
+            start = time.perf_counter()
+            data, bbox = tracker.detect(preprocess_image(frame))
+            busy += time.perf_counter() - start
+            # 检测期间槽位被采集进程覆盖，丢弃该结果
+            if not ring.still_valid(seq):
+                torn += 1
+                continue
+            processed += 1
+            result = (seq, capture_time, data, None if bbox is None else bbox.reshape(4, 2).tolist())
+            try:
+                results.put_nowait(result)
+            except queue.Full:
+                pass
+    finally:
+        stats['processed'] = processed
+        stats['torn'] = torn
+        stats['detect_ms'] = busy * 1000 / max(processed, 1)
+        ring.close()
+
+
+# 检测结果的有效期（秒）：与对齐控制器的外推上限相同，超过后不再计入检出、控制器停车
+MAX_RESULT_AGE = 0.3
+
+
+def control_process(results, stop_event, tick_hz, use_can, image_size, stats):
+    controller = aligner = None
+    if use_can:
+        from car_control import CarController
+        from alignment import AlignmentController
+        controller = CarController()
+        controller.start_heartbeat()
+        # 对齐控制器由本进程的固定频率循环驱动（调用 step）
+        aligner = AlignmentController(controller, rate_hz=tick_hz, max_extrapolation=MAX_RESULT_AGE)
+    period = 1.0 / tick_hz
+    latest = None
+    ticks = late = detected = 0
+    max_lag = 0.0
+    next_time = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            # 非阻塞取完队列，只使用最新的检测结果
+            fresh = None
+            while True:
+                try:
+                    fresh = results.get_nowait()
+                except queue.Empty:
+                    break
+            if fresh is not None:
+                latest = fresh
+                if aligner and latest[3] is not None:
+                    aligner.update_vision(latest[3], image_size, latest[1])
+            # 检测进程停止或变慢时旧结果过期，统计与控制器实际使用的结果一致（采集时间为 time.time()）
+            if latest is not None and time.time() - latest[1] > MAX_RESULT_AGE:
+                latest = None
+            if latest is not None and latest[2]:
+                detected += 1
+            if aligner:
+                # 两次检测之间由对齐控制器外推目标位置
+                aligner.step()
+            ticks += 1
+            next_time += period
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                late += 1
+                max_lag = max(max_lag, -delay)
+                next_time = time.monotonic()
+            else:
+                time.sleep(delay)
+    finally:
+        stats['ticks'] = ticks
+        stats['late_ticks'] = late
+        stats['max_lag_ms'] = max_lag * 1000
+        stats['detected_ticks'] = detected
+        if aligner:
+            aligner.stop()
+        if controller:
+            controller.shutdown()
+
+
+def run_pipeline(source, shape=(480, 640, 3), slots=4, tick_hz=50, use_can=True, realtime=True, duration=None):
+    ring = SharedFrameRing(shape, slots)
+    manager = mp.Manager()
+    stats = manager.dict()
+    latest_seq = mp.Value('q', 0, lock=False)
+    results = mp.Queue(maxsize=8)
+    stop_event = mp.Event()
+    procs = [
+        mp.Process(target=capture_process, name='capture',
+                   args=(source, ring.name, shape, slots, latest_seq, stop_event, realtime, stats)),
+        mp.Process(target=detect_process, name='detect',
+                   args=(ring.name, shape, slots, latest_seq, results, stop_event, stats)),
+        mp.Process(target=control_process, name='control',
+                   args=(results, stop_event, tick_hz, use_can, (shape[1], shape[0]), stats)),
+    ]
+    start = time.monotonic()
+    for proc in procs:
+        proc.start()
+    try:
+        while not stop_event.is_set():
+            if duration is not None and time.monotonic() - start >= duration:
+                break
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for proc in procs:
+            proc.join()
+        elapsed = time.monotonic() - start
+        result = dict(stats)
+        result['elapsed'] = elapsed
+        manager.shutdown()
+        ring.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default='/dev/shm/cam.mjpeg')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--tick-hz', type=float, default=50)
+    parser.add_argument('--duration', type=float)
+    parser.add_argument('--no-can', action='store_true', help='不连接CAN总线，只运行采集和检测')
+    parser.add_argument('--fast', action='store_true', help='视频文件不按原始帧率读取')
+    parser.add_argument('--yuv', action='store_true', help='来源为原始YUV420，只传递灰度Y平面')
+    args = parser.parse_args()
+
+    shape = (args.height, args.width) if args.yuv else (args.height, args.width, 3)
+    stats = run_pipeline(args.source, shape, args.slots, args.tick_hz,
+                         use_can=not args.no_can, realtime=not args.fast, duration=args.duration)
+    elapsed = stats['elapsed']
+    print(f"运行 {elapsed:.1f}s")
+    print(f"采集 {stats.get('captured', 0)} 帧，检测 {stats.get('processed', 0)} 帧"
+          f"（槽位被覆盖 {stats.get('torn', 0)}），平均检测 {stats.get('detect_ms', 0):.2f} ms")
+    print(f"控制 {stats.get('ticks', 0)} 周期（{stats.get('ticks', 0) / elapsed:.1f} Hz），"
+          f"超时 {stats.get('late_ticks', 0)}，最大滞后 {stats.get('max_lag_ms', 0):.2f} ms，"
+          f"有效检测结果 {stats.get('detected_ticks', 0)} 周期")
+
+
+if __name__ == '__main__':
+    main()
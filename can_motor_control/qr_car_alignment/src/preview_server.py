@@ -0,0 +1,114 @@
+# 无显示器运行时的预览流 - 以较低帧率（默认5fps）在独立线程中JPEG编码，通过本地HTTP以MJPEG推送
+# - 检测循环先调用 due() 判断是否需要预览帧，不需要时连标注绘制都可以跳过
+# - offer() 只保存帧的引用，编码和网络发送都在后台线程中进行，不占用检测循环
+# 浏览器打开 http://<小车IP>:8080/ 即可查看
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+_BOUNDARY = b'frame'
+
+
+class PreviewStreamer:
+    def __init__(self, port=8080, fps=5.0, quality=70, host='0.0.0.0'):
+        self.period = 1.0 / fps
+        self.quality = quality
+        self._last_offer = 0.0
+        # 待编码的帧（只保留最新一帧）和已编码的JPEG
+        self._pending = None
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._cond = threading.Condition()
+        self._running = True
+        self.encoded = 0
+        self.clients = 0
+        self._encoder = threading.Thread(target=self._encode_loop, name='preview-encoder', daemon=True)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._http = threading.Thread(target=self._server.serve_forever, name='preview-http', daemon=True)
+
+    def start(self):
+        self._encoder.start()
+        self._http.start()
+        return self
+
+    # 距上次提交超过一个预览周期，且有客户端在观看时才需要新帧
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self.clients > 0 and now - self._last_offer >= self.period
+
+    # 提交一帧已标注的图像；调用后检测循环不应再修改该帧
+    def offer(self, frame):
+        self._last_offer = time.monotonic()
+        with self._cond:
+            self._pending = frame
+            self._cond.notify_all()
+
+    def _encode_loop(self):
+        params = (cv2.IMWRITE_JPEG_QUALITY, self.quality)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                frame, self._pending = self._pending, None
+            ok, jpeg = cv2.imencode('.jpg', frame, params)
+            if not ok:
+                continue
+            with self._cond:
+                self._jpeg = jpeg.tobytes()
+                self._jpeg_seq += 1
+                self.encoded += 1
+                self._cond.notify_all()
+
+    # 等待比 seq 更新的JPEG，返回 (新序号, JPEG数据)；停止时返回 (seq, None)
+    def wait_jpeg(self, seq, timeout=1.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self._jpeg_seq > seq or not self._running, timeout)
+            if not self._running or self._jpeg_seq <= seq:
+                return seq, None
+            return self._jpeg_seq, self._jpeg
+
+    def _make_handler(self):
+        streamer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/stream'):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=' + _BOUNDARY.decode())
+                self.end_headers()
+                with streamer._cond:
+                    streamer.clients += 1
+                seq = 0
+                try:
+                    while streamer._running:
+                        seq, jpeg = streamer.wait_jpeg(seq)
+                        if jpeg is None:
+                            continue
+                        self.wfile.write(b'--' + _BOUNDARY + b'\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                                         + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with streamer._cond:
+                        streamer.clients -= 1
+
+            # 不在控制台打印每个请求
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        self._encoder.join()
@@ -1,17 +1,118 @@
 # 导入OpenCV库
 import cv2
+import numpy as np
+
+
+# 二维码ROI跟踪器：找到二维码后只在上一次位置附近的区域内检测
+# - ROI 边距随二维码移动速度增大
+# - 连续 max_misses 次在ROI内没找到才回到全图搜索
+# - 内容不变时只做定位(detect)不做解码，每 decode_interval 帧解码一次确认内容
+class QRTracker:
+    def __init__(self, detector=None, margin=0.5, motion_gain=2.0, max_misses=3, decode_interval=15, min_roi=96):
+        self.detector = detector or cv2.QRCodeDetector()
+        self.margin = margin
+        self.motion_gain = motion_gain
+        self.max_misses = max_misses
+        self.decode_interval = decode_interval
+        self.min_roi = min_roi
+        self.reset()
+
+    def reset(self):
+        self.data = None
+        self.bbox = None
+        self.velocity = np.zeros(2)
+        self.misses = 0
+        self._since_decode = 0
+        # 最近一次检测使用的模式：'full' / 'roi' / 'roi-decode'
+        self.mode = 'full'
+
+    # 计算ROI区域 (x0, y0, x1, y1)
+    def _roi(self, shape):
+        h, w = shape[:2]
+        lo = self.bbox.min(axis=0)
+        hi = self.bbox.max(axis=0)
+        size = hi - lo
+        pad = size * self.margin + np.abs(self.velocity) * self.motion_gain
+        # 错过的帧越多，区域越大
+        pad *= 1 + self.misses
+        lo = lo - pad
+        hi = hi + pad
+        # 保证最小尺寸，太小的ROI检测器会失败
+        short = np.maximum(0, self.min_roi - (hi - lo)) / 2
+        lo -= short
+        hi += short
+        x0, y0 = np.maximum(lo, 0).astype(int)
+        x1 = int(min(hi[0], w))
+        y1 = int(min(hi[1], h))
+        return x0, y0, x1, y1
+
+    def _update(self, data, bbox):
+        center = bbox.mean(axis=0)
+        if self.bbox is not None:
+            self.velocity = center - self.bbox.mean(axis=0)
+        self.bbox = bbox
+        if data:
+            self.data = data
+        self.misses = 0
+
+    # 检测一帧灰度图，返回 (内容, 角点) ；角点为 (1, 4, 2) 数组与 detectAndDecode 一致，未找到返回 (None, None)
+    def detect(self, image):
+        if self.bbox is not None and self.misses < self.max_misses:
+            x0, y0, x1, y1 = self._roi(image.shape)
+            roi = image[y0:y1, x0:x1]
+            offset = np.array((x0, y0), dtype=np.float32)
+            if self._since_decode >= self.decode_interval:
+                # 定期解码，确认内容未变化
+                self.mode = 'roi-decode'
+                data, points, _ = self.detector.detectAndDecode(roi)
+                found = points is not None and bool(data)
+                if found:
+                    self._since_decode = 0
+            else:
+                self.mode = 'roi'
+                found, points = self.detector.detect(roi)
+                data = self.data
+                found = bool(found) and points is not None
+                if found:
+                    self._since_decode += 1
+            if found:
+                bbox = points.reshape(4, 2) + offset
+                self._update(data, bbox)
+                return self.data, bbox.reshape(1, 4, 2)
+            self.misses += 1
+            return None, None
+
+        # 全图搜索并解码
+        self.mode = 'full'
+        data, points, _ = self.detector.detectAndDecode(image)
+        if points is not None and data:
+            self.velocity[:] = 0
+            self._since_decode = 0
+            self._update(data, points.reshape(4, 2).astype(np.float32))
+            return data, points
+        # 全图也没找到，丢弃跟踪状态
+        self.bbox = None
+        self.data = None
+        self.misses = 0
+        return None, None
+
 
 # 二维码检测器类
 class QRDetector:
-    # 初始化函数
-    def __init__(self):
+    # 初始化函数，track=True 时使用ROI跟踪模式
+    def __init__(self, track=False):
         # 初始化OpenCV的二维码检测器
         self.detector = cv2.QRCodeDetector()
+        # ROI跟踪器（可选）
+        self.tracker = QRTracker(self.detector) if track else None
 
     # 检测二维码函数
     def detect_qr_code(self, frame):
-        # 使用OpenCV的detectAndDecode函数检测二维码，返回数据、角点和二进制掩码
-        data, points, _ = self.detector.detectAndDecode(frame)
+        # 跟踪模式下只在上次位置附近检测，否则使用OpenCV的detectAndDecode函数全图检测，返回数据、角点和二进制掩码
+        if self.tracker is not None:
+            data, points = self.tracker.detect(frame)
+        else:
+            data, points, _ = self.detector.detectAndDecode(frame)
         # 如果检测到二维码（points不为None）
         if points is not None:
             # 获取二维码的四个角点坐标
@@ -25,4 +126,4 @@ class QRDetector:
             # 返回二维码内容和中心坐标
             return data, qr_position
         # 如果未检测到二维码，返回None
-        return None, None
\ No newline at end of file
+        return None, None
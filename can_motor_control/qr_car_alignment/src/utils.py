@@ -4,13 +4,19 @@ import cv2
 import math
 
 # 图像预处理函数
-def preprocess_image(image):
-    # 将彩色图像转换为灰度图像
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    # 对灰度图像进行高斯模糊处理，使用5x5的卷积核，标准差为0
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+# blur: 高斯模糊核大小，0表示不模糊
+# pyramid: 金字塔下采样次数，每次宽高减半（检测结果坐标需乘以 2**pyramid）
+def preprocess_image(image, blur=5, pyramid=0):
+    # 彩色图像转换为灰度图像；YUV采集得到的Y平面已经是灰度图，直接使用
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # 金字塔下采样，本身带有平滑效果，可代替高斯模糊
+    for _ in range(pyramid):
+        gray = cv2.pyrDown(gray)
+    # 对灰度图像进行高斯模糊处理，使用blur x blur的卷积核，标准差为0
+    if blur:
+        gray = cv2.GaussianBlur(gray, (blur, blur), 0)
     # 返回预处理后的图像
-    return blurred
+    return gray
 
 # 坐标转换函数
 def convert_coordinates(qr_position, image_shape):
@@ -38,4 +44,16 @@ def adjust_speed(distance):
         return 0.5  # 减速
     # 如果距离大于等于100个单位，返回1.0表示全速
     else:
-        return 1.0  # 全速
\ No newline at end of file
+        return 1.0  # 全速
+
+# 根据ArUco位姿给出的米制距离调整小车速度的函数（替代上面基于像素的启发式）
+def adjust_speed_by_distance(distance_m, stop_distance=0.2, slow_distance=0.5):
+    # 距离小于停止距离时返回0表示停止
+    if distance_m < stop_distance:
+        return 0.0
+    # 停止距离与减速距离之间线性减速
+    elif distance_m < slow_distance:
+        return (distance_m - stop_distance) / (slow_distance - stop_distance)
+    # 更远时全速
+    else:
+        return 1.0
@@ -12,5 +12,5 @@ sudo libcamera-vid -t 0 --width 640 --height 480 --codec yuv420 --autofocus-mode
 
 sleep 2
 
-# 启动python识别脚本
-python3 /home/jimmy/can_motor_control/qr_car_alignment/src/main.py
+# 启动python识别脚本：直接读取虚拟摄像头的YUV420帧，Y平面即灰度图，不经过JPEG编解码
+python3 /home/jimmy/can_motor_control/qr_car_alignment/src/main.py --capture yuv --source /dev/video10
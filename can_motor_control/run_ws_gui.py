@@ -1,33 +1,84 @@
-
+# 启动器 - 在虚拟环境的解释器中直接运行遥控程序，故障恢复后重启尽量快
+# - 当前解释器不是虚拟环境中的解释器时 os.execv 切换一次（替换当前进程，不经过 bash/source activate）
+# - 目标程序用 runpy 在同一进程中运行，不再启动第二个解释器
+# - 依赖检查用 importlib.util.find_spec，只查找不导入；缺少时用虚拟环境的 pip 安装
+# - --importtime 输出启动各阶段和每个模块的导入耗时（-X importtime 格式，见 motor/startup.py）
+# 用法:
+#   python run_ws_gui.py                          # WebSocket遥控（带界面）
+#   python run_ws_gui.py ws --headless            # 无界面运行
+#   python run_ws_gui.py --importtime qt          # PyQt5遥控器，输出启动耗时
+#   python run_ws_gui.py --no-venv align --source video.mjpeg --headless
+import argparse
 import os
 import sys
-import subprocess
-
-# 1. 创建虚拟环境（如未创建）
-venv_path = os.path.expanduser('~/venv')
-if not os.path.exists(venv_path):
-    print('未检测到虚拟环境，正在创建...')
-    subprocess.run([sys.executable, '-m', 'venv', venv_path], check=True)
-
-# 2. 激活虚拟环境并安装依赖
-def run_in_venv(commands):
-    activate = os.path.join(venv_path, 'bin', 'activate')
-    shell_cmd = f"source {activate} && {' && '.join(commands)}"
-    subprocess.run(shell_cmd, shell=True, check=True, executable='/bin/bash')
-
-required = [
-    ('websockets', 'pip install websockets'),
-    ('can', 'pip install python-can'),
-]
-for module, install_cmd in required:
-    try:
-        __import__(module)
-    except ImportError:
-        print(f'未检测到 {module}，正在安装...')
-        run_in_venv([install_cmd])
-
-# 3. 用虚拟环境运行主程序
-activate = os.path.join(venv_path, 'bin', 'activate')
-main_py = '/home/jimmy/can_motor_control/motor/remote_control_ws_gui.py'
-shell_cmd = f"source {activate} && python {main_py}"
-subprocess.run(shell_cmd, shell=True, executable='/bin/bash')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 虚拟环境路径，可由环境变量 CAR_VENV 指定
+VENV_PATH = os.path.expanduser(os.environ.get('CAR_VENV', '~/venv'))
+# execv 之后设置，防止解释器路径判断异常时反复切换
+EXEC_FLAG = 'CAR_LAUNCHER_EXEC'
+
+# 目标名 -> (程序路径, [(模块名, pip包名)])
+TARGETS = {
+    'ws': ('motor/remote_control_ws_gui.py', [('websockets', 'websockets'), ('can', 'python-can'), ('numpy', 'numpy')]),
+    'qt': ('motor/remote_control_gui.py', [('PyQt5', 'PyQt5'), ('can', 'python-can'), ('numpy', 'numpy')]),
+    'align': ('qr_car_alignment/src/main.py', [('cv2', 'opencv-python'), ('pyzbar', 'pyzbar'), ('can', 'python-can'),
+                                                ('numpy', 'numpy')]),
+}
+
+
+def in_venv():
+    return os.path.realpath(sys.prefix) == os.path.realpath(VENV_PATH)
+
+
+# 切换到虚拟环境的解释器重新执行本启动器（同一进程号，参数不变）
+def exec_in_venv():
+    python = os.path.join(VENV_PATH, 'bin', 'python')
+    if not os.path.exists(python):
+        import subprocess
+        print('未检测到虚拟环境，正在创建...')
+        subprocess.run([sys.executable, '-m', 'venv', VENV_PATH], check=True)
+    os.environ[EXEC_FLAG] = '1'
+    os.execv(python, [python, os.path.abspath(__file__)] + sys.argv[1:])
+
+
+def check_requirements(requirements):
+    from importlib.util import find_spec
+    missing = [package for module, package in requirements if find_spec(module) is None]
+    if missing:
+        import subprocess
+        print(f"未检测到 {', '.join(missing)}，正在安装...")
+        subprocess.run([sys.executable, '-m', 'pip', 'install'] + missing, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在虚拟环境中启动遥控程序')
+    parser.add_argument('--importtime', action='store_true', help='输出启动各阶段和模块导入耗时')
+    parser.add_argument('--no-venv', action='store_true', help='使用当前解释器，不切换到虚拟环境')
+    parser.add_argument('target', nargs='?', default='ws', help=f"{' / '.join(TARGETS)} 或程序路径，默认 ws")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='传给目标程序的参数')
+    args = parser.parse_args()
+
+    if not args.no_venv and not in_venv() and not os.environ.get(EXEC_FLAG):
+        exec_in_venv()
+
+    # startup 与遥控程序同在 motor 目录，先开启统计再导入目标程序的依赖
+    sys.path.insert(0, os.path.join(BASE_DIR, 'motor'))
+    import startup
+    if args.importtime:
+        startup.enable()
+
+    path, requirements = TARGETS.get(args.target, (args.target, []))
+    path = os.path.join(BASE_DIR, path)
+    check_requirements(requirements)
+    startup.mark('依赖检查')
+
+    # 与直接运行脚本相同：脚本目录在 sys.path 最前，sys.argv[0] 为脚本路径
+    import runpy
+    sys.path.insert(0, os.path.dirname(path))
+    sys.argv = [path] + args.args
+    runpy.run_path(path, run_name='__main__')
+
+
+if __name__ == '__main__':
+    main()